@@ -0,0 +1,269 @@
+"""
+Latenz- und Durchsatz-Benchmark der Moderations-Pipeline, komplett offline.
+
+Startet mock_groq_server.py im Prozess (oder nutzt --base-url), lädt die
+Moderations-Engine und misst analyze_posting_with_llm, detect_question_or_reaction_expectation
+und fetch_article: p50/p95/p99, Postings pro Sekunde, Prompt-Größen und
+Speicher. Ergebnisse landen als JSON in benchmarks/, --compare zeigt die
+Veränderung gegenüber einem früheren Lauf.
+
+    python benchmark.py --postings 200 --concurrency 8
+    python benchmark.py --compare benchmarks/benchmark_<zeit>_<commit>.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from mock_groq_server import MockGroqServer
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DIR = "benchmarks"
+SCENARIOS = ('moderation', 'question', 'fetch_article')
+
+SAMPLE_POSTINGS = [
+    "Die Wirtschaftspolitik der Regierung halte ich für verfehlt, weil die Steuerreform hauptsächlich Großkonzerne begünstigt.",
+    "Diese Politiker sind alle korrupte Idioten!",
+    "Interessanter Artikel. Die Statistiken im dritten Absatz würde ich aber hinterfragen.",
+    "Besucht meine Website für günstige Kredite! www.spam.com",
+    "Na super, noch mehr gute Nachrichten... genau was wir jetzt brauchen.",
+    "Was sagt ihr dazu? Ist das Budget so überhaupt finanzierbar?",
+    "Liebe Redaktion, warum wird die Opposition in diesem Artikel nicht zitiert?",
+    "Solche Leute gehören an die Wand gestellt!"
+]
+
+
+def load_app(state_dir: str):
+    """Importiert die Moderations-Engine; Caches und Historie in state_dir"""
+    os.environ["MODERATION_CACHE_PATH"] = os.path.join(state_dir, "moderation_cache.sqlite3")
+    os.environ["MODERATION_HISTORY_PATH"] = os.path.join(state_dir, "moderation_history.sqlite3")
+    os.environ["DUPLICATE_INDEX_PATH"] = os.path.join(state_dir, "duplicate_index.sqlite3")
+    # Der Mock begrenzt selbst (--rpm); Client-Budgets würden sonst die Messung bestimmen
+    os.environ.setdefault("GROQ_RATE_LIMITS", "off")
+    # Pfade werden beim Import gelesen, daher erst jetzt importieren
+    return importlib.import_module("moderation_engine")
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 (Nearest-Rank), Mittelwert und Maximum"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+    return {
+        'p50': rank(0.50),
+        'p95': rank(0.95),
+        'p99': rank(0.99),
+        'mean': sum(ordered) / len(ordered),
+        'max': ordered[-1]
+    }
+
+
+def is_error(result: Dict) -> bool:
+    return result.get('decision') == 'ERROR' or bool(result.get('error')) or result.get('success') is False
+
+
+def run_scenario(func: Callable, inputs: List[tuple], concurrency: int) -> Dict:
+    """Ruft func für alle inputs mit begrenzter Parallelität auf und misst jeden Aufruf"""
+    def call(args: tuple):
+        start = time.perf_counter()
+        result = func(*args)
+        return time.perf_counter() - start, result
+
+    latencies, errors = [], 0
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for elapsed, result in executor.map(call, inputs):
+            latencies.append(elapsed * 1000)
+            errors += is_error(result)
+    wall = time.perf_counter() - wall_start
+
+    return {
+        'calls': len(inputs),
+        'errors': errors,
+        'wall_seconds': wall,
+        'throughput_per_s': len(inputs) / wall if wall else 0.0,
+        'latency_ms': percentiles(latencies)
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=REPO_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict:
+    random.seed(args.seed)
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = MockGroqServer(
+            port=0, latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate
+        ).start()
+        base_url = server.base_url
+    os.environ["GROQ_BASE_URL"] = base_url
+    api_key = os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory(prefix="moderation-bench-") as state_dir:
+        app = load_app(state_dir)
+        rules_text = app.format_rules_for_prompt(app.DEFAULT_FORUM_RULES)
+        article = app.fetch_article(f"{base_url}/artikel/benchmark")
+        context = app.build_article_context(article, args.context_budget)
+        # Fortlaufende Nummer macht jedes Posting einzigartig (kein Treffer im Ergebnis-Cache)
+        postings = [f"{SAMPLE_POSTINGS[i % len(SAMPLE_POSTINGS)]} (#{i})" for i in range(args.postings)]
+
+        scenario_inputs = {
+            'moderation': (
+                app.analyze_posting_with_llm,
+                [(p, article['title'], context['text'], api_key, args.model, rules_text) for p in postings]
+            ),
+            'question': (
+                app.detect_question_or_reaction_expectation,
+                [(p, article['title'], context['text'], api_key, args.model) for p in postings]
+            ),
+            'fetch_article': (
+                app.fetch_article,
+                [(f"{base_url}/artikel/{i}",) for i in range(args.postings)]
+            )
+        }
+        scenarios = {}
+        for name in args.scenarios:
+            func, inputs = scenario_inputs[name]
+            scenarios[name] = run_scenario(func, inputs, args.concurrency)
+            print(f"  {name:<14} fertig ({scenarios[name]['throughput_per_s']:.1f}/s)", file=sys.stderr)
+
+        prompt_tokens = {
+            'moderation': percentiles([
+                app.estimate_tokens(app.build_moderation_prompt(p, article['title'], context['text'], rules_text))
+                for p in postings
+            ]),
+            'question': percentiles([
+                app.estimate_tokens(app.build_question_prompt(p, article['title'], context['text']))
+                for p in postings
+            ]),
+            'article_context': context['context_tokens'],
+            'article_full': context['article_tokens']
+        }
+
+        cascade = app.get_cascade_stats().stats() if args.model == app.CASCADE_MODEL else None
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if server:
+        server.stop()
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('compare', 'output_dir')},
+        'mock': server.stats if server else None,
+        'scenarios': scenarios,
+        'prompt_tokens': prompt_tokens,
+        'cascade': cascade,
+        'memory_mb': {
+            'python_peak': peak / 2**20,
+            'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+        }
+    }
+
+
+def print_report(report: Dict):
+    print(f"\nBenchmark {report['timestamp']} @ {report['git_commit']}")
+    print(f"{'Szenario':<14} {'Aufrufe':>8} {'Fehler':>7} {'/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, s in report['scenarios'].items():
+        lat = s['latency_ms']
+        print(
+            f"{name:<14} {s['calls']:>8} {s['errors']:>7} {s['throughput_per_s']:>8.1f} "
+            f"{lat['p50']:>9.1f} {lat['p95']:>9.1f} {lat['p99']:>9.1f}"
+        )
+    tokens = report['prompt_tokens']
+    print(
+        f"Prompt-Tokens Moderation p50 {tokens['moderation']['p50']:.0f} · Fragen p50 {tokens['question']['p50']:.0f} · "
+        f"Artikel-Kontext {tokens['article_context']}/{tokens['article_full']}"
+    )
+    if report.get('cascade'):
+        cascade = report['cascade']
+        print(" · ".join(
+            f"Stufe {row['tier'] + 1} {row['model']} {row['share'] * 100:.0f}%" for row in cascade['by_tier']
+        ))
+        print(
+            f"Kaskade Ø {cascade['avg_time']:.2f}s · Ø ${cascade['avg_cost']:.5f}/Posting "
+            f"(nur größtes Modell ${cascade['avg_top_tier_cost']:.5f})"
+        )
+    print(f"Speicher: Python-Peak {report['memory_mb']['python_peak']:.1f} MB · RSS {report['memory_mb']['max_rss']:.1f} MB")
+
+
+def print_comparison(report: Dict, baseline: Dict):
+    """Relative Veränderung gegenüber einem früheren Lauf (positiv = langsamer bzw. mehr Durchsatz)"""
+    print(f"\nVergleich mit {baseline['git_commit']} ({baseline['timestamp']}):")
+    for name, s in report['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if not old:
+            continue
+        deltas = [
+            f"{key} {(s['latency_ms'][key] / old['latency_ms'][key] - 1) * 100:+.1f}%"
+            for key in ('p50', 'p95', 'p99') if old['latency_ms'].get(key)
+        ]
+        if old['throughput_per_s']:
+            deltas.append(f"Durchsatz {(s['throughput_per_s'] / old['throughput_per_s'] - 1) * 100:+.1f}%")
+        print(f"  {name:<14} " + " · ".join(deltas))
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline-Benchmark der Moderations-Pipeline")
+    parser.add_argument("--postings", type=int, default=200, help="Aufrufe pro Szenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--model", default="llama3-8b-8192", help="Modell oder 'cascade' für die Modell-Kaskade")
+    parser.add_argument("--context-budget", type=int, default=1200)
+    parser.add_argument("--latency", default="lognormal:0.3,0.35", help="Latenz-Verteilung des Mocks (siehe mock_groq_server.py)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--base-url", help="Externen Server verwenden statt den Mock im Prozess zu starten")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default=BENCHMARK_DIR)
+    parser.add_argument("--compare", help="Früheres Ergebnis-JSON zum Vergleich")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+    print_report(report)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(
+        args.output_dir, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{report['git_commit']}.json"
+    )
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nErgebnis gespeichert: {output_path}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
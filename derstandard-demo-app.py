@@ -1,20 +1,31 @@
 from PIL.Image import logger
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
-from groq import Groq
 import json
 from datetime import datetime
 import pandas as pd
-from typing import Dict, List, Tuple
+from typing import Dict
 import time
 import os
+import math
+import sys
 from dotenv import load_dotenv
-import logging
 
 # Load environment variables from .env file if it exists
 load_dotenv()
 
+# Pipeline, Caches und Metriken leben in moderation_engine (auch vom HTTP-Service genutzt)
+from moderation_engine import (
+    ANALYSIS_MODES, ARTICLE_CACHE_TTL, ARTICLE_ERROR_TTL, BULK_DEFAULT_CONCURRENCY,
+    CASCADE_MIN_CONFIDENCE, CASCADE_MODEL, MODEL_CASCADE, CONTEXT_DEFAULT_TOKEN_BUDGET, CONTEXT_METHODS, DEFAULT_FORUM_RULES, GROQ_HTTP2,
+    GROQ_HTTP_KEEPALIVE_EXPIRY, GROQ_HTTP_MAX_CONNECTIONS, GROQ_HTTP_MAX_KEEPALIVE,
+    HISTORY_PAGE_SIZES, LOCAL_DEFAULT_MIN_CONFIDENCE, PACK_MAX_POSTINGS, QUESTION_LOCAL_DEFAULT_MIN_CONFIDENCE,
+    REMODERATION_NEAR_CONFIDENCE, RETRIEVAL_DEFAULT_TOP_K, build_article_context, build_rule_set, context_stats, estimate_tokens, fetch_article,
+    format_prescorer_info, format_rule_diff, format_stage_times, get_article_fetcher, get_cascade_stats, get_client_pool,
+    get_digest_cache, get_duplicate_index, get_history_store, get_llm_scheduler, get_metrics,
+    get_prescorer, get_preclassifier_stats, get_result_cache, load_bulk_postings, moderate_postings_bulk,
+    new_bulk_output_path, plan_remoderation, remoderate_history, run_analysis, run_bulk_cli, warm_articles
+)
+
 # ====================================
 # CONFIG & SETUP
 # ====================================
@@ -62,284 +73,269 @@ st.markdown("""
 # FORENREGELN DEFINITION
 # ====================================
 
-DEFAULT_FORUM_RULES = {
-    "§1 DISKRIMINIERUNG": "Keine diskriminierenden Äußerungen bezüglich ethnischer Zugehörigkeit, Religion, Geschlecht, sexueller Orientierung, oder Behinderung.",
-    "§2 BELEIDIGUNG": "Keine persönlichen Beleidigungen, Beschimpfungen oder abwertenden Äußerungen über andere User oder Personen.",
-    "§3 GEWALT": "Keine Aufrufe zu Gewalt, Androhungen oder Verharmlosung von Gewalt.",
-    "§4 DESINFORMATION": "Keine wissentliche Verbreitung von Falschinformationen, insbesondere bei Gesundheits- oder Sicherheitsthemen.",
-    "§5 SPAM": "Kein Spam, keine Werbung, keine repetitiven Postings.",
-    "§6 RELEVANZ": "Postings müssen zum Artikelthema passen. Off-Topic Diskussionen sind zu vermeiden.",
-    "§7 HASSREDE": "Keine Hassrede oder extremistische Propaganda.",
-    "§8 PRIVATSPHÄRE": "Keine Veröffentlichung privater Informationen anderer Personen.",
-    "§9 TROLLING": "Kein absichtliches Stören der Diskussion oder Provokation.",
-    "§10 RESPEKT": "Respektvoller Umgang miteinander, auch bei Meinungsverschiedenheiten."
-}
-
 def get_forum_rules():
     """Get current forum rules from session state or default"""
     if 'forum_rules' not in st.session_state:
         st.session_state.forum_rules = DEFAULT_FORUM_RULES.copy()
     return st.session_state.forum_rules
 
-def format_rules_for_prompt():
-    """Format current rules as text for LLM prompt"""
-    rules = get_forum_rules()
-    return "FORENREGELN DER STANDARD:\n\n" + "\n\n".join([f"{rule}: {description}" for rule, description in rules.items()])
+def get_rule_set():
+    """Aktuelle, unveränderliche Regelwerk-Version der Sitzung (inkl. vorkompiliertem Prompt-Präfix)"""
+    if 'rule_set' not in st.session_state:
+        st.session_state.rule_set = build_rule_set(get_forum_rules())
+    return st.session_state.rule_set
+
+def set_forum_rules(rules: Dict, source: str = 'edit'):
+    """Ersetzt die Regeln durch eine neue Version; Bearbeitungen erzeugen nie In-Place-Änderungen"""
+    rule_set = build_rule_set(rules, source)
+    st.session_state.forum_rules = dict(rules)
+    st.session_state.rule_set = rule_set
+    get_history_store().record_rule_set(rule_set)
+    return rule_set
 
 # ====================================
-# HELPER FUNCTIONS
+# BEISPIEL-POSTINGS
 # ====================================
 
-@st.cache_data
-def fetch_article(url: str) -> Dict[str, str]:
-    """Fetcht einen DER STANDARD Artikel"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+EXAMPLE_POSTINGS = {
+    "Sachliche Kritik": "Die Wirtschaftspolitik der Regierung halte ich für verfehlt, weil die Steuerreform hauptsächlich Großkonzerne begünstigt.",
+    "Beleidigung": "Diese Politiker sind alle korrupte Idioten!",
+    "Diskriminierung": "Ausländer nehmen uns die Jobs weg und sollten alle zurück.",
+    "Konstruktiv": "Interessanter Artikel. Die Statistiken im dritten Absatz würde ich aber hinterfragen.",
+    "Gewaltandrohung": "Solche Leute gehören an die Wand gestellt!",
+    "Off-Topic Spam": "Besucht meine Website für günstige Kredite! www.spam.com",
+    "Ironie/Grenzfall": "Na super, noch mehr gute Nachrichten... genau was wir jetzt brauchen."
+}
+
+# ====================================
+# HISTORIE
+# ====================================
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+HISTORY_MAX_DETAILS = 5  # gleichzeitig aufgeklappte Einträge
+
+def cached_history_query(name: str, key: tuple, query):
+    """Ergebnis einer Historie-Abfrage aus dem Session State; neu abgefragt nur, wenn sich key ändert"""
+    cache = st.session_state.setdefault('history_queries', {})
+    hit = cache.get(name)
+    if hit is None or hit[0] != key:
+        hit = (key, query())
+        cache[name] = hit
+    return hit[1]
+
+def render_history_item(item: Dict, number: int):
+    """Details eines Eintrags (nur für ausgewählte Zeilen)"""
+    with st.container(border=True):
+        st.markdown(
+            f"{'🚫' if item['decision'] == 'LÖSCHEN' else '✅'} **Posting {number}:** {item['posting']}"
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write(f"**Entscheidung:** {item['decision']}")
+            st.write(f"**Konfidenz:** {item.get('confidence', 'N/A')}%")
+        with col2:
+            if item.get('violated_rules'):
+                st.write(f"**Regeln:** {', '.join(item['violated_rules'])}")
+            if item.get('timestamp'):
+                st.write(f"**Zeit:** {item['timestamp'].strftime('%d.%m. %H:%M:%S')}")
+            if item.get('rules_version'):
+                st.write(f"**Regelwerk:** `{item['rules_version']}`")
         
-        # DER STANDARD spezifische Selektoren
-        title = soup.find('h1', {'class': 'article-title'}) or soup.find('h1')
-        title_text = title.get_text(strip=True) if title else "Titel nicht gefunden"
+        # Fragen-Analyse anzeigen falls vorhanden
+        if item.get('question_analysis') and not item['question_analysis'].get('error', False):
+            qa = item['question_analysis']
+            st.write("**Fragen-Analyse:**")
+            col1, col2 = st.columns(2)
+            with col1:
+                has_q = "✅ Ja" if qa.get('has_questions', False) else "❌ Nein"
+                st.write(f"Fragen: {has_q}")
+            with col2:
+                expects_r = "✅ Ja" if qa.get('expects_reactions', False) else "❌ Nein"
+                st.write(f"Erwarte Reaktion: {expects_r}")
+            
+            if qa.get('target_audience', 'Unbekannt') != 'Unbekannt':
+                st.write(f"Zielgruppe: {qa['target_audience']}")
         
-        # Artikel-Text extrahieren
-        article_body = soup.find('div', {'class': 'article-body'}) or soup.find('article')
+        st.write("**Begründung:**")
+        st.text(item.get('explanation', 'Keine Begründung'))
 
-        if article_body:
-            paragraphs = article_body.find_all('p')
-            content = '\n'.join([p.get_text(strip=True) for p in paragraphs])  # Alle Paragraphen
-        else:
-            content = "Artikelinhalt konnte nicht extrahiert werden."
-        
-        return {
-            'title': title_text,
-            'content': content,  # Vollständiger Artikelinhalt ohne Begrenzung
-            'url': url,
-            'success': True
-        }
-    except Exception as e:
-        return {
-            'title': 'Fehler beim Laden',
-            'content': f'Artikel konnte nicht geladen werden: {str(e)}',
-            'url': url,
-            'success': False
-        }
-
-def detect_question_or_reaction_expectation(
-    posting: str, 
-    article_title: str, 
-    article_content: str,
-    api_key: str,
-    model: str = "llama3-8b-8192"
-) -> Dict:
-    """Analysiert ob ein Posting Fragen stellt oder Reaktionen erwartet"""
+@st.fragment
+def render_history():
+    """Historie-Tab als Fragment: Filter, Blättern und Auswahl rerunnen nur diesen Teil.
+
+    Bei Reruns der übrigen App (z.B. Tippen im Moderations-Tab) kommen Filter,
+    Anzahl und Seite aus dem Session State, solange die Historie keine neuen
+    Einträge hat. Die Seite wird als Tabelle dargestellt; Details werden nur
+    für ausgewählte Zeilen geladen und aufgebaut.
+    """
+    st.header("💾 Analyse-Historie")
     
-    if not api_key:
-        return {
-            'has_questions': False,
-            'expects_reactions': False,
-            'target_audience': 'Unbekannt',
-            'explanation': 'Bitte API Key eingeben!',
-            'error': True
-        }
+    history_store = get_history_store()
+    revision = history_store.revision
+    if st.session_state.get('history_revision') != revision:
+        history_store.flush()
+        st.session_state.history_revision = revision
     
-    try:
-        client = Groq(api_key=api_key)
-        
-        prompt = f"""Du bist ein Experte für Kommunikationsanalyse. Analysiere das folgende Posting darauf, ob der Autor:
-
-1. FRAGEN stellt (direkte oder indirekte Fragen)
-2. REAKTIONEN ERWARTET (Statements die eine Antwort/Diskussion provozieren sollen)
-
-ARTIKEL KONTEXT:
-Titel: {article_title}
-Inhalt: {article_content}
-
-POSTING ZU ANALYSIEREN:
-"{posting}"
-
-ANALYSIERE:
-- Enthält das Posting direkte Fragen? (Fragezeichen, W-Fragen, etc.)
-- Enthält das Posting indirekte Fragen oder rhetorische Fragen?
-- Macht der Autor Aussagen, die eine Reaktion erwarten?
-- An wen richtet sich der Autor? (Journalist, Redaktion, andere User, Politiker, etc.)
-
-BEISPIELE FÜR REAKTIONS-ERWARTENDE AUSSAGEN:
-- "Was sagt ihr dazu?"
-- "Wie seht ihr das?"
-- "Das kann doch nicht sein!"
-- "Wer hat sich das ausgedacht?"
-- Provokante Behauptungen
-- Direkte Kritik an Personen/Institutionen
-- Aufrufe zur Diskussion
-
-Antworte im JSON Format:
-{{
-    "has_questions": true/false,
-    "expects_reactions": true/false,
-    "target_audience": "Journalist/Redaktion/User/Politiker/Allgemein/Unbekannt",
-    "explanation": "Kurze deutsche Erklärung der Analyse",
-    "question_type": "Direkte Frage/Indirekte Frage/Rhetorische Frage/Keine",
-    "reaction_indicators": ["Liste von Indikatoren falls vorhanden"]
-}}"""
-
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=1000
-        )
-        
-        response_text = completion.choices[0].message.content
-        
-        # Parse JSON from response
-        try:
-            import re
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group())
-            else:
-                result = json.loads(response_text)
-                
-            result['error'] = False
-            return result
-        except json.JSONDecodeError:
-            # Fallback wenn JSON parsing fehlschlägt
-            return {
-                'has_questions': '?' in posting,
-                'expects_reactions': True,
-                'target_audience': 'Unbekannt',
-                'explanation': 'JSON-Parsing fehlgeschlagen, Fallback-Analyse verwendet',
-                'question_type': 'Unbekannt',
-                'reaction_indicators': [],
-                'error': False
-            }
-            
-    except Exception as e:
-        return {
-            'has_questions': False,
-            'expects_reactions': False,
-            'target_audience': 'Unbekannt',
-            'explanation': f'Fehler bei der Analyse: {str(e)}',
-            'question_type': 'Fehler',
-            'reaction_indicators': [],
-            'error': True
-        }
-
-def analyze_posting_with_llm(
-    posting: str, 
-    article_title: str, 
-    article_content: str,
-    api_key: str,
-    model: str = "llama3-8b-8192"
-) -> Dict:
-    """Analysiert ein Posting mit Llama via Groq"""
+    # Filter
+    filter_options = cached_history_query(
+        'filter_options', (revision,),
+        lambda: {column: history_store.distinct(column) for column in ('decision', 'rule', 'article_url', 'rules_version')}
+    )
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        history_decision = st.selectbox("Entscheidung", ["Alle"] + filter_options['decision'], key="history_decision")
+    with col2:
+        history_rule = st.selectbox("Regel", ["Alle"] + filter_options['rule'], key="history_rule")
+    with col3:
+        history_article = st.selectbox("Artikel", ["Alle"] + filter_options['article_url'], key="history_article")
+    with col4:
+        history_rules_version = st.selectbox("Regelwerk", ["Alle"] + filter_options['rules_version'], key="history_rules_version")
+    history_filters = {
+        'decision': None if history_decision == "Alle" else history_decision,
+        'rule': None if history_rule == "Alle" else history_rule,
+        'article_url': None if history_article == "Alle" else history_article,
+        'rules_version': None if history_rules_version == "Alle" else history_rules_version
+    }
+    filter_key = tuple(history_filters.values())
+    history_total = cached_history_query('count', (revision, filter_key), lambda: history_store.count(**history_filters))
     
-    if not api_key:
-        return {
-            'decision': 'ERROR',
-            'confidence': 0,
-            'violated_rules': [],
-            'explanation': 'Bitte API Key eingeben!'
-        }
+    if not history_total:
+        st.info("Noch keine Historie vorhanden.")
+        return
     
-    try:
-        client = Groq(api_key=api_key)
-        
-        prompt = f"""Du bist ein erfahrener Foren-Moderator für DER STANDARD. Analysiere das folgende Posting nach unseren Forenregeln.
-
-MODERATION PRINZIPIEN:
-- Bevorzuge FREISCHALTEN bei Grenzfällen und Unsicherheiten
-- Berücksichtige Kontext, Ironie, Sarkasmus und emotionale Reaktionen
-- Lösche bei Regelverstößen
-- Unterscheide zwischen konstruktiver Kritik und echten Beleidigungen
-
-FORENREGELN:
-{format_rules_for_prompt()}
-
-ARTIKEL KONTEXT:
-Titel: {article_title}
-Inhalt: {article_content}
-
-POSTING ZU BEWERTEN:
-"{posting}"
-
-AUFGABE:
-1. Entscheide: LÖSCHEN oder FREISCHALTEN
-2. Bei LÖSCHEN: Welche Regel(n) wurden eindeutig und schwerwiegend verletzt?
-3. Gib eine Konfidenz-Score (0-100)
-4. Erkläre die Entscheidung ausführlich und begründe warum du tolerant/strikt warst
-5. Die Begründung sollte höchstens zwei Sätze lang und auf deutsch sein.
-
-Antworte im JSON Format:
-{{
-    "decision": "LÖSCHEN/FREISCHALTEN",
-    "confidence": 0-100,
-    "violated_rules": ["§X", "§Y"],
-    "explanation": "Begründung"
-}}"""
-
-        # Log the final prompt to console
-        print("="*80)
-        print("FINAL PROMPT SENT TO LLM:")
-        print("="*80)
-        print(prompt)
-        print("="*80)
-
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,  # Erhöht für nuanciertere, weniger strikte Antworten
-            max_tokens=2000
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("Einträge pro Seite", HISTORY_PAGE_SIZES, index=1, key="history_page_size")
+    with col2:
+        page_count = max(1, math.ceil(history_total / page_size))
+        page_number = st.number_input(
+            f"Seite (von {page_count})", min_value=1, max_value=page_count, value=1, key="history_page"
         )
-        
-        response_text = completion.choices[0].message.content
-        
-        # Parse JSON from response
-        try:
-            # Extrahiere JSON aus der Antwort
-            import re
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group())
-            else:
-                result = json.loads(response_text)
-                
-            return result
-        except json.JSONDecodeError:
-            # Fallback wenn JSON parsing fehlschlägt
-            return {
-                'decision': 'LÖSCHEN' if 'LÖSCHEN' in response_text else 'FREISCHALTEN',
-                'confidence': 75,
-                'violated_rules': [],
-                'explanation': response_text
-            }
-            
-    except Exception as e:
-        return {
-            'decision': 'ERROR',
-            'confidence': 0,
-            'violated_rules': [],
-            'explanation': f'Fehler bei der Analyse: {str(e)}'
-        }
+    page_offset = (int(page_number) - 1) * page_size
+    history_page = cached_history_query(
+        'page', (revision, filter_key, page_size, page_offset),
+        lambda: history_store.summaries(page_size, page_offset, **history_filters)
+    )
+    st.caption(f"{history_total} Einträge · zeige {page_offset + 1}–{page_offset + len(history_page)}")
+    
+    # Export Button (alle Einträge des aktuellen Filters)
+    if st.button("📥 Historie als JSON exportieren"):
+        history_json = json.dumps(
+            [
+                {
+                    'posting': h['posting'],
+                    'decision': h['decision'],
+                    'confidence': h.get('confidence'),
+                    'violated_rules': h.get('violated_rules'),
+                    'explanation': h.get('explanation'),
+                    'question_analysis': h.get('question_analysis', {}),
+                    'rules_version': h.get('rules_version'),
+                    'source': h.get('source'),
+                    'timestamp': h.get('timestamp').isoformat() if h.get('timestamp') else None
+                }
+                for h in history_store.page(history_total, 0, **history_filters)
+            ],
+            indent=2,
+            ensure_ascii=False
+        )
+        st.download_button(
+            label="Download JSON",
+            data=history_json,
+            file_name=f"moderation_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json"
+        )
+    
+    # Historie-Tabelle (st.dataframe rendert nur die sichtbaren Zeilen)
+    df_history = pd.DataFrame(
+        [
+            (
+                '🚫' if item['decision'] == 'LÖSCHEN' else '✅',
+                history_total - page_offset - idx,
+                item['timestamp'].strftime('%d.%m. %H:%M:%S'),
+                item['decision'],
+                item['confidence'],
+                item['violated_rules'],
+                item['posting']
+            )
+            for idx, item in enumerate(history_page)
+        ],
+        columns=['', 'Nr.', 'Zeit', 'Entscheidung', 'Konfidenz', 'Regeln', 'Posting']
+    )
+    selection = st.dataframe(
+        df_history,
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="multi-row",
+        # Auswahl gilt nur für diese Seite und diese Filter
+        key="history_table|" + "|".join(str(v) for v in (page_size, page_offset) + filter_key)
+    )
+    
+    selected_rows = selection.selection.rows
+    if not selected_rows:
+        st.caption(f"Zeilen auswählen, um Details anzuzeigen (bis zu {HISTORY_MAX_DETAILS}).")
+    for row in selected_rows[:HISTORY_MAX_DETAILS]:
+        item = history_store.get(history_page[row]['history_id'])
+        if item:
+            render_history_item(item, history_total - page_offset - row)
 
 # ====================================
-# BEISPIEL-POSTINGS
+# NACH-MODERATION
 # ====================================
 
-EXAMPLE_POSTINGS = {
-    "Sachliche Kritik": "Die Wirtschaftspolitik der Regierung halte ich für verfehlt, weil die Steuerreform hauptsächlich Großkonzerne begünstigt.",
-    "Beleidigung": "Diese Politiker sind alle korrupte Idioten!",
-    "Diskriminierung": "Ausländer nehmen uns die Jobs weg und sollten alle zurück.",
-    "Konstruktiv": "Interessanter Artikel. Die Statistiken im dritten Absatz würde ich aber hinterfragen.",
-    "Gewaltandrohung": "Solche Leute gehören an die Wand gestellt!",
-    "Off-Topic Spam": "Besucht meine Website für günstige Kredite! www.spam.com",
-    "Ironie/Grenzfall": "Na super, noch mehr gute Nachrichten... genau was wir jetzt brauchen."
-}
+@st.fragment(run_every=1.0)
+def render_remoderation_progress():
+    """Fortschritt des laufenden Nach-Moderations-Jobs; nach dem Ende einmal die ganze App neu laden"""
+    job = st.session_state.remoderation_job
+    if job['future'].done():
+        try:
+            st.session_state.last_remoderation = job['future'].result()
+        except Exception as e:
+            st.session_state.last_remoderation = {'error': str(e)}
+        del st.session_state.remoderation_job
+        st.rerun()
+    progress = job['progress']
+    st.progress(
+        progress['done'] / max(1, progress['total']),
+        text=f"{progress['done']}/{progress['total']} Postings neu moderiert · {progress['flipped']} umgeschlagen"
+    )
+
+def render_remoderation_report(report: Dict):
+    """Ergebnis des letzten Nach-Moderations-Laufs"""
+    if report.get('error'):
+        st.error(f"Nach-Moderation fehlgeschlagen: {report['error']}")
+        return
+    outcomes = report['outcomes']
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Neu moderiert", report['candidates'])
+    with col2:
+        st.metric("Umgeschlagen", outcomes.get('flipped', 0))
+    with col3:
+        st.metric("Unverändert", outcomes.get('unchanged', 0))
+    with col4:
+        st.metric("Fehler/übersprungen", outcomes.get('error', 0) + outcomes.get('skipped', 0))
+    st.caption(
+        f"`{report['old_version']}` → `{report['new_version']}` · {format_rule_diff(report['diff'])} · "
+        f"{report['duration']:.1f}s"
+    )
+    if report['flipped']:
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    (
+                        row['old_decision'],
+                        row['new_decision'],
+                        row['reason'],
+                        ', '.join(row['new_rules'] or row['old_rules']),
+                        row['posting']
+                    )
+                    for row in report['flipped']
+                ],
+                columns=['Bisher', 'Neu', 'Grund', 'Regeln', 'Posting']
+            ),
+            hide_index=True,
+            use_container_width=True
+        )
 
 # ====================================
 # MAIN APP
@@ -411,14 +407,126 @@ def main():
         
         model = st.selectbox(
             "LLM Modell",
-            ["llama3-8b-8192", "llama-3.3-70b-versatile", "openai/gpt-oss-120b"],
-            help="Verschiedene Modelle für Tests"
+            ["llama3-8b-8192", "llama-3.3-70b-versatile", "openai/gpt-oss-120b", CASCADE_MODEL],
+            format_func=lambda m: "Kaskade (" + " → ".join(MODEL_CASCADE) + ")" if m == CASCADE_MODEL else m,
+            help="Verschiedene Modelle für Tests. Die Kaskade beginnt mit dem schnellsten Modell und eskaliert "
+                 f"bei Konfidenz unter {CASCADE_MIN_CONFIDENCE}%, §3/§7 oder ungültiger Antwort"
+        )
+        
+        analysis_mode = st.selectbox(
+            "Analyse-Modus",
+            list(ANALYSIS_MODES),
+            format_func=ANALYSIS_MODES.get,
+            help="Kombiniert spart einen LLM-Aufruf, Parallel halbiert die Wartezeit"
+        )
+        
+        use_local = st.checkbox(
+            "Lokale Vorklassifizierung",
+            value=True,
+            help="Eindeutige Fälle (Spam-Links, Hass-Begriffe, direkte Drohungen, kurze Zustimmung) ohne LLM entscheiden"
+        )
+        local_min_confidence = None
+        shadow_local = False
+        if use_local:
+            local_min_confidence = st.slider(
+                "Min. Konfidenz für lokale Entscheidung",
+                min_value=50,
+                max_value=100,
+                value=LOCAL_DEFAULT_MIN_CONFIDENCE,
+                help="Darunter wird das Posting ans LLM weitergegeben"
+            )
+            shadow_local = st.checkbox(
+                "Schattenmodus (LLM trotzdem fragen)",
+                help="Lokale Entscheidung gilt, das LLM-Urteil wird nur zur Übereinstimmungsmessung eingeholt"
+            )
+        
+        prescorer_trained = get_prescorer().trained
+        use_prescorer = st.checkbox(
+            "Gelernter Vorfilter",
+            value=prescorer_trained,
+            disabled=not prescorer_trained,
+            help=(
+                "Risiko-Score aus früheren LLM-Entscheidungen: sehr niedrige Scores werden freigeschaltet, "
+                "sehr hohe gelöscht, alle anderen ans LLM (im Bulk-Modus riskante zuerst)"
+                if prescorer_trained else "Noch nicht trainiert – siehe Analyse → Gelernter Vorfilter"
+            )
+        )
+        
+        use_local_questions = st.checkbox(
+            "Lokale Fragen-Erkennung",
+            value=True,
+            help="Eindeutige Fragen/Diskussionsaufrufe ohne zweiten LLM-Aufruf erkennen"
+        )
+        question_local_min_confidence = None
+        if use_local_questions:
+            question_local_min_confidence = st.slider(
+                "Min. Konfidenz für lokale Fragen-Erkennung",
+                min_value=0.5,
+                max_value=1.0,
+                value=QUESTION_LOCAL_DEFAULT_MIN_CONFIDENCE,
+                step=0.05,
+                help="Darunter übernimmt das LLM die Fragen-Analyse"
+            )
+        
+        use_streaming = st.checkbox(
+            "Streaming",
+            value=True,
+            help="Entscheidung und Konfidenz anzeigen, sobald sie feststehen; die Begründung folgt"
+        )
+        
+        duplicate_check = st.checkbox(
+            "Duplikat-Erkennung (§5)",
+            value=True,
+            help="(Nahezu) identische Postings der letzten 24h erkennen, frühere Entscheidungen übernehmen und Wiederholungen ans LLM melden"
+        )
+        
+        context_budget = st.number_input(
+            "Artikel-Kontext: Token-Budget",
+            min_value=0,
+            max_value=32000,
+            value=CONTEXT_DEFAULT_TOKEN_BUDGET,
+            step=100,
+            help="Längere Artikel werden auf dieses Budget verdichtet (0 = vollständiger Artikel)"
         )
         
+        context_method = st.selectbox(
+            "Kontext-Verdichtung",
+            list(CONTEXT_METHODS),
+            format_func=CONTEXT_METHODS.get
+        )
+        
+        context_top_k = RETRIEVAL_DEFAULT_TOP_K
+        if context_method == 'retrieval':
+            context_top_k = st.number_input(
+                "Relevante Absätze (Top-k)",
+                min_value=1,
+                max_value=20,
+                value=RETRIEVAL_DEFAULT_TOP_K,
+                help="Nur die k zum Posting passendsten Absätze gehen in den Prompt"
+            )
+        
+        bulk_concurrency = st.number_input(
+            "Bulk: Max. parallele Anfragen",
+            min_value=1,
+            max_value=64,
+            value=BULK_DEFAULT_CONCURRENCY,
+            help="Begrenzt die gleichzeitigen LLM-Aufrufe im Bulk-Modus"
+        )
+        
+        with st.expander("🔌 Verbindungspool"):
+            pool_stats = get_client_pool().stats()
+            if pool_stats:
+                st.dataframe(pd.DataFrame(pool_stats), hide_index=True, use_container_width=True)
+            else:
+                st.caption("Noch keine Verbindungen geöffnet.")
+            st.caption(
+                f"Max. Verbindungen: {GROQ_HTTP_MAX_CONNECTIONS} · Keep-Alive: {GROQ_HTTP_MAX_KEEPALIVE} "
+                f"({GROQ_HTTP_KEEPALIVE_EXPIRY:.0f}s) · HTTP/2: {'an' if GROQ_HTTP2 else 'aus'}"
+            )
 
     
     # Main Content Area
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📝 Moderation", "📊 Analyse", "📚 Regeln", "⚙️ Regeln Konfiguration", "💾 Historie"])
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📝 Moderation", "📊 Analyse", "📚 Regeln", "⚙️ Regeln Konfiguration", "💾 Historie", "📦 Bulk-Moderation"])
     
     with tab1:
         st.header("1️⃣ Artikel laden")
@@ -449,6 +557,7 @@ def main():
                 with st.expander("📰 **Artikel-Kontext**", expanded=True):
                     st.subheader(article['title'])
                     st.caption(f"🔗 {article['url']}")
+                    st.caption(f"📏 ≈ {estimate_tokens(article['content']):,} Tokens · Budget für KI-Kontext: {int(context_budget):,}")
                     st.text(article['content'])
             else:
                 st.error(article['content'])
@@ -510,40 +619,56 @@ def main():
 
         # Analyse durchführen
         if analyze_button and posting_text and 'article' in st.session_state:
+            live_decision = st.empty()
+            
+            def show_partial(fields: Dict):
+                if 'decision' not in fields or 'confidence' not in fields:
+                    return
+                icon = '🚫' if fields['decision'] == 'LÖSCHEN' else '✅'
+                live_decision.info(
+                    f"{icon} **{fields['decision']}** ({fields['confidence']}%) – Begründung folgt …\n\n"
+                    f"{fields.get('explanation', fields.get('explanation_partial', ''))}"
+                )
+            
             with st.spinner("🤖 KI analysiert Posting..."):
-                start_time = time.time()
+                # Artikel-Kontext auf das Token-Budget bringen (Digest einmal pro Artikel)
+                context = build_article_context(
+                    st.session_state.article,
+                    int(context_budget),
+                    context_method,
+                    api_key,
+                    model,
+                    posting=posting_text,
+                    top_k=int(context_top_k)
+                )
                 
-                # Erste Analyse: Moderation
-                result = analyze_posting_with_llm(
+                # Moderation und Fragen-/Reaktions-Analyse im gewählten Modus
+                result = run_analysis(
                     posting_text,
                     st.session_state.article['title'],
-                    st.session_state.article['content'],
+                    context['text'],
                     api_key,
-                    model
+                    model,
+                    analysis_mode,
+                    rules_text=get_rule_set().text,
+                    local_min_confidence=local_min_confidence,
+                    shadow_local=shadow_local,
+                    question_local_min_confidence=question_local_min_confidence,
+                    article_url=st.session_state.article.get('url'),
+                    duplicate_check=duplicate_check,
+                    prescore=use_prescorer,
+                    on_update=show_partial if use_streaming else None
                 )
+                live_decision.empty()
                 
-                # Zweite Analyse: Fragen und Reaktions-Erwartung (separater LLM Call)
-                with st.spinner("🔍 Analysiere Fragen und Reaktions-Erwartung..."):
-                    question_analysis = detect_question_or_reaction_expectation(
-                        posting_text,
-                        st.session_state.article['title'],
-                        st.session_state.article['content'],
-                        api_key,
-                        model
-                    )
-                
-                analysis_time = time.time() - start_time
-                result['analysis_time'] = analysis_time
+                result['context_stats'] = context_stats(context)
                 result['posting'] = posting_text
                 result['timestamp'] = datetime.now()
-                result['question_analysis'] = question_analysis  # Füge die neue Analyse hinzu
                 
                 st.session_state.last_analysis = result
                 
-                # Add to history
-                if 'history' not in st.session_state:
-                    st.session_state.history = []
-                st.session_state.history.append(result)
+                # In die persistente Historie (asynchron geschrieben)
+                get_history_store().record(result)
         
         # Ergebnis anzeigen
         if 'last_analysis' in st.session_state:
@@ -561,6 +686,8 @@ def main():
                     st.metric("Konfidenz", f"{result.get('confidence', 0)}%")
                 with col2:
                     st.metric("Analyse-Zeit", f"{result.get('analysis_time', 0):.2f}s")
+                    if result.get('stage_times'):
+                        st.caption(format_stage_times(result))
                 
                 if result.get('violated_rules'):
                     st.warning(f"**Verletzte Regeln:** {', '.join(result['violated_rules'])}")
@@ -573,9 +700,63 @@ def main():
                     st.metric("Konfidenz", f"{result.get('confidence', 0)}%")
                 with col2:
                     st.metric("Analyse-Zeit", f"{result.get('analysis_time', 0):.2f}s")
+                    if result.get('stage_times'):
+                        st.caption(format_stage_times(result))
             else:
                 st.error(f"❌ Fehler bei der Analyse")
             
+            if result.get('source') == 'local':
+                st.caption(
+                    f"⚡ Lokal entschieden (ohne LLM) · Signale: {', '.join(result.get('local_signals', []))}"
+                    + (f" · LLM (Schatten): {result['shadow_llm_decision']}" if result.get('shadow_llm_decision') else "")
+                )
+            elif result.get('source') == 'prescorer':
+                st.caption(
+                    f"🧠 Vom gelernten Vorfilter entschieden (ohne LLM) · Risiko-Score {result['prescore']['risk']:.3f}"
+                    + (f" · LLM (Schatten): {result['shadow_llm_decision']}" if result.get('shadow_llm_decision') else "")
+                )
+            elif result.get('prescore'):
+                st.caption(f"🧠 Vorfilter-Risiko {result['prescore']['risk']:.3f} – außerhalb der Auto-Bereiche, vom LLM entschieden")
+            
+            if result.get('time_to_decision'):
+                st.caption(f"⏱️ Entscheidung nach {result['time_to_decision']:.2f}s (gestreamt)")
+            
+            if result.get('duplicate'):
+                dup = result['duplicate']
+                st.caption(
+                    f"🔁 {'Identisches' if dup['match'] == 'exact' else 'Nahezu identisches'} Posting bereits "
+                    f"{dup['seen_global']}× gesehen (davon {dup['seen_article']}× in diesem Artikel)"
+                    + (" · frühere Entscheidung übernommen" if result.get('source') == 'duplicate' else "")
+                )
+            
+            if result.get('cached'):
+                st.caption("⚡ Ergebnis aus dem Cache (identisches Posting bei gleichen Regeln, Artikel und Modell)")
+            
+            if result.get('cascade'):
+                cascade = result['cascade']
+                st.caption(
+                    f"🪜 Kaskade: entschieden von {cascade['model']} (Stufe {cascade['tier'] + 1}) · "
+                    + " → ".join(
+                        f"{step['model']} {step['confidence'] or 0}%" + (f" ({step['escalation']})" if step['escalation'] else "")
+                        for step in cascade['steps']
+                    )
+                    + f" · ≈ ${cascade['cost']:.5f}"
+                )
+            
+            if result.get('context_stats'):
+                ctx = result['context_stats']
+                st.caption(
+                    f"📏 Prompt ≈ {result.get('prompt_tokens', 0):,} Tokens · "
+                    f"Artikel-Kontext {ctx['context_tokens']:,}/{ctx['article_tokens']:,} Tokens "
+                    f"({CONTEXT_METHODS.get(ctx['method'], 'vollständig')}"
+                    f"{(', Index aus Cache' if ctx['method'] == 'retrieval' else ', Digest aus Cache') if ctx['digest_cached'] else ''})"
+                )
+                if ctx.get('paragraphs_used') is not None:
+                    st.caption(
+                        f"🔎 Relevante Absätze: {', '.join(str(i + 1) for i in ctx['paragraphs_used'])} "
+                        f"von {ctx['paragraphs_total']}"
+                    )
+            
             # Begründung
             with st.expander("💭 **KI-Begründung**", expanded=True):
                 st.write(result.get('explanation', 'Keine Begründung verfügbar'))
@@ -615,6 +796,9 @@ def main():
                     for indicator in qa['reaction_indicators']:
                         st.markdown(f"• {indicator}")
                 
+                if qa.get('source') == 'local':
+                    st.caption(f"⚡ Lokal erkannt (ohne LLM), Konfidenz {qa.get('local_confidence', 0):.2f}")
+                
                 # Erklärung der Fragen-Analyse
                 with st.expander("💬 **Erklärung der Fragen-Analyse**"):
                     st.write(qa.get('explanation', 'Keine Erklärung verfügbar'))
@@ -631,15 +815,16 @@ def main():
     with tab2:
         st.header("📊 Analyse Dashboard")
         
-        if 'history' in st.session_state and st.session_state.history:
+        summary = get_history_store().aggregates.snapshot()
+        
+        if summary['total']:
             # Statistiken
             col1, col2, col3, col4 = st.columns(4)
             
-            total = len(st.session_state.history)
-            deleted = sum(1 for h in st.session_state.history if h['decision'] == 'LÖSCHEN')
-            approved = sum(1 for h in st.session_state.history if h['decision'] == 'FREISCHALTEN')
-            avg_confidence = sum(h.get('confidence', 0) for h in st.session_state.history) / total if total > 0 else 0
-            avg_time = sum(h.get('analysis_time', 0) for h in st.session_state.history) / total if total > 0 else 0
+            total = summary['total']
+            deleted = summary['deleted']
+            avg_confidence = summary['avg_confidence']
+            avg_time = summary['avg_time']
             
             with col1:
                 st.metric("Gesamt", total)
@@ -650,24 +835,236 @@ def main():
             with col4:
                 st.metric("Ø Zeit", f"{avg_time:.2f}s")
             
+            latency = summary['latency_quantiles']
+            confidence = summary['confidence_quantiles']
+            st.caption(
+                f"Analyse-Zeit p50 {latency[0.5]:.2f}s · p95 {latency[0.95]:.2f}s · p99 {latency[0.99]:.2f}s · "
+                f"Konfidenz Median {confidence[0.5]}% · p90 {confidence[0.9]}%"
+            )
+            
             # Violations Chart
             st.subheader("Häufigste Regelverstöße")
-            violations = {}
-            for h in st.session_state.history:
-                for rule in h.get('violated_rules', []):
-                    violations[rule] = violations.get(rule, 0) + 1
+            violations = summary['rule_counts']
             
             if violations:
                 df = pd.DataFrame(violations.items(), columns=['Regel', 'Anzahl'])
                 st.bar_chart(df.set_index('Regel'))
             
+            # Zeit pro Analyse-Modus (Vergleich sequenziell/parallel/kombiniert)
+            mode_times = summary['mode_times']
+            if len(mode_times) > 1:
+                st.subheader("Ø Analyse-Zeit pro Modus")
+                df_modes = pd.DataFrame(
+                    [(ANALYSIS_MODES.get(m, m), avg, n) for m, (avg, n) in mode_times.items()],
+                    columns=['Modus', 'Ø Zeit (s)', 'Anzahl']
+                )
+                st.dataframe(df_modes, hide_index=True, use_container_width=True)
+            
             # Konfidenz-Verteilung
             st.subheader("Konfidenz-Verteilung")
-            confidences = [h.get('confidence', 0) for h in st.session_state.history]
-            st.line_chart(confidences)
+            df_confidence = pd.DataFrame(
+                [(f"{bucket}-{bucket + 9 if bucket < 90 else 100}", n) for bucket, n in summary['confidence_buckets'].items()],
+                columns=['Konfidenz', 'Anzahl']
+            )
+            st.bar_chart(df_confidence.set_index('Konfidenz'))
             
         else:
             st.info("Noch keine Analysen durchgeführt. Starten Sie mit der Moderation!")
+        
+        # Ergebnis-Cache (prozessweit, über Neustarts hinweg)
+        st.subheader("⚡ Ergebnis-Cache")
+        cache_stats = get_result_cache().stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Treffer", cache_stats['hits'])
+        with col2:
+            st.metric("Fehlgriffe", cache_stats['misses'])
+        with col3:
+            st.metric("Trefferquote", f"{cache_stats['hit_rate'] * 100:.1f}%")
+        with col4:
+            st.metric("Einträge", cache_stats['entries'])
+        
+        if cache_stats['by_kind']:
+            df_cache = pd.DataFrame(
+                [(kind, v['hits'], v['misses']) for kind, v in cache_stats['by_kind'].items()],
+                columns=['Analyse', 'Treffer', 'Fehlgriffe']
+            )
+            st.dataframe(df_cache, hide_index=True, use_container_width=True)
+        
+        if st.button("🧹 Cache leeren"):
+            get_result_cache().clear()
+            st.rerun()
+        
+        # Artikel-Abruf: TTL-Cache, Revalidierung und Vorwärmen vieler Artikel
+        st.subheader("📰 Artikel-Cache")
+        fetch_stats = get_article_fetcher().stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Treffer", fetch_stats['hit'])
+        with col2:
+            st.metric("Revalidiert (304)", fetch_stats['revalidated'])
+        with col3:
+            st.metric("Geladen", fetch_stats['fetched'])
+        with col4:
+            st.metric("Fehler", fetch_stats['error'])
+        st.caption(
+            f"{fetch_stats['entries']} Artikel im Cache ({fetch_stats['failed_entries']} Fehler, verfallen nach "
+            f"{ARTICLE_ERROR_TTL:.0f}s) · frisch für {ARTICLE_CACHE_TTL:.0f}s · Parser: {fetch_stats['parser']}"
+        )
+
+        warm_urls = st.text_area("Artikel vorwärmen (eine URL pro Zeile)", key="warm_urls", height=100)
+        if st.button("🔥 Vorwärmen") and warm_urls.strip():
+            urls = [line.strip() for line in warm_urls.splitlines() if line.strip()]
+            with st.spinner(f"Lade {len(urls)} Artikel..."):
+                warmed = warm_articles(urls)
+            loaded = sum(1 for a in warmed.values() if a['success'])
+            st.success(f"{loaded}/{len(warmed)} Artikel geladen.")
+
+        # Lokale Vorklassifizierung: Trefferquote und Übereinstimmung mit dem LLM
+        st.subheader("🧮 Lokale Vorklassifizierung")
+        local_stats = get_preclassifier_stats().stats()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Lokal entschieden", f"{local_stats['decided_locally']}/{local_stats['total']}")
+        with col2:
+            st.metric("Trefferquote", f"{local_stats['hit_rate'] * 100:.1f}%")
+        with col3:
+            agreement = local_stats['agreement']
+            st.metric("Übereinstimmung mit LLM", f"{agreement * 100:.1f}%" if agreement is not None else "–")
+        
+        if local_stats['by_confidence']:
+            st.caption("Übereinstimmung je lokaler Konfidenz (Kandidaten unter der Schwelle und Schattenmodus) – Grundlage für die Schwellen-Einstellung:")
+            df_local = pd.DataFrame(
+                [
+                    (conf, b['compared'], f"{b['agreed'] / b['compared'] * 100:.0f}%")
+                    for conf, b in local_stats['by_confidence'].items()
+                ],
+                columns=['Lokale Konfidenz', 'Verglichen', 'Übereinstimmung']
+            )
+            st.dataframe(df_local, hide_index=True, use_container_width=True)
+        
+        # Gelernter Vorfilter: Training aus der Historie, kalibrierte Schwellen, Übereinstimmung
+        st.subheader("🧠 Gelernter Vorfilter")
+        prescorer_stats = get_prescorer().stats()
+        if prescorer_stats['trained']:
+            model_info = prescorer_stats['model']
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Ohne LLM entschieden", f"{prescorer_stats['auto_approved'] + prescorer_stats['auto_deleted']}/{prescorer_stats['scored']}")
+            with col2:
+                st.metric("Entscheidungsquote", f"{prescorer_stats['decided_share'] * 100:.1f}%")
+            with col3:
+                agreement = prescorer_stats['agreement']
+                st.metric("Übereinstimmung mit LLM", f"{agreement * 100:.1f}%" if agreement is not None else "–")
+            st.caption(f"Trainiert am {model_info['trained_at']}:")
+            st.text(format_prescorer_info(model_info))
+        else:
+            st.info("Noch nicht trainiert. Grundlage sind die LLM-Entscheidungen der Historie.")
+        
+        if st.button("🧠 Vorfilter aus Historie trainieren"):
+            with st.spinner("Trainiere Vorfilter..."):
+                try:
+                    get_prescorer().train(get_history_store().training_examples())
+                    st.success("Vorfilter trainiert und gespeichert.")
+                    st.rerun()
+                except ValueError as e:
+                    st.warning(str(e))
+        
+        # Modell-Kaskade: Anteil je Stufe, Latenz und Kosten gegenüber nur größtem Modell
+        cascade_stats = get_cascade_stats().stats()
+        if cascade_stats['total']:
+            st.subheader("🪜 Modell-Kaskade")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Auf Stufe 1 entschieden", f"{cascade_stats['by_tier'][0]['share'] * 100:.1f}%")
+            with col2:
+                st.metric("Ø Latenz", f"{cascade_stats['avg_time']:.2f}s")
+            with col3:
+                top_cost = cascade_stats['avg_top_tier_cost']
+                st.metric(
+                    "Ø Kosten pro Posting", f"${cascade_stats['avg_cost']:.5f}",
+                    delta=f"{(cascade_stats['avg_cost'] / top_cost - 1) * 100:+.0f}% ggü. nur {MODEL_CASCADE[-1]}" if top_cost else None,
+                    delta_color="inverse"
+                )
+            df_cascade = pd.DataFrame(
+                [
+                    (
+                        row['tier'] + 1, row['model'], row['resolved'], f"{row['share'] * 100:.1f}%",
+                        f"{row['avg_call_time']:.2f}s" if row['avg_call_time'] is not None else "–"
+                    )
+                    for row in cascade_stats['by_tier']
+                ],
+                columns=['Stufe', 'Modell', 'Entschieden', 'Anteil', 'Ø Aufruf']
+            )
+            st.dataframe(df_cascade, hide_index=True, use_container_width=True)
+            if cascade_stats['escalations']:
+                st.caption("Eskalationen: " + " · ".join(f"{reason} {count}×" for reason, count in cascade_stats['escalations'].items()))
+        
+        # Duplikat-Index (§5 Wiederholungen)
+        st.subheader("🔁 Duplikat-Index")
+        dup_stats = get_duplicate_index().stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Einträge (24h)", f"{dup_stats['entries']:,}")
+        with col2:
+            st.metric("Exakte Duplikate", dup_stats['exact_hits'])
+        with col3:
+            st.metric("Nahe Duplikate", dup_stats['near_hits'])
+        with col4:
+            st.metric("Ø Lookup", f"{dup_stats['avg_lookup_ms']:.2f} ms")
+        
+        # Artikel-Digests und Prompt-Größen
+        st.subheader("📏 Prompt-Größe & Artikel-Digests")
+        digest_stats = get_digest_cache().stats()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            avg_prompt_tokens = summary['avg_prompt_tokens']
+            st.metric("Ø Prompt-Tokens", f"{avg_prompt_tokens:,.0f}" if avg_prompt_tokens else "–")
+        with col2:
+            st.metric("Digest-Trefferquote", f"{digest_stats['hit_rate'] * 100:.1f}%")
+        with col3:
+            st.metric("Digests im Cache", digest_stats['entries'])
+        
+        # Laufzeit pro Pipeline-Stufe und Token-Verbrauch (prozessweit)
+        st.subheader("🩺 Pipeline-Metriken")
+        metrics = get_metrics()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Prompt-Tokens (API)", f"{metrics.counter_total('llm_tokens_total', kind='prompt'):,.0f}")
+        with col2:
+            st.metric("Completion-Tokens (API)", f"{metrics.counter_total('llm_tokens_total', kind='completion'):,.0f}")
+        with col3:
+            st.metric("Fehler", f"{metrics.counter_total('errors_total'):,.0f}")
+        
+        # Rate-Limit-Budgets und Wiederholungen (LLMScheduler)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Wiederholungen", f"{metrics.counter_total('llm_retries_total'):,.0f}")
+        with col2:
+            st.metric("davon Rate-Limit (429)", f"{metrics.counter_total('llm_retries_total', reason='rate_limit'):,.0f}")
+        scheduler_rows = get_llm_scheduler().stats()
+        if scheduler_rows:
+            df_scheduler = pd.DataFrame(scheduler_rows).rename(columns={
+                'model': 'Modell', 'key': 'Key', 'rpm': 'RPM', 'tpm': 'TPM',
+                'requests_available': 'Anfragen frei', 'tokens_available': 'Tokens frei',
+                'waiting_interactive': 'Wartend (interaktiv)', 'waiting_bulk': 'Wartend (Bulk)',
+                'blocked_for': 'Gesperrt (s)'
+            })
+            st.dataframe(df_scheduler, hide_index=True, use_container_width=True)
+        
+        span_rows = metrics.span_summary()
+        if span_rows:
+            df_spans = pd.DataFrame(span_rows).rename(columns={
+                'span': 'Stufe', 'task': 'Aufgabe', 'model': 'Modell', 'status': 'Status',
+                'count': 'Anzahl', 'avg_ms': 'Ø ms', 'p95_ms': 'p95 ≤ ms'
+            })
+            st.dataframe(df_spans, hide_index=True, use_container_width=True)
+        st.download_button(
+            "📥 Metriken (Prometheus)",
+            data=metrics.prometheus_text(),
+            file_name="moderation_metrics.prom",
+            mime="text/plain"
+        )
     
     with tab3:
         st.header("📚 Aktuelle Forenregeln")
@@ -701,13 +1098,15 @@ def main():
         """)
         
         current_rules = get_forum_rules()
+        rule_set = get_rule_set()
+        st.caption(f"Aktive Regelwerk-Version: `{rule_set.version}` ({len(current_rules)} Regeln)")
         
         # Rules Management Actions
         col1, col2, col3 = st.columns([1, 1, 2])
         
         with col1:
             if st.button("🔄 Auf Standard zurücksetzen", use_container_width=True):
-                st.session_state.forum_rules = DEFAULT_FORUM_RULES.copy()
+                set_forum_rules(DEFAULT_FORUM_RULES, 'default')
                 st.success("Regeln auf Standard zurückgesetzt!")
                 st.rerun()
         
@@ -743,7 +1142,7 @@ def main():
                 with col1:
                     if st.button("✅ Regel hinzufügen", use_container_width=True):
                         if new_rule_name and new_rule_description:
-                            st.session_state.forum_rules[new_rule_name] = new_rule_description
+                            set_forum_rules({**current_rules, new_rule_name: new_rule_description})
                             st.session_state.adding_rule = False
                             st.success(f"Regel '{new_rule_name}' hinzugefügt!")
                             st.rerun()
@@ -785,7 +1184,7 @@ def main():
                 try:
                     imported_rules = json.load(uploaded_file)
                     if isinstance(imported_rules, dict):
-                        st.session_state.forum_rules = imported_rules
+                        set_forum_rules(imported_rules, 'import')
                         st.success("Regeln erfolgreich importiert!")
                         st.rerun()
                     else:
@@ -795,10 +1194,95 @@ def main():
         
         st.divider()
         
+        # Versionen: jede Änderung erzeugt ein neues, unveränderliches Regelwerk
+        st.subheader("🗂️ Regelwerk-Versionen")
+        rule_set_versions = get_history_store().rule_set_versions()
+        if rule_set_versions:
+            st.dataframe(
+                pd.DataFrame(
+                    [
+                        (
+                            '▶' if row['version'] == rule_set.version else '',
+                            row['version'],
+                            row['created'].strftime('%d.%m. %H:%M:%S'),
+                            row['source'],
+                            row['rules'],
+                            row['decisions']
+                        )
+                        for row in rule_set_versions
+                    ],
+                    columns=['', 'Version', 'Erstellt', 'Quelle', 'Regeln', 'Entscheidungen']
+                ),
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.caption("Noch keine gespeicherten Versionen – sie entstehen mit der ersten Analyse oder Regeländerung.")
+
+        # Nach-Moderation: nur die von der Änderung betroffenen Entscheidungen neu prüfen
+        st.subheader("🔁 Historie nachmoderieren")
+        remoderation_versions = [
+            row['version'] for row in rule_set_versions if row['version'] != rule_set.version and row['decisions']
+        ]
+        if 'remoderation_job' in st.session_state:
+            render_remoderation_progress()
+        elif not remoderation_versions:
+            st.caption("Keine Entscheidungen unter früheren Regelwerk-Versionen vorhanden.")
+        else:
+            remoderation_from = st.selectbox(
+                "Entscheidungen der Version",
+                remoderation_versions,
+                help="Verglichen wird mit der aktiven Version; betrachtet wird je Posting die jüngste Entscheidung"
+            )
+            try:
+                remoderation_plan = cached_history_query(
+                    'remoderation_plan', (get_history_store().revision, remoderation_from, rule_set.version),
+                    lambda: plan_remoderation(remoderation_from, rule_set)
+                )
+            except ValueError as e:
+                remoderation_plan = None
+                st.warning(str(e))
+
+            if remoderation_plan:
+                by_reason = remoderation_plan['by_reason']
+                st.write(
+                    f"{format_rule_diff(remoderation_plan['diff'])} → **{len(remoderation_plan['candidates'])}** "
+                    f"von {remoderation_plan['decisions']} Entscheidungen betroffen"
+                )
+                st.caption(
+                    f"{by_reason.get('violated', 0)} gelöscht wegen geänderter/entfernter Regel · "
+                    f"{by_reason.get('mentioned', 0)} Begründung erwähnt betroffene Regel · "
+                    f"{by_reason.get('borderline', 0)} knapp freigeschaltet (Konfidenz < {REMODERATION_NEAR_CONFIDENCE}%)"
+                )
+                if st.button(
+                    "🔁 Betroffene Postings neu moderieren",
+                    disabled=not api_key or not remoderation_plan['candidates']
+                ):
+                    # Läuft im Hintergrund auf dem Loop des Client-Pools (Bulk-Spur)
+                    remoderation_progress = {'done': 0, 'total': len(remoderation_plan['candidates']), 'flipped': 0}
+
+                    def update_remoderation(done: int, total: int, row: Dict):
+                        remoderation_progress['done'] = done
+                        remoderation_progress['flipped'] += row['outcome'] == 'flipped'
+
+                    st.session_state.remoderation_job = {
+                        'progress': remoderation_progress,
+                        'future': get_client_pool().submit(remoderate_history(
+                            remoderation_plan, rule_set, api_key, model, int(bulk_concurrency), analysis_mode,
+                            update_remoderation
+                        ))
+                    }
+                    st.rerun()
+
+        if 'last_remoderation' in st.session_state and 'remoderation_job' not in st.session_state:
+            render_remoderation_report(st.session_state.last_remoderation)
+
+        st.divider()
+        
         # Preview how rules will look in LLM prompt
         st.subheader("👁️ Vorschau für KI-Prompt")
         with st.expander("Zeige, wie die Regeln der KI präsentiert werden"):
-            st.code(format_rules_for_prompt(), language="text")
+            st.code(get_rule_set().text, language="text")
         
         st.divider()
         
@@ -841,7 +1325,7 @@ def main():
                                     else:
                                         updated_rules[old_name] = old_desc
                                 
-                                st.session_state.forum_rules = updated_rules
+                                set_forum_rules(updated_rules)
                                 st.success("Regel gespeichert!")
                                 st.rerun()
                             else:
@@ -861,7 +1345,7 @@ def main():
                             else:
                                 # Delete the rule
                                 updated_rules = {k: v for i, (k, v) in enumerate(current_rules.items()) if i != idx}
-                                st.session_state.forum_rules = updated_rules
+                                set_forum_rules(updated_rules)
                                 del st.session_state[f'confirm_delete_{idx}']
                                 st.success("Regel gelöscht!")
                                 st.rerun()
@@ -870,70 +1354,124 @@ def main():
             st.info("Keine Regeln vorhanden. Fügen Sie eine neue Regel hinzu oder setzen Sie auf Standard zurück.")
     
     with tab5:
-        st.header("💾 Analyse-Historie")
+        render_history()
+    
+    with tab6:
+        st.header("📦 Bulk-Moderation")
+        st.caption("CSV (Spalte `posting` oder `text`) oder JSONL (ein Objekt pro Zeile) mit Postings zum geladenen Artikel hochladen.")
         
-        if 'history' in st.session_state and st.session_state.history:
-            # Export Button
-            if st.button("📥 Historie als JSON exportieren"):
-                history_json = json.dumps(
-                    [
-                        {
-                            'posting': h['posting'],
-                            'decision': h['decision'],
-                            'confidence': h.get('confidence'),
-                            'violated_rules': h.get('violated_rules'),
-                            'explanation': h.get('explanation'),
-                            'question_analysis': h.get('question_analysis', {}),
-                            'timestamp': h.get('timestamp').isoformat() if h.get('timestamp') else None
-                        }
-                        for h in st.session_state.history
-                    ],
-                    indent=2,
-                    ensure_ascii=False
+        bulk_file = st.file_uploader(
+            "📤 Postings hochladen",
+            type=['csv', 'jsonl', 'ndjson'],
+            key="bulk_file"
+        )
+        
+        if 'article' not in st.session_state or not st.session_state.article['success']:
+            st.info("Bitte zuerst im Tab 📝 Moderation einen Artikel laden.")
+        elif bulk_file is not None:
+            try:
+                bulk_items = load_bulk_postings(bulk_file.getvalue().decode('utf-8-sig'), bulk_file.name)
+            except (ValueError, pd.errors.ParserError) as e:
+                bulk_items = []
+                st.error(f"Datei konnte nicht gelesen werden: {str(e)}")
+            
+            if bulk_items:
+                st.info(f"**{len(bulk_items)}** Postings erkannt für: {st.session_state.article['title']}")
+                
+                bulk_early_stop = st.checkbox(
+                    "Nach der Entscheidung abbrechen (ohne Begründung)",
+                    help="Streamt die Antworten und beendet jede Generierung, sobald Entscheidung, Konfidenz und Regeln feststehen"
                 )
-                st.download_button(
-                    label="Download JSON",
-                    data=history_json,
-                    file_name=f"moderation_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                    mime="application/json"
+                bulk_pack = st.checkbox(
+                    "Postings bündeln (mehrere pro Prompt)",
+                    disabled=analysis_mode == 'combined' or bulk_early_stop,
+                    help=f"Bis zu {PACK_MAX_POSTINGS} Postings teilen sich Regeln und Artikel-Kontext in einem Moderations-Prompt "
+                         "(begrenzt durch das Kontextfenster des Modells). Übergangene Postings werden einzeln nachgeholt. "
+                         "Nicht im kombinierten Modus und nicht mit Abbruch nach der Entscheidung."
                 )
-            
-            # Historie-Tabelle
-            for idx, item in enumerate(reversed(st.session_state.history)):
-                with st.expander(
-                    f"{'🚫' if item['decision'] == 'LÖSCHEN' else '✅'} "
-                    f"Posting {len(st.session_state.history) - idx}: "
-                    f"{item['posting'][:50]}..."
-                ):
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.write(f"**Entscheidung:** {item['decision']}")
-                        st.write(f"**Konfidenz:** {item.get('confidence', 'N/A')}%")
-                    with col2:
-                        if item.get('violated_rules'):
-                            st.write(f"**Regeln:** {', '.join(item['violated_rules'])}")
-                        if item.get('timestamp'):
-                            st.write(f"**Zeit:** {item['timestamp'].strftime('%H:%M:%S')}")
+                
+                if st.button("🚀 Bulk-Moderation starten", type="primary", disabled=not api_key):
+                    output_path = new_bulk_output_path()
+                    progress = st.progress(0.0, text="Starte Bulk-Moderation...")
                     
-                    # Fragen-Analyse anzeigen falls vorhanden
-                    if 'question_analysis' in item and not item['question_analysis'].get('error', False):
-                        qa = item['question_analysis']
-                        st.write("**Fragen-Analyse:**")
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            has_q = "✅ Ja" if qa.get('has_questions', False) else "❌ Nein"
-                            st.write(f"Fragen: {has_q}")
-                        with col2:
-                            expects_r = "✅ Ja" if qa.get('expects_reactions', False) else "❌ Nein"
-                            st.write(f"Erwarte Reaktion: {expects_r}")
-                        
-                        if qa.get('target_audience', 'Unbekannt') != 'Unbekannt':
-                            st.write(f"Zielgruppe: {qa['target_audience']}")
+                    # Der Lauf findet auf dem Loop des Client-Pools statt; Fortschritt
+                    # wird hier im Script-Thread abgefragt (Streamlit-Kontext)
+                    bulk_progress = {'done': 0}
                     
-                    st.write("**Begründung:**")
-                    st.text(item.get('explanation', 'Keine Begründung'))
-        else:
-            st.info("Noch keine Historie vorhanden.")
+                    def update_progress(done: int, total: int, result: Dict):
+                        bulk_progress['done'] = done
+                    
+                    bulk_start = time.time()
+                    bulk_future = get_client_pool().submit(moderate_postings_bulk(
+                        bulk_items,
+                        st.session_state.article,
+                        api_key,
+                        model,
+                        int(bulk_concurrency),
+                        output_path,
+                        get_rule_set().text,
+                        update_progress,
+                        analysis_mode,
+                        build_article_context(
+                            st.session_state.article, int(context_budget), context_method, api_key, model,
+                            top_k=int(context_top_k)
+                        ),
+                        {
+                            'local_min_confidence': local_min_confidence,
+                            'shadow_local': shadow_local,
+                            'question_local_min_confidence': question_local_min_confidence,
+                            'article_url': st.session_state.article.get('url'),
+                            'duplicate_check': duplicate_check,
+                            'prescore': use_prescorer,
+                            'early_stop': bulk_early_stop
+                        },
+                        bulk_pack
+                    ))
+                    while not bulk_future.done():
+                        done = bulk_progress['done']
+                        progress.progress(done / len(bulk_items), text=f"{done}/{len(bulk_items)} Postings moderiert")
+                        time.sleep(0.2)
+                    bulk_results = bulk_future.result()
+                    progress.progress(1.0, text=f"{len(bulk_results)}/{len(bulk_items)} Postings moderiert")
+                    bulk_duration = time.time() - bulk_start
+                    
+                    st.session_state.last_bulk_run = {
+                        'output_path': output_path,
+                        'count': len(bulk_results),
+                        'deleted': sum(1 for r in bulk_results if r['decision'] == 'LÖSCHEN'),
+                        'errors': sum(1 for r in bulk_results if r['decision'] == 'ERROR'),
+                        'packed': sum(1 for r in bulk_results if r.get('packed')),
+                        'duration': bulk_duration
+                    }
+        
+        if 'last_bulk_run' in st.session_state:
+            run = st.session_state.last_bulk_run
+            st.divider()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Moderiert", run['count'])
+            with col2:
+                st.metric("Gelöscht", run['deleted'])
+            with col3:
+                st.metric("Fehler", run['errors'])
+            with col4:
+                st.metric("Postings/s", f"{run['count'] / run['duration']:.2f}" if run['duration'] > 0 else "–")
+            
+            if run.get('packed'):
+                st.caption(f"📦 {run['packed']} von {run['count']} Postings in gebündelten Prompts moderiert")
+            st.caption(f"💾 Ergebnisse: `{run['output_path']}`")
+            if os.path.exists(run['output_path']):
+                with open(run['output_path'], encoding='utf-8') as f:
+                    st.download_button(
+                        label="📥 Ergebnisse als JSONL herunterladen",
+                        data=f.read(),
+                        file_name=os.path.basename(run['output_path']),
+                        mime="application/x-ndjson"
+                    )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if st.runtime.exists():
+        main()
+    else:
+        # Ohne Streamlit-Runtime (python derstandard-demo-app.py ...) als Bulk-CLI starten
+        sys.exit(run_bulk_cli())
\ No newline at end of file
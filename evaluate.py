@@ -0,0 +1,396 @@
+"""
+Qualitäts-Evaluation der Moderation gegen ein gelabeltes Korpus, wahlweise komplett offline.
+
+Moderiert das Korpus (JSONL: posting, decision, rules) für jede Kombination
+aus Modell, Prompt-Variante und Regelwerk über moderate_postings_bulk und
+vergleicht mit den Labels: Übereinstimmung, Precision/Recall für Löschungen
+und pro Regel, dazu p50/p95-Latenz, Tokens und geschätzte Kosten. Ohne
+--base-url läuft alles gegen mock_groq_server.py im Prozess. Vorhersagen
+werden pro Konfiguration gecacht, wiederholte Läufe rufen nur neue
+Kombinationen auf. Berichte landen als JSON und HTML in evaluations/.
+
+    python evaluate.py --models llama3-8b-8192 llama3-70b-8192 cascade --variants standard packed
+    python evaluate.py --rules default neue_regeln.json --min-agreement 0.95
+"""
+
+import argparse
+import hashlib
+import html
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import pandas as pd
+
+from benchmark import REPO_DIR, git_commit, load_app, percentiles
+from mock_groq_server import MockGroqServer
+
+EVALUATION_DIR = "evaluations"
+DEFAULT_CORPUS = os.path.join(REPO_DIR, "evaluation_corpus.jsonl")  # unabhängig vom Arbeitsverzeichnis
+DEFAULT_CACHE = os.path.join(".cache", "evaluation.sqlite3")
+
+# Prompt-Varianten: Analyse-Modus und Optionen, wie sie auch UI und Bulk-CLI anbieten
+VARIANTS = {
+    'standard': {'mode': 'sequential'},
+    'combined': {'mode': 'combined'},
+    'packed': {'mode': 'sequential', 'pack': True},
+    'early_stop': {'mode': 'sequential', 'early_stop': True},
+    'local': {'mode': 'sequential', 'local': True}
+}
+
+
+class PredictionCache:
+    """Vorhersagen pro (Konfiguration, Artikel, Posting) in SQLite, inklusive der gemessenen Latenz"""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Dict:
+        row = self._conn.execute("SELECT value FROM predictions WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, value: Dict):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO predictions (key, value) VALUES (?, ?)", (key, json.dumps(value, ensure_ascii=False))
+        )
+        self._conn.commit()
+
+
+def load_corpus(path: str) -> List[Dict]:
+    """Gelabeltes Korpus: je Zeile posting, decision (LÖSCHEN/FREISCHALTEN), rules und optional article_url"""
+    corpus = []
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('decision') not in ('LÖSCHEN', 'FREISCHALTEN'):
+                raise ValueError(f"{path}:{line_no}: decision muss LÖSCHEN oder FREISCHALTEN sein")
+            corpus.append({
+                'id': str(record.get('id', line_no)),
+                'posting': record['posting'],
+                'decision': record['decision'],
+                'rules': record.get('rules', []),
+                'article_url': record.get('article_url')
+            })
+    return corpus
+
+
+def load_rule_sets(app, specs: List[str]) -> Dict[str, object]:
+    """'default' oder Pfade zu JSON-Regeldateien -> {Bezeichnung: RuleSet}"""
+    rule_sets = {}
+    for spec in specs:
+        if spec == 'default':
+            rule_sets[spec] = app.build_rule_set()
+        else:
+            with open(spec, encoding='utf-8') as f:
+                rule_sets[os.path.basename(spec)] = app.build_rule_set(json.load(f), 'import')
+    return rule_sets
+
+
+def prediction_record(app, model: str, result: Dict) -> Dict:
+    """Das für die Auswertung Nötige aus einem Analyse-Ergebnis, inklusive Tokens und Kosten"""
+    answer = {k: result.get(k) for k in ('decision', 'confidence', 'violated_rules', 'explanation')}
+    completion_tokens = 0 if result.get('source') == 'local' else app.estimate_tokens(json.dumps(answer, ensure_ascii=False))
+    prompt_tokens = result.get('prompt_tokens') or 0
+    if result.get('cascade'):
+        cost = result['cascade']['cost']
+    else:
+        cost = app.model_cost(model, prompt_tokens, completion_tokens)
+    return {
+        'decision': result.get('decision'),
+        'confidence': result.get('confidence'),
+        'rules': sorted({app.rule_key(rule) for rule in result.get('violated_rules') or []}),
+        'latency': result.get('analysis_time') or 0.0,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'cost': cost,
+        'source': result.get('source', 'llm'),
+        'packed': bool(result.get('packed'))
+    }
+
+
+def score(app, corpus: List[Dict], predictions: List[Dict]) -> Dict:
+    """Übereinstimmung, Precision/Recall für LÖSCHEN und pro Regel (Regeln als §-Nummer verglichen)"""
+    def ratio(a: int, b: int) -> float:
+        return a / b if b else None
+
+    agree = tp = fp = fn = 0
+    per_rule = {}
+    confusion = {}
+    for gold, pred in zip(corpus, predictions):
+        agree += pred['decision'] == gold['decision']
+        gold_delete, pred_delete = gold['decision'] == 'LÖSCHEN', pred['decision'] == 'LÖSCHEN'
+        tp += gold_delete and pred_delete
+        fp += pred_delete and not gold_delete
+        fn += gold_delete and not pred_delete
+        confusion.setdefault(gold['decision'], {}).setdefault(pred['decision'], 0)
+        confusion[gold['decision']][pred['decision']] += 1
+
+        gold_rules = {app.rule_key(rule) for rule in gold['rules']}
+        pred_rules = set(pred['rules'])
+        for rule in gold_rules | pred_rules:
+            counts = per_rule.setdefault(rule, {'tp': 0, 'fp': 0, 'fn': 0})
+            counts['tp' if rule in gold_rules and rule in pred_rules else 'fn' if rule in gold_rules else 'fp'] += 1
+
+    for counts in per_rule.values():
+        counts['precision'] = ratio(counts['tp'], counts['tp'] + counts['fp'])
+        counts['recall'] = ratio(counts['tp'], counts['tp'] + counts['fn'])
+
+    return {
+        'agreement': ratio(agree, len(corpus)),
+        'delete_precision': ratio(tp, tp + fp),
+        'delete_recall': ratio(tp, tp + fn),
+        'confusion': confusion,
+        'per_rule': dict(sorted(per_rule.items(), key=lambda item: (len(item[0]), item[0])))
+    }
+
+
+def run_config(app, config: Dict, corpus: List[Dict], articles: Dict, contexts: Dict, api_key: str,
+               args: argparse.Namespace, cache: PredictionCache, backend: str, state_dir: str) -> Dict:
+    """Moderiert das Korpus mit einer Konfiguration; gecachte Vorhersagen werden übernommen"""
+    variant = VARIANTS[config['variant']]
+    keys = [
+        PredictionCache.key(
+            backend, config['model'], config['variant'], config['rule_set'].version,
+            str(args.context_budget), app.content_hash(contexts[item['article_url']]['text']), item['posting']
+        )
+        for item in corpus
+    ]
+    predictions = [cache.get(key) if cache else None for key in keys]
+    pending = [i for i, prediction in enumerate(predictions) if prediction is None]
+
+    wall = 0.0
+    if pending:
+        # Ergebnis-Cache der Engine leeren, damit jede Konfiguration echte Aufrufe misst
+        app.get_result_cache().clear()
+        options = {
+            'local_min_confidence': app.LOCAL_DEFAULT_MIN_CONFIDENCE if variant.get('local') else None,
+            'question_local_min_confidence': app.QUESTION_LOCAL_DEFAULT_MIN_CONFIDENCE,
+            'early_stop': variant.get('early_stop', False)
+        }
+        wall_start = time.perf_counter()
+        for url in dict.fromkeys(corpus[i]['article_url'] for i in pending):
+            items = [{'posting_id': str(i), 'posting': corpus[i]['posting']} for i in pending if corpus[i]['article_url'] == url]
+            results = app.get_client_pool().run(app.moderate_postings_bulk(
+                items, articles[url], api_key, config['model'], args.concurrency,
+                os.path.join(state_dir, 'predictions.jsonl'), config['rule_set'].text, None,
+                variant['mode'], contexts[url], dict(options, article_url=url), variant.get('pack', False)
+            ))
+            for result in results:
+                index = int(result['posting_id'])
+                predictions[index] = prediction_record(app, config['model'], result)
+                if cache and predictions[index]['decision'] != 'ERROR':
+                    cache.put(keys[index], predictions[index])
+        wall = time.perf_counter() - wall_start
+
+    fresh = len(pending)
+    return {
+        'model': config['model'],
+        'variant': config['variant'],
+        'rules': config['rules'],
+        'rules_version': config['rule_set'].version,
+        'postings': len(corpus),
+        'from_cache': len(corpus) - fresh,
+        'errors': sum(1 for p in predictions if p['decision'] == 'ERROR'),
+        'packed': sum(1 for p in predictions if p['packed']),
+        'local': sum(1 for p in predictions if p['source'] == 'local'),
+        'throughput_per_s': fresh / wall if wall else None,
+        'latency_ms': percentiles([p['latency'] * 1000 for p in predictions]),
+        'tokens_per_posting': sum(p['prompt_tokens'] + p['completion_tokens'] for p in predictions) / len(corpus),
+        'cost_per_1000': sum(p['cost'] for p in predictions) / len(corpus) * 1000,
+        **score(app, corpus, predictions),
+        'disagreements': [
+            {'id': gold['id'], 'posting': gold['posting'], 'expected': gold['decision'], 'expected_rules': gold['rules'],
+             'predicted': pred['decision'], 'predicted_rules': pred['rules']}
+            for gold, pred in zip(corpus, predictions)
+            if pred['decision'] != gold['decision']
+        ]
+    }
+
+
+def recommend(results: List[Dict], min_agreement: float) -> Dict:
+    """Schnellste Konfiguration (p95, dann Kosten), die die Mindest-Übereinstimmung ohne Fehler erreicht"""
+    qualified = [r for r in results if not r['errors'] and (r['agreement'] or 0) >= min_agreement]
+    if not qualified:
+        return None
+    best = min(qualified, key=lambda r: (r['latency_ms']['p95'], r['cost_per_1000']))
+    return {k: best[k] for k in ('model', 'variant', 'rules')}
+
+
+def run_evaluation(args: argparse.Namespace) -> Dict:
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = MockGroqServer(port=0, latency=args.latency, error_rate=args.error_rate).start()
+        base_url = server.base_url
+    os.environ["GROQ_BASE_URL"] = base_url
+    api_key = os.environ.setdefault("GROQ_API_KEY", "offline-evaluation")
+    # Der Mock läuft auf wechselnden Ports; Vorhersagen gelten pro Latenz-Profil
+    backend = f"mock:{args.latency}:{args.error_rate}" if server else base_url
+    cache = None if args.no_cache else PredictionCache(args.cache)
+
+    with tempfile.TemporaryDirectory(prefix="moderation-eval-") as state_dir:
+        app = load_app(state_dir)
+        corpus = load_corpus(args.corpus)
+        default_url = args.article_url or f"{base_url}/artikel/evaluation"
+        for item in corpus:
+            item['article_url'] = item['article_url'] or default_url
+        articles = app.warm_articles([item['article_url'] for item in corpus])
+        failed = [url for url, article in articles.items() if not article['success']]
+        if failed:
+            raise RuntimeError(f"Artikel konnten nicht geladen werden: {', '.join(failed)}")
+        contexts = {url: app.build_article_context(article, args.context_budget) for url, article in articles.items()}
+        rule_sets = load_rule_sets(app, args.rules)
+
+        results = []
+        for model, variant, rules in itertools.product(args.models, args.variants, rule_sets):
+            config = {'model': model, 'variant': variant, 'rules': rules, 'rule_set': rule_sets[rules]}
+            results.append(run_config(app, config, corpus, articles, contexts, api_key, args, cache, backend, state_dir))
+            print(
+                f"  {model} / {variant} / {rules}: Übereinstimmung {results[-1]['agreement'] * 100:.1f}%",
+                file=sys.stderr
+            )
+
+    if server:
+        server.stop()
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'corpus': {'path': args.corpus, 'postings': len(corpus)},
+        'backend': backend,
+        'config': {k: v for k, v in vars(args).items() if k not in ('output_dir', 'cache', 'no_cache')},
+        'min_agreement': args.min_agreement,
+        'recommended': recommend(results, args.min_agreement),
+        'results': results
+    }
+
+
+def _percent(value: float) -> str:
+    return "–" if value is None else f"{value * 100:.1f}%"
+
+
+def summary_table(report: Dict) -> pd.DataFrame:
+    return pd.DataFrame([
+        {
+            'Modell': r['model'],
+            'Variante': r['variant'],
+            'Regeln': f"{r['rules']} ({r['rules_version']})",
+            'Übereinstimmung': _percent(r['agreement']),
+            'Precision LÖSCHEN': _percent(r['delete_precision']),
+            'Recall LÖSCHEN': _percent(r['delete_recall']),
+            'p50 ms': f"{r['latency_ms']['p50']:.0f}",
+            'p95 ms': f"{r['latency_ms']['p95']:.0f}",
+            'Tokens/Posting': f"{r['tokens_per_posting']:.0f}",
+            '$/1000 Postings': f"{r['cost_per_1000']:.4f}",
+            'Fehler': r['errors'],
+            'aus Cache': r['from_cache']
+        }
+        for r in report['results']
+    ])
+
+
+def write_html(report: Dict, path: str):
+    """Eigenständiger HTML-Bericht: Übersicht, Regel-Tabellen und Abweichungen pro Konfiguration"""
+    recommended = report['recommended']
+    sections = []
+    for r in report['results']:
+        rules = pd.DataFrame([
+            {'Regel': rule, 'TP': c['tp'], 'FP': c['fp'], 'FN': c['fn'],
+             'Precision': _percent(c['precision']), 'Recall': _percent(c['recall'])}
+            for rule, c in r['per_rule'].items()
+        ])
+        disagreements = pd.DataFrame([
+            {'ID': d['id'], 'Erwartet': d['expected'], 'Vorhergesagt': d['predicted'],
+             'Regeln erwartet': ', '.join(d['expected_rules']), 'Regeln vorhergesagt': ', '.join(d['predicted_rules']),
+             'Posting': d['posting']}
+            for d in r['disagreements']
+        ])
+        sections.append(
+            f"<h2>{html.escape(r['model'])} / {html.escape(r['variant'])} / {html.escape(r['rules'])}</h2>"
+            + (rules.to_html(index=False) if not rules.empty else "<p>Keine Regelverstöße.</p>")
+            + "<h3>Abweichungen</h3>"
+            + (disagreements.to_html(index=False) if not disagreements.empty else "<p>Keine.</p>")
+        )
+    recommendation = (
+        f"{html.escape(recommended['model'])} / {html.escape(recommended['variant'])} / {html.escape(recommended['rules'])}"
+        if recommended else "keine Konfiguration erreicht die Mindest-Übereinstimmung"
+    )
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(
+            "<!DOCTYPE html><html lang='de'><head><meta charset='utf-8'>"
+            f"<title>Moderations-Evaluation {html.escape(report['timestamp'])}</title>"
+            "<style>body{font-family:sans-serif;margin:2rem}table{border-collapse:collapse;margin-bottom:1rem}"
+            "td,th{border:1px solid #ccc;padding:4px 8px;text-align:left}th{background:#f0f2f5}"
+            "h1{border-bottom:3px solid #d41853}</style></head><body>"
+            f"<h1>Moderations-Evaluation</h1>"
+            f"<p>{html.escape(report['timestamp'])} @ {html.escape(report['git_commit'])} · "
+            f"Korpus {html.escape(report['corpus']['path'])} ({report['corpus']['postings']} Postings) · "
+            f"Backend {html.escape(report['backend'])}</p>"
+            f"<p><b>Empfehlung</b> (schnellste mit ≥ {report['min_agreement'] * 100:.0f}% Übereinstimmung): "
+            f"{recommendation}</p>"
+            + summary_table(report).to_html(index=False)
+            + "".join(sections)
+            + "</body></html>"
+        )
+
+
+def print_report(report: Dict):
+    print(f"\nEvaluation {report['timestamp']} @ {report['git_commit']} · {report['corpus']['postings']} Postings")
+    print(summary_table(report).to_string(index=False))
+    recommended = report['recommended']
+    if recommended:
+        print(f"Empfehlung: {recommended['model']} / {recommended['variant']} / {recommended['rules']}")
+    else:
+        print(f"Keine Konfiguration erreicht {report['min_agreement'] * 100:.0f}% Übereinstimmung.")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluation der Moderation gegen ein gelabeltes Korpus")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL mit posting, decision, rules (optional article_url)")
+    parser.add_argument("--models", nargs="+", default=["llama3-8b-8192"], help="Modelle, 'cascade' für die Modell-Kaskade")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=['standard'])
+    parser.add_argument("--rules", nargs="+", default=['default'], help="'default' und/oder JSON-Dateien mit Forenregeln")
+    parser.add_argument("--article-url", help="Artikel für Postings ohne article_url (Standard: Artikel des Mocks)")
+    parser.add_argument("--context-budget", type=int, default=1200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--min-agreement", type=float, default=0.9, help="Qualitätsschwelle (0-1) für die Empfehlung")
+    parser.add_argument("--latency", default="lognormal:0.3,0.35", help="Latenz-Verteilung des Mocks (siehe mock_groq_server.py)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--base-url", help="Externen Server (z. B. die Groq-API) verwenden statt den Mock im Prozess zu starten")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="SQLite-Datei für gecachte Vorhersagen")
+    parser.add_argument("--no-cache", action="store_true", help="Alle Konfigurationen neu moderieren")
+    parser.add_argument("--output-dir", default=EVALUATION_DIR)
+    args = parser.parse_args(argv)
+
+    report = run_evaluation(args)
+    print_report(report)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    base_path = os.path.join(
+        args.output_dir, f"evaluation_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{report['git_commit']}"
+    )
+    with open(base_path + ".json", 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    write_html(report, base_path + ".html")
+    print(f"\nBerichte gespeichert: {base_path}.json, {base_path}.html")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""
+Lokaler Ersatz für die Groq-API (OpenAI-kompatibles Chat-Completions-Protokoll).
+
+Beantwortet Moderations-, Fragen-, kombinierte, gepackte und Verdichtungs-Prompts
+der Demo-App regelbasiert (oder aus einer Datei mit festen Antworten), mit
+einstellbarer Latenz, Fehler- und Rate-Limit-Quote, und liefert unter jeder
+anderen GET-URL einen synthetischen Artikel für fetch_article.
+
+    python mock_groq_server.py --port 8765 --latency lognormal:0.35,0.4
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=offline streamlit run derstandard-demo-app.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+# Grobe Regeln für plausible Antworten; reicht für Last- und Latenzmessungen
+_POSTING_RE = re.compile(r'POSTING ZU (?:BEWERTEN|ANALYSIEREN):\s*"(.*?)"\s*(?:\n|$)', re.DOTALL)
+_PACKED_POSTING_RE = re.compile(r'^\[(\d+)\] (".*")$', re.MULTILINE)
+_RULE_PATTERNS = [
+    ('§5 Spam', re.compile(r'https?://|www\.|\b(kredit|gewinnspiel|klick hier)', re.IGNORECASE)),
+    ('§2 Beleidigung', re.compile(r'\b(idiot|trottel|depp|vollkoffer)', re.IGNORECASE)),
+    ('§3 Gewalt', re.compile(r'an die wand|aufhängen|abknallen', re.IGNORECASE)),
+    ('§7 Diskriminierung', re.compile(r'ausländer .* zurück|gehören alle', re.IGNORECASE))
+]
+_REACTION_RE = re.compile(r'was (sagt|meint|denkt) ihr|wie seht ihr|oder\?|!{2,}', re.IGNORECASE)
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """'fixed:0.2', 'uniform:0.1,0.5', 'normal:0.3,0.1' oder 'lognormal:mu,sigma' (Sekunden)"""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        # values[0] ist der Median in Sekunden, values[1] die Streuung (sigma)
+        return lambda: random.lognormvariate(0, values[1]) * values[0]
+    raise ValueError(f"Unbekannte Latenz-Verteilung: {spec}")
+
+
+def _posting_of(prompt: str) -> str:
+    match = _POSTING_RE.search(prompt)
+    return match.group(1) if match else prompt[-500:]
+
+
+def moderation_answer(posting: str) -> Dict:
+    violated = [rule for rule, pattern in _RULE_PATTERNS if pattern.search(posting)]
+    return {
+        'decision': 'LÖSCHEN' if violated else 'FREISCHALTEN',
+        'confidence': 92 if violated else 85,
+        'violated_rules': violated,
+        'explanation': (
+            f"Das Posting verstößt gegen {', '.join(violated)}." if violated
+            else "Das Posting ist eine zulässige Meinungsäußerung."
+        )
+    }
+
+
+def question_answer(posting: str) -> Dict:
+    has_questions = '?' in posting
+    expects_reactions = has_questions or bool(_REACTION_RE.search(posting))
+    return {
+        'has_questions': has_questions,
+        'expects_reactions': expects_reactions,
+        'target_audience': 'User' if expects_reactions else 'Unbekannt',
+        'explanation': 'Enthält eine Frage.' if has_questions else 'Keine Frage erkannt.',
+        'question_type': 'Direkte Frage' if has_questions else 'Keine',
+        'reaction_indicators': ['Fragezeichen'] if has_questions else []
+    }
+
+
+def packed_answer(prompt: str, miss_rate: float) -> Dict:
+    """Antwort auf einen gepackten Prompt; miss_rate lässt Einträge aus (wie ein Modell, das Postings übergeht)"""
+    results = []
+    for index, quoted in _PACKED_POSTING_RE.findall(prompt):
+        if miss_rate and random.random() < miss_rate:
+            continue
+        posting = json.loads(quoted)
+        results.append({
+            'index': int(index),
+            'posting_start': ' '.join(posting.split()[:3]),
+            **moderation_answer(posting)
+        })
+    return {'results': results}
+
+
+def answer_for(prompt: str, canned: List[Tuple[str, str]], pack_miss_rate: float = 0.0) -> str:
+    """Antworttext für einen Prompt: feste Antwort per Teilstring, sonst regelbasiert"""
+    for needle, content in canned:
+        if needle in prompt:
+            return content
+    if '"results"' in prompt:
+        return json.dumps(packed_answer(prompt, pack_miss_rate), ensure_ascii=False)
+    if prompt.startswith('Fasse den folgenden'):
+        content = prompt.split('Inhalt:', 1)[-1].strip()
+        return ' '.join(content.split()[:120])
+    posting = _posting_of(prompt)
+    is_moderation = '"decision"' in prompt
+    is_question = '"has_questions"' in prompt
+    if is_moderation and is_question:
+        question = question_answer(posting)
+        question['question_explanation'] = question.pop('explanation')
+        return json.dumps({**moderation_answer(posting), **question}, ensure_ascii=False)
+    if is_question:
+        return json.dumps(question_answer(posting), ensure_ascii=False)
+    return json.dumps(moderation_answer(posting), ensure_ascii=False)
+
+
+def synthetic_article(paragraphs: int) -> bytes:
+    topics = ['Budget', 'Steuerreform', 'Regierung', 'Klimapolitik', 'Wohnen', 'Pensionen', 'Bildung']
+    body = ''.join(
+        f"<p>Absatz {i}: Die Debatte über {topics[i % len(topics)]} und {topics[(i * 3) % len(topics)]} "
+        f"geht weiter, Experten nennen Zahlen und Positionen der Parteien.</p>"
+        for i in range(paragraphs)
+    )
+    return (
+        "<html><head><title>Testartikel</title></head><body>"
+        "<h1 class='article-title'>Testartikel: Budget und Steuerreform</h1>"
+        f"<div class='article-body'>{body}</div></body></html>"
+    ).encode('utf-8')
+
+
+class MockGroqServer:
+    """Threading-HTTP-Server mit Groq/OpenAI-kompatiblem /chat/completions"""
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8765,
+        latency: str = 'fixed:0.05',
+        token_delay: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        rpm: int = 0,
+        canned: List[Tuple[str, str]] = None,
+        article_paragraphs: int = 40,
+        pack_miss_rate: float = 0.0
+    ):
+        self.latency = parse_latency(latency)
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm = rpm
+        self.canned = canned or []
+        self.pack_miss_rate = pack_miss_rate
+        self.article = synthetic_article(article_paragraphs)
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'streamed': 0}
+        self._lock = threading.Lock()
+        self._window = []  # Zeitpunkte der Anfragen der letzten Minute (für --rpm)
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockGroqServer':
+        threading.Thread(target=self.httpd.serve_forever, name='mock-groq', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _admit(self) -> float:
+        """0 wenn die Anfrage bedient wird, sonst Sekunden bis zum nächsten freien Slot"""
+        with self._lock:
+            self.stats['requests'] += 1
+            if self.rate_limit_rate and random.random() < self.rate_limit_rate:
+                self.stats['rate_limited'] += 1
+                return 1.0
+            if self.rpm:
+                now = time.time()
+                self._window = [t for t in self._window if t > now - 60]
+                if len(self._window) >= self.rpm:
+                    self.stats['rate_limited'] += 1
+                    return max(0.01, self._window[0] + 60 - now)
+                self._window.append(now)
+            return 0.0
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict, headers: Dict[str, str] = None):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('content-type', 'application/json')
+                self.send_header('content-length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_chunk(self, data: str):
+                raw = data.encode('utf-8')
+                self.wfile.write(f"{len(raw):x}\r\n".encode() + raw + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/models'):
+                    self._send_json(200, {'object': 'list', 'data': [{'id': 'mock', 'object': 'model'}]})
+                    return
+                self.send_response(200)
+                self.send_header('content-type', 'text/html; charset=utf-8')
+                self.send_header('content-length', str(len(server.article)))
+                self.end_headers()
+                self.wfile.write(server.article)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('content-length', 0))) or b'{}')
+                if not self.path.endswith('/chat/completions'):
+                    self._send_json(404, {'error': {'message': 'not found', 'type': 'invalid_request_error'}})
+                    return
+
+                retry_after = server._admit()
+                if retry_after:
+                    self._send_json(
+                        429,
+                        {'error': {'message': 'Rate limit reached', 'type': 'tokens', 'code': 'rate_limit_exceeded'}},
+                        {'retry-after': f"{retry_after:.2f}", 'x-ratelimit-remaining-requests': '0'}
+                    )
+                    return
+
+                time.sleep(server.latency())
+                if server.error_rate and random.random() < server.error_rate:
+                    with server._lock:
+                        server.stats['errors'] += 1
+                    self._send_json(500, {'error': {'message': 'Internal server error', 'type': 'internal_server_error'}})
+                    return
+
+                prompt = ''.join(m.get('content') or '' for m in body.get('messages', []))
+                content = answer_for(prompt, server.canned, server.pack_miss_rate)
+                usage = {
+                    'prompt_tokens': len(prompt) // 4,
+                    'completion_tokens': len(content) // 4,
+                    'total_tokens': len(prompt) // 4 + len(content) // 4
+                }
+                model = body.get('model', 'mock')
+
+                if not body.get('stream'):
+                    self._send_json(200, {
+                        'id': 'chatcmpl-mock',
+                        'object': 'chat.completion',
+                        'created': int(time.time()),
+                        'model': model,
+                        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                        'usage': usage
+                    })
+                    return
+
+                with server._lock:
+                    server.stats['streamed'] += 1
+                self.send_response(200)
+                self.send_header('content-type', 'text/event-stream')
+                self.send_header('transfer-encoding', 'chunked')
+                self.end_headers()
+                try:
+                    for i in range(0, len(content), 8):
+                        chunk = {
+                            'id': 'chatcmpl-mock',
+                            'object': 'chat.completion.chunk',
+                            'created': int(time.time()),
+                            'model': model,
+                            'choices': [{'index': 0, 'delta': {'content': content[i:i + 8]}, 'finish_reason': None}]
+                        }
+                        self._send_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+                        if server.token_delay:
+                            time.sleep(server.token_delay)
+                    self._send_chunk("data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client hat den Stream vorzeitig geschlossen (Früh-Abbruch)
+                    self.close_connection = True
+
+        return Handler
+
+
+def load_canned(path: str) -> List[Tuple[str, str]]:
+    """JSON-Objekt {"Teilstring im Prompt": Antwort (Text oder JSON-Objekt)}"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return [(k, v if isinstance(v, str) else json.dumps(v, ensure_ascii=False)) for k, v in data.items()]
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Offline-Ersatz für die Groq-API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="fixed:0.05", help="fixed:s | uniform:a,b | normal:mu,sd | lognormal:median,sigma")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Pause pro gestreamtem Chunk (Sekunden)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil der Anfragen mit HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Anteil der Anfragen mit HTTP 429")
+    parser.add_argument("--rpm", type=int, default=0, help="Harte Grenze Anfragen pro Minute (0 = aus)")
+    parser.add_argument("--canned", help="JSON-Datei mit festen Antworten pro Prompt-Teilstring")
+    parser.add_argument("--article-paragraphs", type=int, default=40)
+    parser.add_argument("--pack-miss-rate", type=float, default=0.0, help="Anteil der Postings, die in gepackten Antworten fehlen")
+    args = parser.parse_args(argv)
+
+    server = MockGroqServer(
+        args.host, args.port, args.latency, args.token_delay, args.error_rate, args.rate_limit_rate, args.rpm,
+        load_canned(args.canned) if args.canned else None, args.article_paragraphs, args.pack_miss_rate
+    )
+    print(f"Mock-Groq läuft auf {server.base_url} (GROQ_BASE_URL={server.base_url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
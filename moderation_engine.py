@@ -0,0 +1,5060 @@
+"""
+Moderations-Engine für DER STANDARD Forenpostings.
+
+Enthält die komplette Pipeline ohne UI: Artikel-Abruf und -Kontext, lokale
+Vorklassifizierung, Duplikat-Index, LLM-Analyse (sequenziell, parallel,
+kombiniert), Caches, Historie, Metriken und die Bulk-Moderation. Die
+Streamlit-App, der HTTP-Service (moderation_service.py) und der Benchmark
+nutzen dieselben prozessweiten Instanzen.
+
+    python moderation_engine.py --input postings.csv --url https://www.derstandard.at/story/...
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, SoupStrainer
+from groq import Groq, AsyncGroq, APIConnectionError, APIStatusError, InternalServerError, RateLimitError
+import json
+from datetime import datetime
+import pandas as pd
+import numpy as np
+from typing import Any, Callable, Dict, List, Tuple
+import time
+import os
+import re
+import io
+import sys
+import argparse
+import asyncio
+import threading
+import hashlib
+import sqlite3
+import queue
+import unicodedata
+import math
+import random
+import functools
+import heapq
+import itertools
+import contextvars
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
+import importlib.util
+import httpx
+from concurrent.futures import Future, ThreadPoolExecutor
+from dotenv import load_dotenv
+import logging
+
+# Load environment variables from .env file if it exists
+load_dotenv()
+
+def process_singleton(factory: Callable) -> Callable:
+    """Eine Instanz pro Prozess, beim ersten Aufruf thread-sicher erzeugt"""
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(factory)
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    return get
+
+# ====================================
+# FORENREGELN DEFINITION
+# ====================================
+
+DEFAULT_FORUM_RULES = {
+    "§1 DISKRIMINIERUNG": "Keine diskriminierenden Äußerungen bezüglich ethnischer Zugehörigkeit, Religion, Geschlecht, sexueller Orientierung, oder Behinderung.",
+    "§2 BELEIDIGUNG": "Keine persönlichen Beleidigungen, Beschimpfungen oder abwertenden Äußerungen über andere User oder Personen.",
+    "§3 GEWALT": "Keine Aufrufe zu Gewalt, Androhungen oder Verharmlosung von Gewalt.",
+    "§4 DESINFORMATION": "Keine wissentliche Verbreitung von Falschinformationen, insbesondere bei Gesundheits- oder Sicherheitsthemen.",
+    "§5 SPAM": "Kein Spam, keine Werbung, keine repetitiven Postings.",
+    "§6 RELEVANZ": "Postings müssen zum Artikelthema passen. Off-Topic Diskussionen sind zu vermeiden.",
+    "§7 HASSREDE": "Keine Hassrede oder extremistische Propaganda.",
+    "§8 PRIVATSPHÄRE": "Keine Veröffentlichung privater Informationen anderer Personen.",
+    "§9 TROLLING": "Kein absichtliches Stören der Diskussion oder Provokation.",
+    "§10 RESPEKT": "Respektvoller Umgang miteinander, auch bei Meinungsverschiedenheiten."
+}
+
+# Prompt-Anfänge pro Aufgabe (Anweisungen + Regeln), registriert bei den Prompt-Buildern
+PROMPT_PREFIX_BUILDERS: Dict[str, Callable[[str], str]] = {}
+
+def prompt_prefix_builder(task: str) -> Callable:
+    """Registriert eine Funktion rules_text -> Prompt-Anfang für RuleSet.prompt_prefix"""
+    def register(builder: Callable[[str], str]) -> Callable[[str], str]:
+        PROMPT_PREFIX_BUILDERS[task] = builder
+        return builder
+    return register
+
+@dataclass(frozen=True)
+class RuleSet:
+    """Unveränderliche Version eines Regelwerks.
+
+    version ist der Hash des Prompt-Texts, gleiche Regeln ergeben also immer
+    dieselbe Version. Die Prompt-Anfänge werden pro Version einmal erzeugt
+    und sind für alle Postings Byte für Byte gleich (Prefix-Caching beim Anbieter).
+    """
+    version: str
+    text: str
+    rules: Tuple[Tuple[str, str], ...] = ()
+    source: str = 'default'
+    created_at: float = field(default_factory=time.time, compare=False)
+    _prompts: Dict[str, str] = field(default_factory=dict, compare=False, repr=False)
+
+    def to_dict(self) -> Dict[str, str]:
+        return dict(self.rules)
+
+    def prompt_prefix(self, task: str) -> str:
+        prefix = self._prompts.get(task)
+        if prefix is None:
+            prefix = self._prompts[task] = PROMPT_PREFIX_BUILDERS[task](self.text)
+        return prefix
+
+class RuleSetRegistry:
+    """Alle Regelwerk-Versionen des Prozesses, nachschlagbar über Version oder Prompt-Text"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_text: Dict[str, RuleSet] = {}
+        self._by_version: Dict[str, RuleSet] = {}
+        self._default = None
+
+    def _register(self, text: str, rules: Tuple[Tuple[str, str], ...], source: str) -> RuleSet:
+        with self._lock:
+            rule_set = self._by_text.get(text)
+            if rule_set is None:
+                rule_set = RuleSet(content_hash(text), text, rules, source)
+                self._by_text[text] = rule_set
+                self._by_version[rule_set.version] = rule_set
+            return rule_set
+
+    def build(self, rules: Dict[str, str] = None, source: str = 'default') -> RuleSet:
+        """Version für ein Regel-Dict (Standard: DEFAULT_FORUM_RULES); bestehende Versionen werden wiederverwendet"""
+        if rules is None:
+            if self._default is None:
+                self._default = self.build(DEFAULT_FORUM_RULES)
+            return self._default
+        text = "FORENREGELN DER STANDARD:\n\n" + "\n\n".join([f"{rule}: {description}" for rule, description in rules.items()])
+        return self._register(text, tuple(rules.items()), source)
+
+    def for_text(self, rules_text: str) -> RuleSet:
+        """Version zu einem formatierten Regeltext, wie ihn die Analyse-Funktionen erhalten"""
+        rule_set = self._by_text.get(rules_text)
+        return rule_set if rule_set is not None else self._register(rules_text, (), 'text')
+
+    def get(self, version: str) -> RuleSet:
+        return self._by_version.get(version)
+
+@process_singleton
+def get_rule_sets() -> RuleSetRegistry:
+    """Prozessweites Register der Regelwerk-Versionen"""
+    return RuleSetRegistry()
+
+def build_rule_set(rules: Dict[str, str] = None, source: str = 'default') -> RuleSet:
+    """Neue oder bestehende Regelwerk-Version (Bearbeiten in der UI, JSON-Import, --rules)"""
+    return get_rule_sets().build(rules, source)
+
+def format_rules_for_prompt(rules: Dict[str, str] = None):
+    """Format the given rules (default: DEFAULT_FORUM_RULES) as text for LLM prompt"""
+    return get_rule_sets().build(rules).text
+
+def rule_key(rule: str) -> str:
+    """Vergleichsschlüssel einer Regel: '§3 BELEIDIGUNG' und '§ 3' ergeben beide '§3'"""
+    return re.sub(r'^(§)\s*(\d+).*', r'\1\2', str(rule).strip()).upper()
+
+def diff_rule_sets(old: RuleSet, new: RuleSet) -> Dict[str, List[str]]:
+    """Hinzugefügte, entfernte und geänderte Regeln (als rule_key) zwischen zwei Versionen"""
+    if not old.rules or not new.rules:
+        raise ValueError("Regelwerk-Versionen ohne Einzelregeln lassen sich nicht vergleichen")
+    old_rules = {rule_key(name): (name, description) for name, description in old.rules}
+    new_rules = {rule_key(name): (name, description) for name, description in new.rules}
+    return {
+        'added': [key for key in new_rules if key not in old_rules],
+        'removed': [key for key in old_rules if key not in new_rules],
+        'changed': [key for key in new_rules if key in old_rules and new_rules[key] != old_rules[key]]
+    }
+
+# ====================================
+# GROQ CLIENT POOL
+# ====================================
+
+# httpx-Verbindungspool, per Umgebungsvariable konfigurierbar
+GROQ_HTTP_MAX_CONNECTIONS = int(os.getenv("GROQ_HTTP_MAX_CONNECTIONS", "64"))
+GROQ_HTTP_MAX_KEEPALIVE = int(os.getenv("GROQ_HTTP_MAX_KEEPALIVE", "32"))
+GROQ_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_HTTP_KEEPALIVE_EXPIRY", "60"))
+GROQ_HTTP2 = os.getenv("GROQ_HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+GROQ_HTTP_TIMEOUT = float(os.getenv("GROQ_HTTP_TIMEOUT", "60"))
+
+class _TransportStats:
+    """Thread-sichere Zähler für Anfragen eines Transports"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def started(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self, failed: bool):
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.errors += 1
+
+class _CountingTransport(httpx.HTTPTransport):
+    """HTTPTransport, der laufende Anfragen für die Pool-Statistik zählt"""
+
+    def __init__(self, stats: _TransportStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.started()
+        failed = True
+        try:
+            response = super().handle_request(request)
+            failed = False
+            return response
+        finally:
+            self.stats.finished(failed)
+
+class _CountingAsyncTransport(httpx.AsyncHTTPTransport):
+    """AsyncHTTPTransport, der laufende Anfragen für die Pool-Statistik zählt"""
+
+    def __init__(self, stats: _TransportStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.started()
+        failed = True
+        try:
+            response = await super().handle_async_request(request)
+            failed = False
+            return response
+        finally:
+            self.stats.finished(failed)
+
+class GroqClientPool:
+    """Prozessweite Registry geteilter Groq-Clients (sync + async) pro API Key.
+
+    Sync-Clients sind thread-sicher und werden über alle Streamlit-Sessions
+    geteilt. Async-Clients sind an einen eigenen Event-Loop in einem
+    Hintergrund-Thread gebunden; Coroutinen werden mit run()/submit() dort
+    ausgeführt, damit Keep-Alive-Verbindungen über Läufe hinweg bestehen.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = GROQ_HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = GROQ_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry: float = GROQ_HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = GROQ_HTTP2,
+        timeout: float = GROQ_HTTP_TIMEOUT
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Tuple[Groq, _CountingTransport]] = {}
+        self._async_clients: Dict[str, Tuple[AsyncGroq, _CountingAsyncTransport]] = {}
+
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="groq-pool-loop", daemon=True)
+        self._loop_thread.start()
+
+    @staticmethod
+    def _key_id(api_key: str) -> str:
+        # Keine Klartext-Keys in Statistiken oder Logs
+        return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+    def get_client(self, api_key: str) -> Groq:
+        """Geteilter Sync-Client für diesen API Key"""
+        key_id = self._key_id(api_key)
+        with self._lock:
+            if key_id not in self._clients:
+                transport = _CountingTransport(_TransportStats(), http2=self.http2, limits=self.limits)
+                client = Groq(
+                    api_key=api_key,
+                    http_client=httpx.Client(transport=transport, timeout=self.timeout),
+                    max_retries=0  # Wiederholungen übernimmt der LLMScheduler
+                )
+                self._clients[key_id] = (client, transport)
+            return self._clients[key_id][0]
+
+    def get_async_client(self, api_key: str) -> AsyncGroq:
+        """Geteilter Async-Client; nur innerhalb von run()/submit() verwenden"""
+        key_id = self._key_id(api_key)
+        with self._lock:
+            if key_id not in self._async_clients:
+                transport = _CountingAsyncTransport(_TransportStats(), http2=self.http2, limits=self.limits)
+                client = AsyncGroq(
+                    api_key=api_key,
+                    http_client=httpx.AsyncClient(transport=transport, timeout=self.timeout),
+                    max_retries=0
+                )
+                self._async_clients[key_id] = (client, transport)
+            return self._async_clients[key_id][0]
+
+    def submit(self, coro) -> Future:
+        """Plant coro auf dem Pool-Loop ein und gibt ein concurrent.futures.Future zurück"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro):
+        """Führt coro auf dem Pool-Loop aus und wartet auf das Ergebnis"""
+        return self.submit(coro).result()
+
+    def call_soon(self, callback: Callable, *args):
+        """Ruft callback thread-sicher auf dem Pool-Loop auf (z. B. asyncio.Queue.put_nowait)"""
+        self._loop.call_soon_threadsafe(callback, *args)
+
+    @staticmethod
+    def _transport_stats(transport) -> Dict:
+        connections = getattr(getattr(transport, '_pool', None), 'connections', [])
+        idle = sum(1 for c in connections if c.is_idle())
+        return {
+            'requests': transport.stats.requests,
+            'errors': transport.stats.errors,
+            'in_flight': transport.stats.in_flight,
+            'peak_in_flight': transport.stats.peak_in_flight,
+            'connections_open': len(connections),
+            'connections_idle': idle
+        }
+
+    def stats(self) -> List[Dict]:
+        """Auslastung pro Client (Anfragen, laufend, Verbindungen offen/idle)"""
+        with self._lock:
+            entries = [('sync', key_id, t) for key_id, (_, t) in self._clients.items()]
+            entries += [('async', key_id, t) for key_id, (_, t) in self._async_clients.items()]
+
+        return [
+            {
+                'client': kind,
+                'key': key_id,
+                'max_connections': self.limits.max_connections,
+                'http2': self.http2,
+                **self._transport_stats(transport)
+            }
+            for kind, key_id, transport in entries
+        ]
+
+@process_singleton
+def get_client_pool() -> GroqClientPool:
+    """Einmal pro Prozess erzeugter, über Sessions geteilter Client-Pool"""
+    return GroqClientPool()
+
+# ====================================
+# RATE-LIMITS & WIEDERHOLUNGEN
+# ====================================
+
+# Client-seitige Budgets pro Modell und API Key: (Anfragen/Minute, Tokens/Minute), 0 = unbegrenzt.
+# Nur auf Wunsch: ohne GROQ_RATE_LIMITS gibt es keine Budgets (429 werden trotzdem wiederholt).
+# GROQ_RATE_LIMITS=free nimmt die Limits des kostenlosen Groq-Kontingents, JSON
+# {"modell": [rpm, tpm]} ("*" für alle übrigen) setzt eigene, "off" entspricht dem Standard.
+FREE_TIER_RATE_LIMITS = {
+    'llama3-8b-8192': (30, 6000),
+    'llama-3.3-70b-versatile': (30, 12000),
+    'openai/gpt-oss-120b': (30, 8000)
+}
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = 0.5  # Sekunden, verdoppelt pro Versuch (Full Jitter)
+LLM_BACKOFF_MAX = 20.0
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "300"))  # max. Wartezeit auf Budget
+LLM_SCHEDULER_POLL = 0.05  # der Erste prüft beim Warten auf Nachschub mindestens alle 5 × POLL
+RETRYABLE_STATUS_CODES = (408, 409, 502, 503, 504)
+
+# Interaktive Anfragen (Moderator in der UI) kommen vor Bulk-Läufen dran
+LLM_PRIORITIES = {'interactive': 0, 'bulk': 1}
+llm_priority = contextvars.ContextVar('llm_priority', default='interactive')
+# Reihenfolge innerhalb einer Spur, kleiner = früher (gesetzt vom gelernten Vorfilter nach Risiko)
+llm_urgency = contextvars.ContextVar('llm_urgency', default=0)
+
+def load_rate_limits(raw: str = None) -> Dict[str, Tuple[int, int]]:
+    raw = (os.getenv("GROQ_RATE_LIMITS", "") if raw is None else raw).strip()
+    if raw.lower() in ('', 'off'):
+        return {}
+    if raw.lower() == 'free':
+        return dict(FREE_TIER_RATE_LIMITS)
+    return {model: (int(rpm), int(tpm)) for model, (rpm, tpm) in json.loads(raw).items()}
+
+class LLMQueueTimeout(RuntimeError):
+    """Budget wurde innerhalb von LLM_QUEUE_TIMEOUT nicht frei"""
+
+class RateBudget:
+    """Token-Buckets für Anfragen und Tokens pro Minute eines Modells/Keys.
+
+    Wartende stehen in einem Heap nach (Spur, Dringlichkeit, Ankunft); nur der erste
+    darf Budget nehmen. Die übrigen schlafen, bis sie vorne stehen: wer den Heap
+    verlässt, ruft den Wecker des neuen Ersten auf. Nach einem 429 ist das Budget
+    bis blocked_until gesperrt. Ohne Limits (rpm = tpm = 0) wird nicht gewartet.
+    Nicht threadsicher; der LLMScheduler hält dafür seine Sperre.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = float(rpm)
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiting = []
+        self.wakers: Dict[Tuple[int, int, int], Callable[[], None]] = {}
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        self.updated = now
+        if self.rpm:
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    def try_acquire(self, ticket: Tuple[int, int, int], tokens: int, now: float,
+                    wake: Callable[[], None] = None) -> float:
+        """0.0 wenn das Budget genommen wurde, für den Ersten sonst die voraussichtliche
+        Wartezeit, für alle anderen None (wake wird aufgerufen, sobald sie vorne stehen)"""
+        self._refill(now)
+        if not self.rpm and not self.tpm and now >= self.blocked_until:
+            self._release(ticket)
+            return 0.0
+        if ticket not in self.wakers:
+            heapq.heappush(self.waiting, ticket)
+            self.wakers[ticket] = wake
+        if self.waiting[0] != ticket:
+            return None
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        # Ein Prompt über dem Minutenbudget wartet auf das volle Budget statt ewig
+        tokens = min(tokens, self.tpm)
+        waits = []
+        if self.rpm and self.requests < 1:
+            waits.append((1 - self.requests) * 60 / self.rpm)
+        if self.tpm and self.tokens < tokens:
+            waits.append((tokens - self.tokens) * 60 / self.tpm)
+        if waits:
+            return max(waits)
+        if self.rpm:
+            self.requests -= 1
+        if self.tpm:
+            self.tokens -= tokens
+        self._release(ticket)
+        return 0.0
+
+    def discard(self, ticket: Tuple[int, int, int]):
+        self._release(ticket)
+
+    def _release(self, ticket: Tuple[int, int, int]):
+        """Nimmt ticket aus der Warteschlange und weckt den neuen Ersten"""
+        if self.wakers.pop(ticket, False) is False:
+            return
+        if self.waiting[0] == ticket:
+            heapq.heappop(self.waiting)
+        else:
+            self.waiting.remove(ticket)
+            heapq.heapify(self.waiting)
+        if self.waiting and self.wakers.get(self.waiting[0]):
+            self.wakers[self.waiting[0]]()
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """Wartezeit vor dem nächsten Versuch oder None, wenn der Fehler nicht vorübergehend ist"""
+    backoff = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+    if isinstance(error, RateLimitError):
+        headers = error.response.headers
+        for header, scale in (('retry-after-ms', 1000), ('retry-after', 1)):
+            try:
+                return float(headers.get(header)) / scale
+            except (TypeError, ValueError):
+                continue
+        return backoff
+    if isinstance(error, (APIConnectionError, InternalServerError)):
+        return backoff
+    if isinstance(error, APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES:
+        return backoff
+    return None
+
+def _retry_reason(error: Exception) -> str:
+    if isinstance(error, RateLimitError):
+        return 'rate_limit'
+    if isinstance(error, APIConnectionError):
+        return 'connection'
+    return f"http_{getattr(error, 'status_code', 'error')}"
+
+class LLMScheduler:
+    """Zentrale Vergabe von LLM-Aufrufen nach Budget, Priorität und mit Wiederholungen.
+
+    call()/call_async() warten auf das Budget des Modells (Anfragen und
+    geschätzte Tokens), führen den Request aus und wiederholen vorübergehende
+    Fehler (429, 5xx, Verbindungsabbrüche) mit Jitter-Backoff. Ein 429 sperrt
+    das Budget für alle Wartenden bis retry-after. Die Spur kommt aus
+    llm_priority; Aufrufe aus Threads und vom Pool-Loop teilen die Budgets.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[int, int]] = None):
+        self.limits = load_rate_limits() if limits is None else limits
+        if limits is None:
+            logging.info(
+                "LLM-Rate-Limits (rpm, tpm): %s",
+                json.dumps(self.limits) if self.limits else "keine"
+            )
+        self._lock = threading.Lock()
+        self._budgets: Dict[Tuple[str, str], RateBudget] = {}
+        self._seq = itertools.count()
+
+    def budget(self, client: Any, model: str) -> RateBudget:
+        key = (GroqClientPool._key_id(client.api_key), model)
+        with self._lock:
+            if key not in self._budgets:
+                rpm, tpm = self.limits.get(model, self.limits.get('*', (0, 0)))
+                self._budgets[key] = RateBudget(rpm, tpm)
+            return self._budgets[key]
+
+    def _ticket(self) -> Tuple[int, int, int]:
+        return (LLM_PRIORITIES.get(llm_priority.get(), 0), llm_urgency.get(), next(self._seq))
+
+    def _poll(self, budget: RateBudget, ticket: Tuple[int, int, int], tokens: int, started: float,
+              wake: Callable[[], None]) -> float:
+        """0.0 wenn das Budget genommen wurde, sonst die Zeit bis zum nächsten Versuch (oder Wecken)"""
+        with self._lock:
+            wait = budget.try_acquire(ticket, tokens, time.monotonic(), wake)
+        elapsed = time.monotonic() - started
+        if wait is None:
+            # Nicht vorne: schlafen, bis der Vorgänger geht, längstens bis zum Timeout
+            wait = LLM_QUEUE_TIMEOUT - elapsed
+            if wait <= 0:
+                raise LLMQueueTimeout(f"Kein Rate-Limit-Budget nach {LLM_QUEUE_TIMEOUT:.0f}s")
+            return wait
+        if wait and elapsed + wait > LLM_QUEUE_TIMEOUT:
+            raise LLMQueueTimeout(f"Kein Rate-Limit-Budget nach {LLM_QUEUE_TIMEOUT:.0f}s")
+        return min(wait, LLM_SCHEDULER_POLL * 5)
+
+    def _acquire(self, budget: RateBudget, ticket: Tuple[int, int, int], tokens: int):
+        started = time.monotonic()
+        woken = threading.Event()
+        try:
+            while True:
+                woken.clear()
+                wait = self._poll(budget, ticket, tokens, started, woken.set)
+                if not wait:
+                    break
+                woken.wait(wait)
+        except BaseException:
+            with self._lock:
+                budget.discard(ticket)
+            raise
+        self._observe_wait(started)
+
+    async def _acquire_async(self, budget: RateBudget, ticket: Tuple[int, int, int], tokens: int):
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+
+        def wake():
+            # Geweckt wird unter der Scheduler-Sperre, ggf. aus einem anderen Thread
+            try:
+                loop.call_soon_threadsafe(woken.set)
+            except RuntimeError:  # Loop bereits geschlossen
+                pass
+
+        try:
+            while True:
+                woken.clear()
+                wait = self._poll(budget, ticket, tokens, started, wake)
+                if not wait:
+                    break
+                try:
+                    await asyncio.wait_for(woken.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                budget.discard(ticket)
+            raise
+        self._observe_wait(started)
+
+    @staticmethod
+    def _observe_wait(started: float):
+        get_metrics().observe('llm_queue_wait_seconds', time.monotonic() - started, lane=llm_priority.get())
+
+    def _settle(self, budget: RateBudget, reserved: int, result: Any):
+        """Reservierte Tokens mit dem tatsächlichen Verbrauch verrechnen (nur ohne Streaming bekannt)"""
+        usage = getattr(result, 'usage', None)
+        used = getattr(usage, 'total_tokens', None)
+        if budget.tpm and used is not None:
+            with self._lock:
+                budget.tokens = min(budget.tpm, budget.tokens + min(reserved, budget.tpm) - used)
+
+    def _should_retry(self, budget: RateBudget, error: Exception, attempt: int, model: str) -> float:
+        delay = retry_delay(error, attempt)
+        if delay is None or attempt >= LLM_MAX_RETRIES:
+            return None
+        get_metrics().incr('llm_retries_total', model=model, reason=_retry_reason(error))
+        if isinstance(error, RateLimitError):
+            # Sperrt das Budget für alle; gewartet wird danach in _acquire
+            with self._lock:
+                budget.blocked_until = max(budget.blocked_until, time.monotonic() + delay)
+            return 0.0
+        return delay
+
+    def call(self, client: Groq, model: str, tokens: int, request: Callable[[], Any]) -> Any:
+        """Führt request() aus, sobald Budget frei ist; wiederholt vorübergehende Fehler"""
+        budget = self.budget(client, model)
+        ticket = self._ticket()
+        for attempt in itertools.count():
+            self._acquire(budget, ticket, tokens)
+            try:
+                result = request()
+            except Exception as e:
+                delay = self._should_retry(budget, e, attempt, model)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._settle(budget, tokens, result)
+            return result
+
+    async def call_async(self, client: AsyncGroq, model: str, tokens: int, request: Callable[[], Any]) -> Any:
+        """Async-Variante von call(); request() liefert eine Coroutine"""
+        budget = self.budget(client, model)
+        ticket = self._ticket()
+        for attempt in itertools.count():
+            await self._acquire_async(budget, ticket, tokens)
+            try:
+                result = await request()
+            except Exception as e:
+                delay = self._should_retry(budget, e, attempt, model)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._settle(budget, tokens, result)
+            return result
+
+    def stats(self) -> List[Dict]:
+        """Budget und Warteschlange pro Modell/Key"""
+        now = time.monotonic()
+        lanes = {v: k for k, v in LLM_PRIORITIES.items()}
+        with self._lock:
+            rows = []
+            for (key_id, model), budget in self._budgets.items():
+                budget._refill(now)
+                waiting = Counter(lanes.get(priority, priority) for priority, _, _ in budget.waiting)
+                rows.append({
+                    'model': model,
+                    'key': key_id,
+                    'rpm': budget.rpm,
+                    'tpm': budget.tpm,
+                    'requests_available': budget.requests if budget.rpm else None,
+                    'tokens_available': budget.tokens if budget.tpm else None,
+                    'waiting_interactive': waiting.get('interactive', 0),
+                    'waiting_bulk': waiting.get('bulk', 0),
+                    'blocked_for': max(0.0, budget.blocked_until - now)
+                })
+            return rows
+
+@process_singleton
+def get_llm_scheduler() -> LLMScheduler:
+    """Prozessweiter Scheduler (Budgets gelten für alle Sessions, Bulk-Läufe und den Service)"""
+    return LLMScheduler()
+
+# ====================================
+# INSTRUMENTIERUNG & METRIKEN
+# ====================================
+
+METRICS_JSONL_PATH = os.getenv("METRICS_JSONL_PATH")  # optionaler Sink: jedes Ereignis als JSON-Zeile
+PROMPT_LOG_SAMPLE_RATE = float(os.getenv("PROMPT_LOG_SAMPLE_RATE", "0"))  # Anteil geloggter Prompts, 0 = aus
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_PREFIX = "moderation_"
+
+prompt_logger = logging.getLogger("moderation.prompts")
+
+def _escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Metrics:
+    """Prozessweite Zähler und Span-Histogramme, exportierbar im Prometheus-Textformat.
+
+    Mit jsonl_path wird jedes Ereignis (Span, Token-Verbrauch, Zähler)
+    zusätzlich als JSON-Zeile geschrieben.
+    """
+
+    def __init__(self, jsonl_path: str = METRICS_JSONL_PATH):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self._sink = None
+        if jsonl_path:
+            if os.path.dirname(jsonl_path):
+                os.makedirs(os.path.dirname(jsonl_path), exist_ok=True)
+            self._sink = open(jsonl_path, 'a', encoding='utf-8', buffering=1)
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> Tuple[str, Tuple]:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def _emit(self, event: Dict):
+        if self._sink is None:
+            return
+        line = json.dumps({'ts': time.time(), **event}, ensure_ascii=False)
+        with self._lock:
+            self._sink.write(line + '\n')
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self._emit({'type': 'counter', 'name': name, 'value': value, **labels})
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.setdefault(key, {'buckets': [0] * len(SPAN_BUCKETS), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(SPAN_BUCKETS):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """Misst einen Abschnitt der Pipeline; Ausnahmen werden als status=error gezählt und weitergereicht"""
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.observe('span_duration_seconds', duration, span=name, status=status, **labels)
+            self._emit({'type': 'span', 'span': name, 'status': status, 'duration_ms': duration * 1000, **labels})
+
+    def record_usage(self, task: str, model: str, usage: Any):
+        """Token-Verbrauch aus completion.usage"""
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        with self._lock:
+            for kind, tokens in (('prompt', prompt_tokens), ('completion', completion_tokens)):
+                key = self._key('llm_tokens_total', {'task': task, 'model': model, 'kind': kind})
+                self.counters[key] = self.counters.get(key, 0) + tokens
+        self._emit({
+            'type': 'usage', 'task': task, 'model': model,
+            'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens
+        })
+
+    def counter_total(self, name: str, **labels) -> float:
+        """Summe eines Zählers über alle Label-Kombinationen, die zu labels passen"""
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        with self._lock:
+            return sum(v for (n, l), v in self.counters.items() if n == name and wanted <= set(l))
+
+    def span_summary(self) -> List[Dict]:
+        """Anzahl, Mittelwert und p95 (obere Bucket-Grenze) pro Span und Aufgabe"""
+        rows = []
+        with self._lock:
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name != 'span_duration_seconds' or not h['count']:
+                    continue
+                seen, p95 = 0, float('inf')
+                for bound, n in zip(SPAN_BUCKETS, h['buckets']):
+                    seen += n
+                    if seen >= 0.95 * h['count']:
+                        p95 = bound
+                        break
+                rows.append({**dict(labels), 'count': h['count'], 'avg_ms': h['sum'] / h['count'] * 1000, 'p95_ms': p95 * 1000})
+        return rows
+
+    def prometheus_text(self) -> str:
+        """Alle Metriken im Prometheus-Textformat (Version 0.0.4)"""
+        def labels_text(labels: Tuple, extra: Tuple = ()) -> str:
+            pairs = list(labels) + list(extra)
+            return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + '}' if pairs else ''
+
+        lines = []
+        with self._lock:
+            for name in sorted({n for n, _ in self.counters}):
+                lines.append(f"# TYPE {METRICS_PREFIX}{name} counter")
+                for (n, labels), value in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f"{METRICS_PREFIX}{name}{labels_text(labels)} {value}")
+            for name in sorted({n for n, _ in self.histograms}):
+                lines.append(f"# TYPE {METRICS_PREFIX}{name} histogram")
+                for (n, labels), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(SPAN_BUCKETS, h['buckets']):
+                        cumulative += count
+                        lines.append(f"{METRICS_PREFIX}{name}_bucket{labels_text(labels, (('le', bound),))} {cumulative}")
+                    lines.append(f"{METRICS_PREFIX}{name}_bucket{labels_text(labels, (('le', '+Inf'),))} {h['count']}")
+                    lines.append(f"{METRICS_PREFIX}{name}_sum{labels_text(labels)} {h['sum']}")
+                    lines.append(f"{METRICS_PREFIX}{name}_count{labels_text(labels)} {h['count']}")
+        return '\n'.join(lines) + '\n'
+
+@process_singleton
+def get_metrics() -> Metrics:
+    """Prozessweite Metriken"""
+    return Metrics()
+
+def log_prompt(task: str, model: str, prompt: str):
+    """Loggt einen Anteil von PROMPT_LOG_SAMPLE_RATE der Prompts (Standard: keinen)"""
+    if PROMPT_LOG_SAMPLE_RATE and random.random() < PROMPT_LOG_SAMPLE_RATE:
+        prompt_logger.info("Prompt %s/%s (≈%d Tokens):\n%s", task, model, len(prompt) // 4, prompt)
+
+def reserved_tokens(prompt: str, options: Dict) -> int:
+    """Für das Rate-Limit-Budget: geschätzter Prompt plus maximale Antwortlänge"""
+    return estimate_tokens(prompt) + options.get('max_tokens', 0)
+
+# Sammelt je Kaskaden-Stufe (prompt_tokens, completion_tokens) der Aufrufe; None steht für einen
+# gestreamten Aufruf ohne verlässliche Zählung
+llm_usage = contextvars.ContextVar('llm_usage', default=None)
+
+def note_llm_usage(usage: Any):
+    """Trägt completion.usage in die Sammlung der laufenden Kaskaden-Stufe ein (falls eine läuft)"""
+    collected = llm_usage.get()
+    if collected is None:
+        return
+    if usage is None:
+        collected.append(None)
+    else:
+        collected.append((getattr(usage, 'prompt_tokens', 0) or 0, getattr(usage, 'completion_tokens', 0) or 0))
+
+def llm_complete(client: Groq, task: str, model: str, prompt: str) -> str:
+    """Instrumentierter LLM-Aufruf über den Scheduler: Wartezeit als Span, Token-Verbrauch aus completion.usage"""
+    log_prompt(task, model, prompt)
+    metrics = get_metrics()
+    options = completion_options(task, model)
+    with metrics.span('llm_wait', task=task, model=model):
+        completion = get_llm_scheduler().call(
+            client, model, reserved_tokens(prompt, options),
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                **options
+            )
+        )
+    metrics.record_usage(task, model, completion.usage)
+    note_llm_usage(completion.usage)
+    return completion.choices[0].message.content
+
+async def llm_complete_async(client: AsyncGroq, task: str, model: str, prompt: str, max_tokens: int = None) -> str:
+    """Async-Variante von llm_complete (max_tokens überschreibt das Limit der Aufgabe)"""
+    log_prompt(task, model, prompt)
+    metrics = get_metrics()
+    options = completion_options(task, model, max_tokens=max_tokens)
+    with metrics.span('llm_wait', task=task, model=model):
+        completion = await get_llm_scheduler().call_async(
+            client, model, reserved_tokens(prompt, options),
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                **options
+            )
+        )
+    metrics.record_usage(task, model, completion.usage)
+    note_llm_usage(completion.usage)
+    return completion.choices[0].message.content
+
+# ====================================
+# ERGEBNIS-CACHE
+# ====================================
+
+RESULT_CACHE_PATH = os.getenv("MODERATION_CACHE_PATH", os.path.join(".cache", "moderation_cache.sqlite3"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("MODERATION_CACHE_MAX_ENTRIES", "50000"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("MODERATION_CACHE_TTL", str(7 * 24 * 3600)))
+
+def normalize_posting(posting: str) -> str:
+    """Normalisiert ein Posting für den Cache-Key (Unicode, Groß-/Kleinschreibung, Leerraum, Satzzeichen-Wiederholungen)"""
+    text = unicodedata.normalize('NFKC', posting).casefold()
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'([!?.,])\1+', r'\1', text)
+    return text.strip(' "\'„“”»«')
+
+def content_hash(text: str) -> str:
+    """Kurzer, stabiler Hash für Regeln/Artikelinhalt"""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()[:16]
+
+def make_cache_key(kind: str, posting: str, article_content: str, model: str, rules_text: str = '') -> str:
+    """Cache-Key aus Analyseart, normalisiertem Posting, Regel-Hash, Artikel-Hash und Modell"""
+    parts = [kind, normalize_posting(posting), content_hash(rules_text), content_hash(article_content), model]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+class ModerationCache:
+    """SQLite-basierter Ergebnis-Cache mit LRU-Größenbegrenzung und TTL.
+
+    Überlebt Neustarts der App; Zugriffe sind über einen Lock serialisiert,
+    damit die Instanz prozessweit von allen Sessions und Threads genutzt
+    werden kann.
+    """
+
+    def __init__(
+        self,
+        path: str = RESULT_CACHE_PATH,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = RESULT_CACHE_TTL_SECONDS
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS result_cache (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_result_cache_last_access ON result_cache(last_access)")
+        self._conn.commit()
+        self._purge_expired()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+
+    def get(self, key: str, kind: str) -> Dict:
+        """Liefert das gecachte Ergebnis oder None (abgelaufene Einträge zählen als Fehlgriff)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl_seconds:
+                self._conn.execute("UPDATE result_cache SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+                return json.loads(row[0])
+
+            if row:
+                self._conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._count -= 1
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            return None
+
+    def put(self, key: str, kind: str, value: Dict):
+        """Speichert ein Ergebnis und verdrängt bei Überlauf die am längsten ungenutzten Einträge"""
+        now = time.time()
+        with self._lock:
+            existed = self._conn.execute("SELECT 1 FROM result_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, kind, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            if not existed:
+                self._count += 1
+            if self._count > self.max_entries:
+                # In Blöcken verdrängen, damit nicht jeder Insert einen DELETE auslöst
+                evict = self._count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM result_cache WHERE key IN (SELECT key FROM result_cache ORDER BY last_access LIMIT ?)",
+                    (evict,)
+                )
+                self._count -= evict
+            self._conn.commit()
+
+    def _purge_expired(self):
+        self._conn.execute("DELETE FROM result_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._conn.commit()
+
+    def clear(self):
+        """Leert den Cache und setzt die Zähler zurück"""
+        with self._lock:
+            self._conn.execute("DELETE FROM result_cache")
+            self._conn.commit()
+            self._count = 0
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self) -> Dict:
+        """Treffer/Fehlgriffe seit Prozessstart und aktuelle Anzahl Einträge"""
+        with self._lock:
+            hits = sum(self.hits.values())
+            misses = sum(self.misses.values())
+            return {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                'entries': self._count,
+                'by_kind': {
+                    kind: {'hits': self.hits.get(kind, 0), 'misses': self.misses.get(kind, 0)}
+                    for kind in sorted(set(self.hits) | set(self.misses))
+                }
+            }
+
+@process_singleton
+def get_result_cache() -> ModerationCache:
+    """Prozessweiter Ergebnis-Cache"""
+    return ModerationCache()
+
+def cached_result(kind: str, posting: str, article_content: str, model: str, rules_text: str = '') -> Tuple[str, Dict]:
+    """Schlägt ein Ergebnis im Cache nach; liefert (key, Ergebnis oder None)"""
+    key = make_cache_key(kind, posting, article_content, model, rules_text)
+    result = get_result_cache().get(key, kind)
+    get_metrics().incr('cache_requests_total', kind=kind, result='hit' if result is not None else 'miss')
+    if result is not None:
+        result['cached'] = True
+    return key, result
+
+def store_cached_result(key: str, kind: str, result: Dict):
+    """Legt nur verwertbare Ergebnisse ab (keine Fehler, keine ungültigen Antworten, keine abgebrochenen Streams)"""
+    if result.get('error') or result.get('parse_error') or result.get('early_stop') or result.get('decision') == 'ERROR':
+        return
+    get_result_cache().put(key, kind, result)
+
+# ====================================
+# MODERATIONS-HISTORIE
+# ====================================
+
+HISTORY_PATH = os.getenv("MODERATION_HISTORY_PATH", os.path.join(".cache", "moderation_history.sqlite3"))
+HISTORY_BATCH_SIZE = 200
+HISTORY_FLUSH_INTERVAL = 0.5  # Sekunden, nach denen ein angefangener Batch geschrieben wird
+HISTORY_PAGE_SIZES = (10, 25, 50, 100)
+
+class QuantileSketch:
+    """Quantil-Schätzer mit logarithmischen Buckets (relativer Fehler <= relative_accuracy).
+
+    add() ist O(1), quantile() läuft über die wenigen belegten Buckets –
+    unabhängig von der Anzahl der Werte.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-4):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets = Counter()
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= self.min_value:
+            self.zero_count += 1
+        else:
+            self.buckets[math.ceil(math.log(value) / self._log_gamma)] += 1
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+class DashboardAggregates:
+    """Laufende Kennzahlen für das Analyse-Dashboard, O(1) pro neuem Ergebnis"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.by_decision = Counter()
+        self.confidence_sum = 0
+        self.time_sum = 0.0
+        self.prompt_tokens_sum = 0
+        self.prompt_tokens_count = 0
+        self.rule_counts = Counter()
+        self.mode_times = {}
+        self.confidence_histogram = [0] * 101  # Konfidenz ist ganzzahlig 0-100: exakte Quantile
+        self.latency = QuantileSketch()
+
+    def add(self, decision: str, confidence: int, analysis_time: float, prompt_tokens: int, violated_rules: List[str], mode: str):
+        confidence = min(100, max(0, int(confidence or 0)))
+        analysis_time = analysis_time or 0.0
+        with self._lock:
+            self.total += 1
+            self.by_decision[decision] += 1
+            self.confidence_sum += confidence
+            self.confidence_histogram[confidence] += 1
+            self.time_sum += analysis_time
+            self.latency.add(analysis_time)
+            if prompt_tokens:
+                self.prompt_tokens_sum += prompt_tokens
+                self.prompt_tokens_count += 1
+            self.rule_counts.update(violated_rules or [])
+            mode_sum, mode_count = self.mode_times.get(mode or 'sequential', (0.0, 0))
+            self.mode_times[mode or 'sequential'] = (mode_sum + analysis_time, mode_count + 1)
+
+    def add_result(self, result: Dict):
+        self.add(
+            result.get('decision', 'ERROR'), result.get('confidence'), result.get('analysis_time'),
+            result.get('prompt_tokens'), result.get('violated_rules'), result.get('analysis_mode')
+        )
+
+    def _confidence_quantile(self, q: float) -> int:
+        rank, seen = q * (self.total - 1), 0
+        for confidence, n in enumerate(self.confidence_histogram):
+            seen += n
+            if rank < seen:
+                return confidence
+        return 100
+
+    def snapshot(self) -> Dict:
+        """Kennzahlen zum Anzeigen; Aufwand unabhängig von der Anzahl der Ergebnisse"""
+        with self._lock:
+            total = self.total
+            return {
+                'total': total,
+                'deleted': self.by_decision['LÖSCHEN'],
+                'approved': self.by_decision['FREISCHALTEN'],
+                'avg_confidence': self.confidence_sum / total if total else 0.0,
+                'avg_time': self.time_sum / total if total else 0.0,
+                'avg_prompt_tokens': self.prompt_tokens_sum / self.prompt_tokens_count if self.prompt_tokens_count else None,
+                'rule_counts': dict(self.rule_counts.most_common()),
+                'mode_times': {mode: (s / n, n) for mode, (s, n) in self.mode_times.items()},
+                'confidence_buckets': {
+                    bucket: sum(self.confidence_histogram[bucket:bucket + 10 if bucket < 90 else 101])
+                    for bucket in range(0, 100, 10)
+                },
+                'confidence_quantiles': {q: self._confidence_quantile(q) for q in (0.5, 0.9)} if total else {},
+                'latency_quantiles': {q: self.latency.quantile(q) for q in (0.5, 0.95, 0.99)} if total else {}
+            }
+
+class HistoryStore:
+    """Persistente Moderations-Historie in SQLite.
+
+    record() legt Ergebnisse nur in eine Queue; ein Writer-Thread schreibt
+    sie gebündelt in einer Transaktion, sodass das Protokollieren die
+    Moderation nicht verzögert. Abfragen laufen paginiert und gefiltert
+    über die Indizes auf Zeitpunkt, Entscheidung, Regel und Artikel-URL.
+    Die Dashboard-Kennzahlen (aggregates) werden beim Start einmal aus der
+    Tabelle aufgebaut und danach bei jedem record() fortgeschrieben.
+    """
+
+    def __init__(self, path: str = HISTORY_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._queue = queue.Queue()
+        self._read_lock = threading.Lock()
+        self._reader = self._connect()
+        self._reader.executescript("""
+            CREATE TABLE IF NOT EXISTS decisions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp REAL NOT NULL,
+                article_url TEXT,
+                posting TEXT NOT NULL,
+                decision TEXT NOT NULL,
+                confidence INTEGER,
+                source TEXT,
+                analysis_mode TEXT,
+                analysis_time REAL,
+                prompt_tokens INTEGER,
+                payload TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS decision_rules (
+                decision_id INTEGER NOT NULL REFERENCES decisions(id),
+                rule TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_decisions_timestamp ON decisions(timestamp);
+            CREATE INDEX IF NOT EXISTS idx_decisions_decision ON decisions(decision, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_decisions_article ON decisions(article_url, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_decision_rules_rule ON decision_rules(rule, decision_id);
+            CREATE INDEX IF NOT EXISTS idx_decision_rules_decision ON decision_rules(decision_id);
+            CREATE TABLE IF NOT EXISTS rule_sets (
+                version TEXT PRIMARY KEY,
+                created REAL NOT NULL,
+                source TEXT,
+                rules TEXT NOT NULL
+            );
+        """)
+        columns = {row[1] for row in self._reader.execute("PRAGMA table_info(decisions)")}
+        if 'rules_version' not in columns:
+            self._reader.execute("ALTER TABLE decisions ADD COLUMN rules_version TEXT")
+        self._reader.execute("CREATE INDEX IF NOT EXISTS idx_decisions_rules_version ON decisions(rules_version, timestamp)")
+        self._reader.commit()
+        self._saved_rule_sets = {row[0] for row in self._reader.execute("SELECT version FROM rule_sets")}
+        self.aggregates = DashboardAggregates()
+        self._load_aggregates()
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _load_aggregates(self):
+        rules_by_decision = {}
+        for decision_id, rule in self._reader.execute("SELECT decision_id, rule FROM decision_rules"):
+            rules_by_decision.setdefault(decision_id, []).append(rule)
+        rows = self._reader.execute(
+            "SELECT id, decision, confidence, analysis_time, prompt_tokens, analysis_mode FROM decisions"
+        )
+        for decision_id, decision, confidence, analysis_time, prompt_tokens, mode in rows:
+            self.aggregates.add(decision, confidence, analysis_time, prompt_tokens, rules_by_decision.get(decision_id), mode)
+
+    def record(self, result: Dict):
+        """Reiht ein Analyse-Ergebnis zum Schreiben ein und aktualisiert die Kennzahlen (kehrt sofort zurück)"""
+        self.aggregates.add_result(result)
+        self._queue.put(result)
+
+    def record_rule_set(self, rule_set: RuleSet):
+        """Speichert eine Regelwerk-Version (über den Writer-Thread, kehrt sofort zurück)"""
+        self._queue.put(rule_set)
+
+    @property
+    def revision(self) -> int:
+        """Steigt mit jedem record(); Anzeigen cachen ihre Abfragen pro Revision"""
+        return self.aggregates.total
+
+    def flush(self):
+        """Wartet, bis alle eingereihten Ergebnisse geschrieben sind"""
+        self._queue.join()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + HISTORY_FLUSH_INTERVAL
+            while len(batch) < HISTORY_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            try:
+                with get_metrics().span('history_write'):
+                    self._write_batch(conn, batch)
+            except sqlite3.Error as e:
+                logging.warning("Historie konnte nicht geschrieben werden: %s", e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_rule_set(self, conn: sqlite3.Connection, rule_set: RuleSet, pending: set):
+        if rule_set.version in self._saved_rule_sets or rule_set.version in pending:
+            return
+        pending.add(rule_set.version)
+        conn.execute(
+            "INSERT OR IGNORE INTO rule_sets (version, created, source, rules) VALUES (?, ?, ?, ?)",
+            (rule_set.version, rule_set.created_at, rule_set.source, json.dumps(rule_set.rules, ensure_ascii=False))
+        )
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[Any]):
+        # Versionen gelten erst nach dem Commit als gespeichert; scheitert die
+        # Transaktion, werden sie mit dem nächsten Batch erneut geschrieben
+        pending = set()
+        with conn:
+            for result in batch:
+                if isinstance(result, RuleSet):
+                    self._write_rule_set(conn, result, pending)
+                    continue
+                rule_set = get_rule_sets().get(result.get('rules_version'))
+                if rule_set is not None:
+                    self._write_rule_set(conn, rule_set, pending)
+                record = serialize_result(result)
+                timestamp = result.get('timestamp')
+                cursor = conn.execute(
+                    "INSERT INTO decisions (timestamp, article_url, posting, decision, confidence, source, "
+                    "analysis_mode, analysis_time, prompt_tokens, rules_version, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        timestamp.timestamp() if isinstance(timestamp, datetime) else time.time(),
+                        result.get('article_url'),
+                        result.get('posting', ''),
+                        result.get('decision', 'ERROR'),
+                        result.get('confidence'),
+                        result.get('source'),
+                        result.get('analysis_mode'),
+                        result.get('analysis_time'),
+                        result.get('prompt_tokens'),
+                        result.get('rules_version'),
+                        json.dumps(record, ensure_ascii=False, default=str)
+                    )
+                )
+                conn.executemany(
+                    "INSERT INTO decision_rules (decision_id, rule) VALUES (?, ?)",
+                    [(cursor.lastrowid, rule) for rule in result.get('violated_rules') or []]
+                )
+        self._saved_rule_sets |= pending
+
+    @staticmethod
+    def _where(
+        decision: str = None, rule: str = None, article_url: str = None, rules_version: str = None
+    ) -> Tuple[str, List]:
+        clauses, params = [], []
+        if decision:
+            clauses.append("d.decision = ?")
+            params.append(decision)
+        if rule:
+            clauses.append("d.id IN (SELECT decision_id FROM decision_rules WHERE rule = ?)")
+            params.append(rule)
+        if article_url:
+            clauses.append("d.article_url = ?")
+            params.append(article_url)
+        if rules_version:
+            clauses.append("d.rules_version = ?")
+            params.append(rules_version)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _fetch(self, sql: str, params: List = ()) -> List[Tuple]:
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def count(self, **filters) -> int:
+        where, params = self._where(**filters)
+        return self._fetch(f"SELECT COUNT(*) FROM decisions d{where}", params)[0][0]
+
+    def page(self, limit: int, offset: int = 0, **filters) -> List[Dict]:
+        """Neueste Ergebnisse zuerst, als Dicts im Format der Analyse-Ergebnisse"""
+        where, params = self._where(**filters)
+        rows = self._fetch(
+            f"SELECT d.id, d.timestamp, d.payload FROM decisions d{where} ORDER BY d.timestamp DESC, d.id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        )
+        items = []
+        for history_id, timestamp, payload in rows:
+            item = json.loads(payload)
+            item['history_id'] = history_id
+            item['timestamp'] = datetime.fromtimestamp(timestamp)
+            items.append(item)
+        return items
+
+    def summaries(self, limit: int, offset: int = 0, **filters) -> List[Dict]:
+        """Wie page(), aber nur die Listenspalten; das JSON der Ergebnisse wird nicht gelesen"""
+        where, params = self._where(**filters)
+        rows = self._fetch(
+            f"SELECT d.id, d.timestamp, d.decision, d.confidence, substr(d.posting, 1, 200), d.article_url, "
+            f"(SELECT group_concat(r.rule, ', ') FROM decision_rules r WHERE r.decision_id = d.id) "
+            f"FROM decisions d{where} ORDER BY d.timestamp DESC, d.id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        )
+        return [
+            {
+                'history_id': history_id,
+                'timestamp': datetime.fromtimestamp(timestamp),
+                'decision': decision,
+                'confidence': confidence,
+                'posting': posting,
+                'article_url': article_url,
+                'violated_rules': rules or ''
+            }
+            for history_id, timestamp, decision, confidence, posting, article_url, rules in rows
+        ]
+
+    def get(self, history_id: int) -> Dict:
+        """Ein vollständiges Ergebnis (None, wenn es die ID nicht gibt)"""
+        rows = self._fetch("SELECT id, timestamp, payload FROM decisions WHERE id = ?", [history_id])
+        if not rows:
+            return None
+        _, timestamp, payload = rows[0]
+        item = json.loads(payload)
+        item['history_id'] = history_id
+        item['timestamp'] = datetime.fromtimestamp(timestamp)
+        return item
+
+    def distinct(self, column: str) -> List[str]:
+        """Vorhandene Werte für Filter-Auswahlen (decision, article_url, rules_version oder rule)"""
+        if column == 'rule':
+            sql = "SELECT DISTINCT rule FROM decision_rules ORDER BY rule"
+        elif column in ('decision', 'article_url', 'rules_version'):
+            sql = f"SELECT DISTINCT {column} FROM decisions WHERE {column} IS NOT NULL ORDER BY {column}"
+        else:
+            raise ValueError(f"Unbekannte Spalte: {column}")
+        return [row[0] for row in self._fetch(sql)]
+
+    def rule_set_versions(self) -> List[Dict]:
+        """Gespeicherte Regelwerk-Versionen, neueste zuerst, mit Anzahl der Entscheidungen"""
+        rows = self._fetch(
+            "SELECT r.version, r.created, r.source, r.rules, "
+            "(SELECT COUNT(*) FROM decisions d WHERE d.rules_version = r.version) "
+            "FROM rule_sets r ORDER BY r.created DESC"
+        )
+        return [
+            {
+                'version': version,
+                'created': datetime.fromtimestamp(created),
+                'source': source,
+                'rules': len(json.loads(rules)),
+                'decisions': decisions
+            }
+            for version, created, source, rules, decisions in rows
+        ]
+
+    def load_rule_set(self, version: str) -> RuleSet:
+        """Regelwerk-Version aus dem Register oder der Datenbank (None, wenn unbekannt)"""
+        rule_set = get_rule_sets().get(version)
+        if rule_set is not None:
+            return rule_set
+        rows = self._fetch("SELECT source, rules FROM rule_sets WHERE version = ?", [version])
+        if not rows:
+            return None
+        source, rules = rows[0]
+        rule_set = build_rule_set(dict(json.loads(rules)), source)
+        return rule_set if rule_set.version == version else None
+
+    def latest_decisions(self, rules_version: str) -> List[Dict]:
+        """Jüngste Entscheidung je Posting und Artikel unter einer Regelwerk-Version (ohne Fehler)"""
+        rows = self._fetch(
+            "SELECT d.id, d.posting, d.article_url, d.decision, d.confidence, "
+            "json_extract(d.payload, '$.explanation'), "
+            "(SELECT group_concat(r.rule, char(31)) FROM decision_rules r WHERE r.decision_id = d.id) "
+            "FROM decisions d WHERE d.id IN ("
+            "SELECT MAX(id) FROM decisions WHERE rules_version = ? GROUP BY posting, article_url"
+            ") AND d.decision != 'ERROR' ORDER BY d.id",
+            [rules_version]
+        )
+        return [
+            {
+                'history_id': history_id,
+                'posting': posting,
+                'article_url': article_url,
+                'decision': decision,
+                'confidence': confidence,
+                'explanation': explanation or '',
+                'violated_rules': rules.split('\x1f') if rules else []
+            }
+            for history_id, posting, article_url, decision, confidence, explanation, rules in rows
+        ]
+
+    def training_examples(self) -> List[Tuple[str, str, List[str]]]:
+        """Jüngstes LLM-Urteil (LÖSCHEN/FREISCHALTEN) samt Regeln je Posting als Trainingsdaten für den Vorfilter"""
+        rows = self._fetch(
+            "SELECT d.posting, d.decision, "
+            "(SELECT group_concat(r.rule, char(31)) FROM decision_rules r WHERE r.decision_id = d.id) "
+            "FROM decisions d WHERE d.id IN ("
+            "SELECT MAX(id) FROM decisions WHERE source = 'llm' "
+            "AND decision IN ('LÖSCHEN', 'FREISCHALTEN') GROUP BY posting"
+            ") ORDER BY d.id"
+        )
+        return [(posting, decision, rules.split('\x1f') if rules else []) for posting, decision, rules in rows]
+
+@process_singleton
+def get_history_store() -> HistoryStore:
+    """Prozessweite Moderations-Historie"""
+    return HistoryStore()
+
+# ====================================
+# HELPER FUNCTIONS
+# ====================================
+
+# Artikel-Abruf: geteilte Session, Revalidierung per ETag/Last-Modified und
+# ein begrenzter TTL-Cache (Fehler verfallen schneller als Artikel)
+ARTICLE_CACHE_MAX_ENTRIES = int(os.getenv("ARTICLE_CACHE_MAX_ENTRIES", "256"))
+ARTICLE_CACHE_TTL = float(os.getenv("ARTICLE_CACHE_TTL", "900"))  # danach bedingter GET
+ARTICLE_ERROR_TTL = float(os.getenv("ARTICLE_ERROR_TTL", "30"))
+ARTICLE_FETCH_TIMEOUT = 10
+ARTICLE_FETCH_CONCURRENCY = 8
+ARTICLE_HTTP_POOL_SIZE = 16
+ARTICLE_PARSER = "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+ARTICLE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+class ArticleStrainer(SoupStrainer):
+    """Baut nur Überschriften, den Artikeltext und <article> als Baum auf.
+
+    Navigation, Kommentare, Werbung und Skripte werden beim Parsen übersprungen;
+    innerhalb eines erlaubten Elements bleibt der ganze Teilbaum erhalten.
+    """
+
+    def __init__(self):
+        super().__init__(['h1', 'div', 'article'])
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        if not super().allow_tag_creation(nsprefix, name, attrs):
+            return False
+        if name != 'div':
+            return True
+        classes = (attrs or {}).get('class') or ''
+        if not isinstance(classes, str):
+            classes = ' '.join(classes)
+        return 'article-body' in classes.split()
+
+def parse_article_html(html: str, url: str) -> Dict:
+    """Extrahiert Titel und Absätze aus dem Artikel-HTML (DER STANDARD Selektoren)"""
+    with get_metrics().span('article_parse'):
+        soup = BeautifulSoup(html, ARTICLE_PARSER, parse_only=ArticleStrainer())
+
+        title = soup.find('h1', {'class': 'article-title'}) or soup.find('h1')
+        title_text = title.get_text(strip=True) if title else "Titel nicht gefunden"
+
+        article_body = soup.find('div', {'class': 'article-body'}) or soup.find('article')
+
+        if article_body:
+            # Absätze einzeln behalten (Index für die Absatz-Suche), leere verwerfen
+            paragraphs = [p.get_text(strip=True) for p in article_body.find_all('p')]
+            paragraphs = [p for p in paragraphs if p]
+            content = '\n'.join(paragraphs)  # Alle Paragraphen
+        else:
+            paragraphs = []
+            content = "Artikelinhalt konnte nicht extrahiert werden."
+
+    return {
+        'title': title_text,
+        'content': content,  # Vollständiger Artikelinhalt ohne Begrenzung
+        'paragraphs': paragraphs,
+        'url': url,
+        'success': True
+    }
+
+def article_error_result(url: str, error: Exception) -> Dict:
+    return {
+        'title': 'Fehler beim Laden',
+        'content': f'Artikel konnte nicht geladen werden: {str(error)}',
+        'url': url,
+        'success': False
+    }
+
+class ArticleFetcher:
+    """Prozessweiter Artikel-Abruf mit begrenztem TTL-Cache.
+
+    Frische Einträge werden direkt geliefert. Abgelaufene Artikel werden mit
+    If-None-Match/If-Modified-Since revalidiert; bei 304 bleibt der geparste
+    Artikel gültig, ohne erneut zu laden oder zu parsen. Fehler werden nur
+    ARTICLE_ERROR_TTL Sekunden gecacht. Schlägt die Revalidierung fehl, wird
+    der zuletzt gültige Artikel weiter ausgeliefert.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ARTICLE_CACHE_MAX_ENTRIES,
+        ttl: float = ARTICLE_CACHE_TTL,
+        error_ttl: float = ARTICLE_ERROR_TTL,
+        timeout: float = ARTICLE_FETCH_TIMEOUT,
+        pool_size: int = ARTICLE_HTTP_POOL_SIZE
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers.update(ARTICLE_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _lookup(self, url: str) -> Dict:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def _store(self, url: str, entry: Dict):
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _fresh(self, url: str) -> Tuple[Dict, Dict]:
+        """(gecachter Artikel oder None, Eintrag für die Revalidierung)"""
+        entry = self._lookup(url)
+        if entry is not None and entry['expires'] > time.monotonic():
+            get_metrics().incr('article_cache_total', result='hit')
+            return dict(entry['article']), entry
+        return None, entry
+
+    @staticmethod
+    def _conditional_headers(entry: Dict) -> Dict:
+        if entry is None or not entry['article']['success']:
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _revalidated(self, url: str, entry: Dict) -> Dict:
+        get_metrics().incr('article_cache_total', result='revalidated')
+        self._store(url, {**entry, 'expires': time.monotonic() + self.ttl})
+        return dict(entry['article'])
+
+    def _fetched(self, url: str, article: Dict, headers) -> Dict:
+        get_metrics().incr('article_cache_total', result='fetched')
+        self._store(url, {
+            'article': article,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'expires': time.monotonic() + self.ttl
+        })
+        return dict(article)
+
+    def _failed(self, url: str, entry: Dict, error: Exception) -> Dict:
+        get_metrics().incr('article_cache_total', result='error')
+        if entry is not None and entry['article']['success']:
+            # Stale-if-error: letzten gültigen Stand behalten, bald erneut versuchen
+            self._store(url, {**entry, 'expires': time.monotonic() + self.error_ttl})
+            return dict(entry['article'])
+        article = article_error_result(url, error)
+        self._store(url, {'article': article, 'expires': time.monotonic() + self.error_ttl})
+        return dict(article)
+
+    def fetch(self, url: str) -> Dict:
+        """Artikel laden (blockierend, über die geteilte Session)"""
+        article, entry = self._fresh(url)
+        if article is not None:
+            return article
+        try:
+            with get_metrics().span('article_fetch'):
+                response = self.session.get(url, headers=self._conditional_headers(entry), timeout=self.timeout)
+                if response.status_code != 304:
+                    response.raise_for_status()
+            if response.status_code == 304 and entry is not None:
+                return self._revalidated(url, entry)
+            return self._fetched(url, parse_article_html(response.text, url), response.headers)
+        except Exception as e:
+            return self._failed(url, entry, e)
+
+    async def fetch_async(self, url: str, client: httpx.AsyncClient) -> Dict:
+        """Wie fetch(), aber über einen httpx.AsyncClient; geparst wird in einem Worker-Thread"""
+        article, entry = self._fresh(url)
+        if article is not None:
+            return article
+        try:
+            with get_metrics().span('article_fetch'):
+                response = await client.get(url, headers=self._conditional_headers(entry))
+                if response.status_code != 304:
+                    response.raise_for_status()
+            if response.status_code == 304 and entry is not None:
+                return self._revalidated(url, entry)
+            article = await asyncio.to_thread(parse_article_html, response.text, url)
+            return self._fetched(url, article, response.headers)
+        except Exception as e:
+            return self._failed(url, entry, e)
+
+    async def fetch_many_async(self, urls: List[str], concurrency: int = ARTICLE_FETCH_CONCURRENCY) -> Dict[str, Dict]:
+        """Lädt viele Artikel parallel (höchstens concurrency gleichzeitig); {url: artikel}"""
+        unique_urls = list(dict.fromkeys(urls))
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        limits = httpx.Limits(max_connections=max(1, concurrency), max_keepalive_connections=max(1, concurrency))
+
+        async with httpx.AsyncClient(
+            headers=ARTICLE_HEADERS, timeout=self.timeout, limits=limits, follow_redirects=True
+        ) as client:
+            async def fetch_one(url: str) -> Dict:
+                async with semaphore:
+                    return await self.fetch_async(url, client)
+
+            articles = await asyncio.gather(*(fetch_one(url) for url in unique_urls))
+        return dict(zip(unique_urls, articles))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        metrics = get_metrics()
+        with self._lock:
+            entries = list(self._entries.values())
+        counts = {
+            result: int(metrics.counter_total('article_cache_total', result=result))
+            for result in ('hit', 'revalidated', 'fetched', 'error')
+        }
+        total = sum(counts.values())
+        return {
+            **counts,
+            'hit_rate': (counts['hit'] + counts['revalidated']) / total if total else 0.0,
+            'entries': len(entries),
+            'failed_entries': sum(1 for e in entries if not e['article']['success']),
+            'parser': ARTICLE_PARSER
+        }
+
+@process_singleton
+def get_article_fetcher() -> ArticleFetcher:
+    """Prozessweiter Artikel-Abruf (Session und Cache über alle Sessions geteilt)"""
+    return ArticleFetcher()
+
+def fetch_article(url: str) -> Dict[str, str]:
+    """Fetcht einen DER STANDARD Artikel"""
+    return get_article_fetcher().fetch(url)
+
+def warm_articles(urls: List[str], concurrency: int = ARTICLE_FETCH_CONCURRENCY) -> Dict[str, Dict]:
+    """Lädt viele Artikel parallel in den Cache (auf dem Event-Loop des Client-Pools)"""
+    return get_client_pool().run(get_article_fetcher().fetch_many_async(urls, concurrency))
+
+# ====================================
+# ARTIKEL-KONTEXT & TOKEN-BUDGET
+# ====================================
+
+CONTEXT_DEFAULT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+DIGEST_CACHE_MAX_ENTRIES = 256
+
+CONTEXT_METHODS = {
+    'extractive': 'Kürzen (lokal, Lead + Kernsätze)',
+    'llm': 'Zusammenfassen (LLM, einmal pro Artikel)',
+    'retrieval': 'Relevante Absätze (BM25 pro Posting)'
+}
+
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+(?=[A-ZÄÖÜ0-9„"])')
+
+def estimate_tokens(text: str) -> int:
+    """Grobe Token-Schätzung (~4 Zeichen pro Token, für deutsche Texte ausreichend genau)"""
+    return (len(text or '') + 3) // 4
+
+def _truncate_to_tokens(text: str, budget: int) -> str:
+    """Kürzt text auf das Budget, möglichst an einer Satzgrenze"""
+    if estimate_tokens(text) <= budget:
+        return text
+    cut = text[:budget * 4]
+    sentence_end = max(cut.rfind('. '), cut.rfind('! '), cut.rfind('? '))
+    return (cut[:sentence_end + 1] if sentence_end > len(cut) // 2 else cut.rstrip()) + ' […]'
+
+def condense_article_extractive(content: str, budget: int) -> str:
+    """Lead-Absätze vollständig (bis ~60% des Budgets), danach je ein Kernsatz pro Absatz"""
+    paragraphs = [p for p in content.split('\n') if p.strip()]
+    selected = []
+    used = estimate_tokens('[…]')  # Platz für die Auslassungsmarke
+
+    lead_budget = int(budget * 0.6)
+    rest_start = len(paragraphs)
+    for idx, paragraph in enumerate(paragraphs):
+        tokens = estimate_tokens(paragraph)
+        if used + tokens > lead_budget:
+            rest_start = idx
+            break
+        selected.append(paragraph)
+        used += tokens
+
+    if not selected and paragraphs:
+        return _truncate_to_tokens(paragraphs[0], budget)
+
+    for paragraph in paragraphs[rest_start:]:
+        topic_sentence = _SENTENCE_SPLIT_RE.split(paragraph, maxsplit=1)[0]
+        tokens = estimate_tokens(topic_sentence)
+        if used + tokens > budget:
+            break
+        selected.append(topic_sentence)
+        used += tokens
+
+    if rest_start < len(paragraphs):
+        selected.append('[…]')
+    return '\n'.join(selected)
+
+def condense_article_llm(title: str, content: str, budget: int, api_key: str, model: str) -> str:
+    """Verdichtet den Artikel per LLM auf das Token-Budget; fällt bei Fehlern auf lokales Kürzen zurück"""
+    prompt = f"""Fasse den folgenden DER STANDARD Artikel sachlich auf Deutsch zusammen.
+Behalte Thema, beteiligte Personen/Institutionen, zentrale Fakten, Zahlen und Positionen bei.
+Die Zusammenfassung darf höchstens {int(budget * 0.75)} Wörter lang sein.
+
+Titel: {title}
+Inhalt: {content}"""
+
+    try:
+        metrics = get_metrics()
+        log_prompt('digest', model, prompt)
+        client = get_client_pool().get_client(api_key)
+        with metrics.span('llm_wait', task='digest', model=model):
+            completion = get_llm_scheduler().call(
+                client, model, estimate_tokens(prompt) + budget,
+                lambda: client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.0,
+                    max_tokens=budget
+                )
+            )
+        metrics.record_usage('digest', model, completion.usage)
+        return _truncate_to_tokens(completion.choices[0].message.content.strip(), budget)
+    except Exception as e:
+        get_metrics().incr('errors_total', stage='digest')
+        logging.warning("LLM-Verdichtung fehlgeschlagen, nutze lokales Kürzen: %s", e)
+        return condense_article_extractive(content, budget)
+
+class LRUCache:
+    """Thread-sicherer, größenbeschränkter LRU-Cache mit Treffer-Statistik"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries)
+            }
+
+@process_singleton
+def get_digest_cache() -> LRUCache:
+    """Prozessweiter Cache für verdichtete Artikel-Kontexte (einmal pro URL/Budget/Methode)"""
+    return LRUCache(DIGEST_CACHE_MAX_ENTRIES)
+
+# Relevante Absätze per BM25 (lokal, nur CPU)
+RETRIEVAL_DEFAULT_TOP_K = 3
+PARAGRAPH_INDEX_MAX_ENTRIES = 128
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+GERMAN_STOPWORDS = frozenset("""
+aber alle allem allen aller alles als also am an ander andere anderen auch auf aus bei beim bin bis bist
+da damit dann das dass dem den denn der des dich die dies diese diesem diesen dieser dieses dir doch dort du
+durch ein eine einem einen einer eines er es etwas euch euer eure für gegen gewesen hab habe haben hat hatte
+hier hin hinter ich ihm ihn ihnen ihr ihre im in ins ist ja jede jedem jeden jeder jedes jetzt kann kein keine
+können man manche mehr mein meine mich mir mit muss nach nicht nichts noch nun nur ob oder ohne schon sehr
+sein seine sich sie sind so solche soll sondern sonst über um und uns unser unter viel vom von vor war waren
+warum was weil welche wenn wer werden wie wieder will wir wird wo zu zum zur zwar zwischen
+""".split())
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_GERMAN_SUFFIXES = ('ungen', 'heiten', 'keiten', 'ung', 'heit', 'keit', 'ern', 'em', 'en', 'er', 'es', 'e', 'n', 's')
+
+def tokenize_german(text: str) -> List[str]:
+    """Kleinschreibung, Stoppwörter raus, einfaches Suffix-Stemming"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.casefold()):
+        if token in GERMAN_STOPWORDS or len(token) < 3 or token.isdigit():
+            continue
+        for suffix in _GERMAN_SUFFIXES:
+            if len(token) - len(suffix) >= 4 and token.endswith(suffix):
+                token = token[:-len(suffix)]
+                break
+        tokens.append(token)
+    return tokens
+
+class ParagraphIndex:
+    """BM25-Index über die Absätze eines Artikels"""
+
+    def __init__(self, paragraphs: List[str]):
+        self.paragraphs = paragraphs
+        self.term_freqs = [Counter(tokenize_german(p)) for p in paragraphs]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        doc_freq = Counter()
+        for tf in self.term_freqs:
+            doc_freq.update(tf.keys())
+        n = len(paragraphs)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def scores(self, query: str) -> List[float]:
+        """BM25-Score jedes Absatzes für den Query-Text"""
+        query_terms = [t for t in set(tokenize_german(query)) if t in self.idf]
+        results = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) if self.avg_length else BM25_K1
+            results.append(sum(
+                self.idf[t] * tf[t] * (BM25_K1 + 1) / (tf[t] + norm)
+                for t in query_terms if t in tf
+            ))
+        return results
+
+    def top_k(self, query: str, k: int) -> List[int]:
+        """Indizes der k relevantesten Absätze (Score > 0), absteigend nach Score"""
+        scored = [(score, idx) for idx, score in enumerate(self.scores(query)) if score > 0]
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        return [idx for _, idx in scored[:k]]
+
+@process_singleton
+def get_paragraph_index_cache() -> LRUCache:
+    """Prozessweiter Cache für BM25-Indizes (einmal pro Artikel)"""
+    return LRUCache(PARAGRAPH_INDEX_MAX_ENTRIES)
+
+def article_paragraphs(article: Dict) -> List[str]:
+    """Absatzliste eines Artikels (ältere Artikel-Dicts ohne 'paragraphs' werden gesplittet)"""
+    return article.get('paragraphs') or [p for p in article['content'].split('\n') if p.strip()]
+
+def retrieve_relevant_paragraphs(article: Dict, posting: str, top_k: int, budget: int) -> Tuple[List[int], bool]:
+    """Wählt die zum Posting passendsten Absätze; ohne Treffer nur den Lead-Absatz"""
+    paragraphs = article_paragraphs(article)
+    key = (article.get('url'), content_hash(article['content']))
+
+    index_cache = get_paragraph_index_cache()
+    index = index_cache.get(key)
+    index_cached = index is not None
+    if index is None:
+        index = ParagraphIndex(paragraphs)
+        index_cache.put(key, index)
+
+    selected = []
+    used = 0
+    for idx in index.top_k(posting, top_k) or [0]:
+        tokens = estimate_tokens(paragraphs[idx])
+        if budget > 0 and selected and used + tokens > budget:
+            break
+        selected.append(idx)
+        used += tokens
+
+    # Originalreihenfolge beibehalten, damit der Kontext lesbar bleibt
+    return sorted(selected), index_cached
+
+def build_article_context(
+    article: Dict,
+    budget: int = CONTEXT_DEFAULT_TOKEN_BUDGET,
+    method: str = 'extractive',
+    api_key: str = None,
+    model: str = "llama3-8b-8192",
+    posting: str = None,
+    top_k: int = RETRIEVAL_DEFAULT_TOP_K
+) -> Dict:
+    """Liefert den Artikel-Kontext für die Prompts, bei Bedarf auf das Token-Budget verdichtet.
+
+    Bei method='retrieval' wird pro Posting ausgewählt; ohne posting liefert
+    die Funktion nur die Vorlage (budget/top_k), die pro Posting mit
+    posting=... erneut aufgerufen wird (siehe Bulk-Modus).
+    """
+    content = article['content']
+    article_tokens = estimate_tokens(content)
+
+    if method == 'retrieval':
+        context = {
+            'text': content,
+            'article_tokens': article_tokens,
+            'context_tokens': article_tokens,
+            'method': 'retrieval',
+            'digest_cached': False,
+            'budget': budget,
+            'top_k': top_k
+        }
+        if posting is not None:
+            paragraphs = article_paragraphs(article)
+            selected, index_cached = retrieve_relevant_paragraphs(article, posting, top_k, budget)
+            context['text'] = '\n'.join(paragraphs[idx] for idx in selected)
+            context['context_tokens'] = estimate_tokens(context['text'])
+            context['digest_cached'] = index_cached
+            context['paragraphs_used'] = selected
+            context['paragraphs_total'] = len(paragraphs)
+        return context
+
+    if budget <= 0 or article_tokens <= budget:
+        return {
+            'text': content,
+            'article_tokens': article_tokens,
+            'context_tokens': article_tokens,
+            'method': 'full',
+            'digest_cached': False
+        }
+
+    if method == 'llm' and not api_key:
+        method = 'extractive'
+    model = resolve_model(model)
+    key = (article.get('url'), content_hash(content), budget, method, model if method == 'llm' else None)
+
+    digest_cache = get_digest_cache()
+    digest = digest_cache.get(key)
+    digest_cached = digest is not None
+    if digest is None:
+        if method == 'llm':
+            digest = condense_article_llm(article['title'], content, budget, api_key, model)
+        else:
+            digest = condense_article_extractive(content, budget)
+        digest_cache.put(key, digest)
+
+    return {
+        'text': digest,
+        'article_tokens': article_tokens,
+        'context_tokens': estimate_tokens(digest),
+        'method': method,
+        'digest_cached': digest_cached
+    }
+
+def estimate_prompt_tokens(
+    mode: str,
+    posting: str,
+    article_title: str,
+    article_content: str,
+    rules_text: str
+) -> int:
+    """Geschätzte Input-Tokens aller Prompts, die im gewählten Modus gesendet werden"""
+    if mode == 'combined':
+        prompts = [build_combined_prompt(posting, article_title, article_content, rules_text)]
+    else:
+        prompts = [
+            build_moderation_prompt(posting, article_title, article_content, rules_text),
+            build_question_prompt(posting, article_title, article_content)
+        ]
+    return sum(estimate_tokens(p) for p in prompts)
+
+def context_stats(context: Dict) -> Dict:
+    """Kennzahlen eines Artikel-Kontexts ohne den Text selbst (für Ergebnis und Historie)"""
+    return {k: v for k, v in context.items() if k != 'text'}
+
+# ====================================
+# STRUKTURIERTE AUSGABE (JSON-MODUS)
+# ====================================
+# Antworten werden im JSON-Modus des Anbieters angefordert (bei Modellen mit
+# Structured Outputs per Schema), mit knappen Token-Limits pro Aufgabe, und
+# von einem einzigen validierenden Parser in typisierte Ergebnisse überführt.
+
+# Gepackte Prompts (siehe GEPACKTE PROMPTS): Antwort-Tokens je Posting, Limit für ein volles Paket
+PACK_MAX_POSTINGS = int(os.getenv("PACK_MAX_POSTINGS", "16"))
+PACK_OUTPUT_TOKENS_PER_POSTING = 150
+OUTPUT_TOKEN_LIMITS = {
+    'moderation': 300,
+    'question': 250,
+    'combined': 500,
+    'packed_moderation': PACK_OUTPUT_TOKENS_PER_POSTING * PACK_MAX_POSTINGS
+}
+JSON_SCHEMA_MODELS = {'openai/gpt-oss-120b'}
+REASONING_MODELS = {'openai/gpt-oss-120b'}
+REASONING_TOKEN_HEADROOM = 512  # Reasoning-Tokens zählen bei diesen Modellen zu max_tokens
+
+MODERATION_DECISIONS = ('LÖSCHEN', 'FREISCHALTEN')
+
+_MODERATION_PROPERTIES = {
+    'decision': {'type': 'string', 'enum': list(MODERATION_DECISIONS)},
+    'confidence': {'type': 'integer', 'minimum': 0, 'maximum': 100},
+    'violated_rules': {'type': 'array', 'items': {'type': 'string'}},
+    'explanation': {'type': 'string'}
+}
+_QUESTION_PROPERTIES = {
+    'has_questions': {'type': 'boolean'},
+    'expects_reactions': {'type': 'boolean'},
+    'target_audience': {'type': 'string'},
+    'explanation': {'type': 'string'},
+    'question_type': {'type': 'string'},
+    'reaction_indicators': {'type': 'array', 'items': {'type': 'string'}}
+}
+
+def _object_schema(properties: Dict) -> Dict:
+    return {'type': 'object', 'properties': properties, 'required': list(properties), 'additionalProperties': False}
+
+OUTPUT_SCHEMAS = {
+    'moderation': _object_schema(_MODERATION_PROPERTIES),
+    'question': _object_schema(_QUESTION_PROPERTIES),
+    'combined': _object_schema({
+        **_MODERATION_PROPERTIES,
+        **{('question_explanation' if k == 'explanation' else k): v for k, v in _QUESTION_PROPERTIES.items()}
+    }),
+    'packed_moderation': _object_schema({
+        'results': {
+            'type': 'array',
+            'items': _object_schema({
+                'index': {'type': 'integer'}, 'posting_start': {'type': 'string'}, **_MODERATION_PROPERTIES
+            })
+        }
+    })
+}
+
+def completion_options(task: str, model: str, stream: bool = False, max_tokens: int = None) -> Dict:
+    """Parameter für chat.completions.create: Token-Limit der Aufgabe und JSON-/Schema-Modus"""
+    options = {'temperature': 0.1, 'max_tokens': max_tokens or OUTPUT_TOKEN_LIMITS[task]}
+    if model in REASONING_MODELS:
+        options['max_tokens'] += REASONING_TOKEN_HEADROOM
+        options['extra_body'] = {'reasoning_effort': 'low'}
+    if stream:
+        # JSON-Modus wird beim Streaming nicht von allen Modellen unterstützt;
+        # das Format sichert dann der Prompt, die Prüfung der Parser
+        return options
+    if model in JSON_SCHEMA_MODELS:
+        options['response_format'] = {
+            'type': 'json_schema',
+            'json_schema': {'name': task, 'schema': OUTPUT_SCHEMAS[task], 'strict': True}
+        }
+    else:
+        options['response_format'] = {'type': 'json_object'}
+    return options
+
+class ResponseParseError(ValueError):
+    """Die LLM-Antwort entspricht nicht dem erwarteten Schema"""
+
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+_MISSING = object()
+
+def load_json_object(response_text: str) -> Dict:
+    """Extrahiert das JSON-Objekt einer Antwort (auch innerhalb von Code-Fences)"""
+    match = _JSON_OBJECT_RE.search(response_text or '')
+    if match is None:
+        raise ResponseParseError("keine JSON-Antwort")
+    try:
+        data = json.loads(match.group())
+    except json.JSONDecodeError as e:
+        raise ResponseParseError(f"ungültiges JSON ({e.msg})") from e
+    if not isinstance(data, dict):
+        raise ResponseParseError("JSON-Antwort ist kein Objekt")
+    return data
+
+def _field(data: Dict, name: str, types: Tuple[type, ...], default: Any = _MISSING) -> Any:
+    value = data.get(name, default)
+    if value is _MISSING:
+        raise ResponseParseError(f"Feld '{name}' fehlt")
+    if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+        raise ResponseParseError(f"Feld '{name}' hat den falschen Typ")
+    return value
+
+def _string_list(data: Dict, name: str) -> List[str]:
+    values = _field(data, name, (list,), [])
+    if not all(isinstance(v, str) for v in values):
+        raise ResponseParseError(f"Feld '{name}' enthält keine Texte")
+    return values
+
+@dataclass
+class ModerationResult:
+    decision: str
+    confidence: int
+    violated_rules: List[str]
+    explanation: str
+
+    @classmethod
+    def from_json(cls, data: Dict, require_explanation: bool = True) -> 'ModerationResult':
+        decision = _field(data, 'decision', (str,)).strip().upper()
+        if decision not in MODERATION_DECISIONS:
+            raise ResponseParseError(f"ungültige Entscheidung '{decision}'")
+        confidence = _field(data, 'confidence', (int, float))
+        if not 0 <= confidence <= 100:
+            raise ResponseParseError(f"Konfidenz {confidence} außerhalb von 0-100")
+        return cls(
+            decision=decision,
+            confidence=int(confidence),
+            violated_rules=_string_list(data, 'violated_rules'),
+            explanation=_field(data, 'explanation', (str,), _MISSING if require_explanation else '')
+        )
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+@dataclass
+class QuestionResult:
+    has_questions: bool
+    expects_reactions: bool
+    target_audience: str
+    explanation: str
+    question_type: str
+    reaction_indicators: List[str]
+
+    @classmethod
+    def from_json(cls, data: Dict, explanation_field: str = 'explanation') -> 'QuestionResult':
+        return cls(
+            has_questions=_field(data, 'has_questions', (bool,)),
+            expects_reactions=_field(data, 'expects_reactions', (bool,)),
+            target_audience=_field(data, 'target_audience', (str,), 'Unbekannt'),
+            explanation=_field(data, explanation_field, (str,)),
+            question_type=_field(data, 'question_type', (str,), 'Keine'),
+            reaction_indicators=_string_list(data, 'reaction_indicators')
+        )
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), 'error': False}
+
+# ====================================
+# STREAMING (FRÜHE ENTSCHEIDUNG)
+# ====================================
+# Die Felder der Moderations-Antwort kommen in fester Reihenfolge
+# (decision, confidence, violated_rules, explanation). Beim Streaming wird
+# jedes Feld ausgewertet, sobald es vollständig ist.
+
+_JSON_STRING = r'"((?:[^"\\]|\\.)*)"'
+STREAM_FIELD_PATTERNS = {
+    'decision': re.compile(r'"decision"\s*:\s*' + _JSON_STRING),
+    'confidence': re.compile(r'"confidence"\s*:\s*(\d+(?:\.\d+)?)\s*[,}\n]'),
+    'violated_rules': re.compile(r'"violated_rules"\s*:\s*(\[[^\]]*\])'),
+    'explanation': re.compile(r'"explanation"\s*:\s*' + _JSON_STRING)
+}
+_PARTIAL_EXPLANATION_RE = re.compile(r'"explanation"\s*:\s*"((?:[^"\\]|\\.)*)')
+MODERATION_REQUIRED_FIELDS = ('decision', 'confidence', 'violated_rules')
+
+class StreamingJSONFields:
+    """Sammelt gestreamte Tokens und extrahiert Felder, sobald sie vollständig sind"""
+
+    def __init__(self):
+        self.text = ''
+        self.fields = {}
+        self.started = time.time()
+        self.time_to_decision = None
+        self.stopped_early = False
+        self._pending = dict(STREAM_FIELD_PATTERNS)
+
+    def feed(self, chunk: str) -> bool:
+        """Hängt einen Chunk an; True, wenn sich sichtbar etwas geändert hat"""
+        self.text += chunk
+        changed = 'explanation' in self._pending and '"explanation"' in self.text
+        for name, pattern in list(self._pending.items()):
+            match = pattern.search(self.text)
+            if match is None:
+                continue
+            try:
+                self.fields[name] = self._decode(name, match.group(1))
+            except (ValueError, json.JSONDecodeError):
+                continue
+            del self._pending[name]
+            changed = True
+        if self.time_to_decision is None and self.has(('decision', 'confidence')):
+            self.time_to_decision = time.time() - self.started
+        return changed
+
+    @staticmethod
+    def _decode(name: str, raw: str) -> Any:
+        if name == 'confidence':
+            return int(float(raw))
+        if name == 'violated_rules':
+            return json.loads(raw)
+        return json.loads(f'"{raw}"')
+
+    def has(self, names: Tuple[str, ...]) -> bool:
+        return all(name in self.fields for name in names)
+
+    def snapshot(self) -> Dict:
+        """Bisher bekannte Felder, plus die angefangene Begründung"""
+        fields = dict(self.fields)
+        if 'explanation' not in fields:
+            match = _PARTIAL_EXPLANATION_RE.search(self.text)
+            fields['explanation_partial'] = match.group(1).replace('\\"', '"').replace('\\n', '\n') if match else ''
+        return fields
+
+    def result(self, parser: Callable[[str], Dict] = None) -> Dict:
+        """Endergebnis: vollständige Antwort über parser, bei Früh-Abbruch die bis dahin fertigen Felder"""
+        if self.stopped_early:
+            try:
+                result = ModerationResult.from_json(self.fields, require_explanation=False).to_dict()
+                result['early_stop'] = True
+            except ResponseParseError as e:
+                result = {**moderation_error_result(f'Ungültige LLM-Antwort: {e}'), 'parse_error': True}
+        else:
+            result = (parser or parse_moderation_response)(self.text)
+        result['time_to_decision'] = self.time_to_decision
+        return result
+
+def _stream_usage(chunk: Any) -> Any:
+    """Token-Verbrauch eines Stream-Chunks (Groq liefert ihn im letzten Chunk unter x_groq)"""
+    usage = getattr(chunk, 'usage', None)
+    if usage is None:
+        usage = getattr(getattr(chunk, 'x_groq', None), 'usage', None)
+    if isinstance(usage, dict):
+        usage = type('Usage', (), usage)
+    return usage
+
+def stream_completion(
+    client: Groq,
+    model: str,
+    prompt: str,
+    task: str,
+    on_update: Callable[[Dict], None] = None,
+    stop_after: Tuple[str, ...] = None
+) -> StreamingJSONFields:
+    """Streamt eine Completion; on_update erhält Zwischenstände, stop_after bricht ab, sobald die Felder da sind"""
+    fields = StreamingJSONFields()
+    note_llm_usage(None)  # Verbrauch im letzten Chunk fehlt bei Abbruch: Kosten schätzen
+    metrics = get_metrics()
+    log_prompt(task, model, prompt)
+    options = completion_options(task, model, stream=True)
+    with metrics.span('llm_wait', task=task, model=model, stream=True):
+        # Wiederholt wird nur der Verbindungsaufbau, nicht ein abgebrochener Stream
+        stream = get_llm_scheduler().call(
+            client, model, reserved_tokens(prompt, options),
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                **options
+            )
+        )
+        try:
+            for chunk in stream:
+                metrics.record_usage(task, model, _stream_usage(chunk))
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if fields.feed(delta) and on_update:
+                    on_update(fields.snapshot())
+                if stop_after and fields.has(stop_after):
+                    fields.stopped_early = True
+                    break
+        finally:
+            stream.close()
+    if fields.time_to_decision is not None:
+        metrics.observe('time_to_decision_seconds', fields.time_to_decision, task=task, model=model)
+    return fields
+
+async def stream_completion_async(
+    client: AsyncGroq,
+    model: str,
+    prompt: str,
+    task: str,
+    stop_after: Tuple[str, ...] = None
+) -> StreamingJSONFields:
+    """Async-Variante von stream_completion für den Bulk-Modus (ohne Zwischenstände)"""
+    fields = StreamingJSONFields()
+    note_llm_usage(None)  # Verbrauch im letzten Chunk fehlt bei Abbruch: Kosten schätzen
+    metrics = get_metrics()
+    log_prompt(task, model, prompt)
+    options = completion_options(task, model, stream=True)
+    with metrics.span('llm_wait', task=task, model=model, stream=True):
+        stream = await get_llm_scheduler().call_async(
+            client, model, reserved_tokens(prompt, options),
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                **options
+            )
+        )
+        try:
+            async for chunk in stream:
+                metrics.record_usage(task, model, _stream_usage(chunk))
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                fields.feed(delta)
+                if stop_after and fields.has(stop_after):
+                    fields.stopped_early = True
+                    break
+        finally:
+            await stream.close()
+    if fields.time_to_decision is not None:
+        metrics.observe('time_to_decision_seconds', fields.time_to_decision, task=task, model=model)
+    return fields
+
+# ====================================
+# MODELL-KASKADE
+# ====================================
+
+# model='cascade': erst das schnellste Modell, eskaliert wird nur bei unsicheren,
+# heiklen oder ungültigen Antworten. Fragen-Analyse und Digests nutzen die erste Stufe.
+CASCADE_MODEL = 'cascade'
+MODEL_CASCADE = [m.strip() for m in os.getenv(
+    "MODEL_CASCADE", "llama3-8b-8192,llama-3.3-70b-versatile,openai/gpt-oss-120b"
+).split(',') if m.strip()]
+CASCADE_MIN_CONFIDENCE = int(os.getenv("CASCADE_MIN_CONFIDENCE", "85"))
+CASCADE_ESCALATE_RULES = ('§3', '§7')  # Gewalt und Hassrede immer vom größeren Modell prüfen lassen
+
+# USD pro 1 Mio. Tokens (Input, Output) laut Groq-Preisliste, für die Kostenschätzung
+MODEL_PRICES_PER_MILLION = {
+    'llama3-8b-8192': (0.05, 0.08),
+    'llama-3.3-70b-versatile': (0.59, 0.79),
+    'openai/gpt-oss-120b': (0.15, 0.75)
+}
+
+def resolve_model(model: str) -> str:
+    """Konkretes Modell für Aufrufe ohne Kaskade (Fragen-Analyse, Digest)"""
+    return MODEL_CASCADE[0] if model == CASCADE_MODEL else model
+
+def model_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES_PER_MILLION.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+def cascade_escalation(result: Dict, min_confidence: int = CASCADE_MIN_CONFIDENCE) -> str:
+    """Grund für die nächste Stufe oder None, wenn das Ergebnis gilt"""
+    if result.get('parse_error'):
+        return 'parse_error'
+    if result.get('decision') == 'ERROR':
+        return 'error'
+    if result.get('confidence', 0) < min_confidence:
+        return 'low_confidence'
+    rules = {rule_key(rule) for rule in result.get('violated_rules', [])}
+    if rules & set(CASCADE_ESCALATE_RULES):
+        return 'sensitive_rule'
+    return None
+
+class CascadeStats:
+    """Anteil je Stufe, Eskalationsgründe, Latenz und geschätzte Kosten der Kaskade"""
+
+    def __init__(self, tiers: List[str] = None):
+        self.tiers = tiers or MODEL_CASCADE
+        self._lock = threading.Lock()
+        self.resolved = Counter()
+        self.escalations = Counter()
+        self.step_times = {}
+        self.total = 0
+        self.total_time = 0.0
+        self.total_cost = 0.0
+        self.top_tier_cost = 0.0
+
+    def record(self, cascade: Dict):
+        with self._lock:
+            self.total += 1
+            self.resolved[cascade['tier']] += 1
+            self.total_time += cascade['time']
+            self.total_cost += cascade['cost']
+            self.top_tier_cost += cascade['top_tier_cost']
+            for step in cascade['steps']:
+                times = self.step_times.setdefault(step['model'], [0.0, 0])
+                times[0] += step['time']
+                times[1] += 1
+                if step['escalation']:
+                    self.escalations[step['escalation']] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.total
+            return {
+                'total': total,
+                'by_tier': [
+                    {
+                        'tier': tier,
+                        'model': model,
+                        'resolved': self.resolved[tier],
+                        'share': self.resolved[tier] / total if total else 0.0,
+                        'avg_call_time': (
+                            self.step_times[model][0] / self.step_times[model][1] if model in self.step_times else None
+                        )
+                    }
+                    for tier, model in enumerate(self.tiers)
+                ],
+                'escalations': dict(self.escalations),
+                'avg_time': self.total_time / total if total else 0.0,
+                'avg_cost': self.total_cost / total if total else 0.0,
+                'avg_top_tier_cost': self.top_tier_cost / total if total else 0.0
+            }
+
+def format_cascade_stats(stats: Dict) -> str:
+    """Einzeilige Zusammenfassung für CLI und Benchmark"""
+    tiers = " · ".join(f"{row['model']} {row['share'] * 100:.0f}%" for row in stats['by_tier'])
+    line = f"Kaskade: {tiers} · Ø {stats['avg_time']:.2f}s · Ø ${stats['avg_cost']:.5f}/Posting"
+    if stats['avg_top_tier_cost']:
+        line += f" ({(stats['avg_cost'] / stats['avg_top_tier_cost'] - 1) * 100:+.0f}% ggü. nur größtem Modell)"
+    return line
+
+@process_singleton
+def get_cascade_stats() -> CascadeStats:
+    """Prozessweite Statistik der Modell-Kaskade"""
+    return CascadeStats()
+
+def _cascade_step(
+    output: Any, model: str, last: bool, started: float, prompt_tokens: int, steps: List[Dict], usage: List
+) -> bool:
+    """Trägt eine Stufe ein; True, wenn ihr Ergebnis gilt.
+
+    Kosten aus dem von der API gemeldeten Verbrauch (usage, gesammelt über
+    llm_usage); geschätzt nur, wenn ein Aufruf gestreamt war oder keiner gezählt wurde.
+    """
+    result = output[0] if isinstance(output, tuple) else output
+    reason = None if last else cascade_escalation(result)
+    measured = bool(usage) and None not in usage
+    if measured:
+        prompt_tokens = sum(prompt for prompt, _ in usage)
+        completion_tokens = sum(completion for _, completion in usage)
+    else:
+        completion_tokens = estimate_tokens(json.dumps(result, ensure_ascii=False))
+        if result.get('packed'):
+            prompt_tokens = result['packed']['prompt_tokens']
+    steps.append({
+        'model': model,
+        'time': time.time() - started,
+        'decision': result.get('decision'),
+        'confidence': result.get('confidence'),
+        'escalation': reason,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'usage': 'api' if measured else 'estimate',
+        'cost': 0.0 if result.get('cached') else model_cost(model, prompt_tokens, completion_tokens)
+    })
+    if reason:
+        get_metrics().incr('cascade_escalations_total', model=model, reason=reason)
+    return reason is None
+
+def _cascade_finish(output: Any, steps: List[Dict], prompt_tokens: int, tiers: List[str]) -> Any:
+    result = output[0] if isinstance(output, tuple) else output
+    final = steps[-1]
+    result['cascade'] = {
+        'tier': len(steps) - 1,
+        'model': final['model'],
+        'steps': steps,
+        'time': sum(step['time'] for step in steps),
+        'cost': sum(step['cost'] for step in steps),
+        # Vergleichswert: dasselbe Posting nur mit der größten Stufe
+        'top_tier_cost': model_cost(tiers[-1], final['prompt_tokens'], final['completion_tokens'])
+    }
+    get_metrics().incr('cascade_resolved_total', tier=len(steps) - 1, model=final['model'])
+    get_cascade_stats().record(result['cascade'])
+    return output
+
+def run_cascade(analyze: Callable[[str], Any], prompt_tokens: int, tiers: List[str] = None) -> Any:
+    """Ruft analyze(modell) Stufe für Stufe auf, bis cascade_escalation keinen Grund mehr findet.
+
+    analyze liefert ein Moderations-Ergebnis oder (Ergebnis, Fragen-Analyse);
+    das Ergebnis erhält unter 'cascade' die durchlaufenen Stufen.
+    """
+    tiers = tiers or MODEL_CASCADE
+    steps = []
+    for tier, model in enumerate(tiers):
+        started = time.time()
+        usage = []
+        token = llm_usage.set(usage)
+        try:
+            output = analyze(model)
+        finally:
+            llm_usage.reset(token)
+        if _cascade_step(output, model, tier == len(tiers) - 1, started, prompt_tokens, steps, usage):
+            break
+    return _cascade_finish(output, steps, prompt_tokens, tiers)
+
+async def run_cascade_async(analyze: Callable[[str], Any], prompt_tokens: int, tiers: List[str] = None) -> Any:
+    """Async-Variante von run_cascade; analyze(modell) liefert eine Coroutine"""
+    tiers = tiers or MODEL_CASCADE
+    steps = []
+    for tier, model in enumerate(tiers):
+        started = time.time()
+        usage = []
+        token = llm_usage.set(usage)
+        try:
+            output = await analyze(model)
+        finally:
+            llm_usage.reset(token)
+        if _cascade_step(output, model, tier == len(tiers) - 1, started, prompt_tokens, steps, usage):
+            break
+    return _cascade_finish(output, steps, prompt_tokens, tiers)
+
+# ====================================
+# LLM-ANALYSE
+# ====================================
+
+def build_question_prompt(posting: str, article_title: str, article_content: str) -> str:
+    """Baut den Prompt für die Fragen- und Reaktions-Analyse"""
+    return f"""Du bist ein Experte für Kommunikationsanalyse. Analysiere das folgende Posting darauf, ob der Autor:
+
+1. FRAGEN stellt (direkte oder indirekte Fragen)
+2. REAKTIONEN ERWARTET (Statements die eine Antwort/Diskussion provozieren sollen)
+
+ARTIKEL KONTEXT:
+Titel: {article_title}
+Inhalt: {article_content}
+
+POSTING ZU ANALYSIEREN:
+"{posting}"
+
+ANALYSIERE:
+- Enthält das Posting direkte Fragen? (Fragezeichen, W-Fragen, etc.)
+- Enthält das Posting indirekte Fragen oder rhetorische Fragen?
+- Macht der Autor Aussagen, die eine Reaktion erwarten?
+- An wen richtet sich der Autor? (Journalist, Redaktion, andere User, Politiker, etc.)
+
+BEISPIELE FÜR REAKTIONS-ERWARTENDE AUSSAGEN:
+- "Was sagt ihr dazu?"
+- "Wie seht ihr das?"
+- "Das kann doch nicht sein!"
+- "Wer hat sich das ausgedacht?"
+- Provokante Behauptungen
+- Direkte Kritik an Personen/Institutionen
+- Aufrufe zur Diskussion
+
+Antworte im JSON Format:
+{{
+    "has_questions": true/false,
+    "expects_reactions": true/false,
+    "target_audience": "Journalist/Redaktion/User/Politiker/Allgemein/Unbekannt",
+    "explanation": "Kurze deutsche Erklärung der Analyse",
+    "question_type": "Direkte Frage/Indirekte Frage/Rhetorische Frage/Keine",
+    "reaction_indicators": ["Liste von Indikatoren falls vorhanden"]
+}}"""
+
+def parse_question_response(response_text: str) -> Dict:
+    """Validiert die LLM-Antwort der Fragen-Analyse; ungültige Antworten werden zum Fehler-Ergebnis"""
+    try:
+        with get_metrics().span('json_parse', task='question'):
+            return QuestionResult.from_json(load_json_object(response_text)).to_dict()
+    except ResponseParseError as e:
+        get_metrics().incr('errors_total', stage='json_parse', task='question')
+        return {**question_error_result(f'Ungültige LLM-Antwort: {e}'), 'parse_error': True}
+
+def question_error_result(message: str) -> Dict:
+    """Ergebnis-Dict für eine fehlgeschlagene Fragen-Analyse"""
+    return {
+        'has_questions': False,
+        'expects_reactions': False,
+        'target_audience': 'Unbekannt',
+        'explanation': message,
+        'question_type': 'Fehler',
+        'reaction_indicators': [],
+        'error': True
+    }
+
+def detect_question_or_reaction_expectation(
+    posting: str, 
+    article_title: str, 
+    article_content: str,
+    api_key: str,
+    model: str = "llama3-8b-8192"
+) -> Dict:
+    """Analysiert ob ein Posting Fragen stellt oder Reaktionen erwartet"""
+    
+    if not api_key:
+        return {
+            'has_questions': False,
+            'expects_reactions': False,
+            'target_audience': 'Unbekannt',
+            'explanation': 'Bitte API Key eingeben!',
+            'error': True
+        }
+    
+    model = resolve_model(model)
+    cache_key, cached = cached_result('question', posting, article_content, model)
+    if cached:
+        return cached
+    
+    try:
+        client = get_client_pool().get_client(api_key)
+        
+        with get_metrics().span('prompt_build', task='question'):
+            prompt = build_question_prompt(posting, article_title, article_content)
+
+        result = parse_question_response(llm_complete(client, 'question', model, prompt))
+        store_cached_result(cache_key, 'question', result)
+        return result
+            
+    except Exception as e:
+        get_metrics().incr('errors_total', stage='question')
+        return question_error_result(f'Fehler bei der Analyse: {str(e)}')
+
+async def detect_question_or_reaction_expectation_async(
+    posting: str,
+    article_title: str,
+    article_content: str,
+    client: AsyncGroq,
+    model: str = "llama3-8b-8192"
+) -> Dict:
+    """Async-Variante der Fragen-Analyse für den Bulk-Modus (geteilter Client)"""
+    model = resolve_model(model)
+    cache_key, cached = cached_result('question', posting, article_content, model)
+    if cached:
+        return cached
+
+    try:
+        with get_metrics().span('prompt_build', task='question'):
+            prompt = build_question_prompt(posting, article_title, article_content)
+
+        result = parse_question_response(await llm_complete_async(client, 'question', model, prompt))
+        store_cached_result(cache_key, 'question', result)
+        return result
+
+    except Exception as e:
+        get_metrics().incr('errors_total', stage='question')
+        return question_error_result(f'Fehler bei der Analyse: {str(e)}')
+
+@prompt_prefix_builder('moderation')
+def moderation_prompt_prefix(rules_text: str) -> str:
+    """Anweisungen und Regeln des Moderations-Prompts; Artikel und Posting folgen am Ende"""
+    return f"""Du bist ein erfahrener Foren-Moderator für DER STANDARD. Analysiere das Posting am Ende nach unseren Forenregeln.
+
+MODERATION PRINZIPIEN:
+- Bevorzuge FREISCHALTEN bei Grenzfällen und Unsicherheiten
+- Berücksichtige Kontext, Ironie, Sarkasmus und emotionale Reaktionen
+- Lösche bei Regelverstößen
+- Unterscheide zwischen konstruktiver Kritik und echten Beleidigungen
+
+FORENREGELN:
+{rules_text}
+
+AUFGABE:
+1. Entscheide: LÖSCHEN oder FREISCHALTEN
+2. Bei LÖSCHEN: Welche Regel(n) wurden eindeutig und schwerwiegend verletzt?
+3. Gib eine Konfidenz-Score (0-100)
+4. Erkläre die Entscheidung ausführlich und begründe warum du tolerant/strikt warst
+5. Die Begründung sollte höchstens zwei Sätze lang und auf deutsch sein.
+
+Antworte im JSON Format:
+{{
+    "decision": "LÖSCHEN/FREISCHALTEN",
+    "confidence": 0-100,
+    "violated_rules": ["§X", "§Y"],
+    "explanation": "Begründung"
+}}
+"""
+
+def article_prompt_block(article_title: str, article_content: str) -> str:
+    return f"""
+ARTIKEL KONTEXT:
+Titel: {article_title}
+Inhalt: {article_content}
+"""
+
+def build_moderation_prompt(
+    posting: str,
+    article_title: str,
+    article_content: str,
+    rules_text: str = None,
+    repetition_note: str = None
+) -> str:
+    """Baut den Moderations-Prompt (Regeltext optional vorab formatiert, optional mit Wiederholungs-Hinweis).
+
+    Der Anfang kommt vorkompiliert aus der Regelwerk-Version; pro Posting
+    werden nur Artikel, Posting und Hinweis angehängt.
+    """
+    if rules_text is None:
+        rules_text = format_rules_for_prompt()
+    repetition_block = f"\nHINWEIS WIEDERHOLUNG:\n{repetition_note}\n" if repetition_note else ""
+
+    return (
+        get_rule_sets().for_text(rules_text).prompt_prefix('moderation')
+        + article_prompt_block(article_title, article_content)
+        + f'\nPOSTING ZU BEWERTEN:\n"{posting}"\n{repetition_block}'
+    )
+
+def parse_moderation_response(response_text: str) -> Dict:
+    """Validiert die LLM-Antwort der Moderation; ungültige Antworten werden zum Fehler-Ergebnis"""
+    try:
+        with get_metrics().span('json_parse', task='moderation'):
+            return ModerationResult.from_json(load_json_object(response_text)).to_dict()
+    except ResponseParseError as e:
+        get_metrics().incr('errors_total', stage='json_parse', task='moderation')
+        return {**moderation_error_result(f'Ungültige LLM-Antwort: {e}'), 'parse_error': True}
+
+def moderation_error_result(message: str) -> Dict:
+    """Ergebnis-Dict für eine fehlgeschlagene Moderation"""
+    return {
+        'decision': 'ERROR',
+        'confidence': 0,
+        'violated_rules': [],
+        'explanation': message
+    }
+
+def analyze_posting_with_llm(
+    posting: str, 
+    article_title: str, 
+    article_content: str,
+    api_key: str,
+    model: str = "llama3-8b-8192",
+    rules_text: str = None,
+    repetition_note: str = None,
+    on_update: Callable[[Dict], None] = None
+) -> Dict:
+    """Analysiert ein Posting mit Llama via Groq (mit on_update gestreamt, Zwischenstände als Dict)"""
+    
+    if not api_key:
+        return moderation_error_result('Bitte API Key eingeben!')
+    
+    if rules_text is None:
+        rules_text = format_rules_for_prompt()
+    if model == CASCADE_MODEL:
+        return run_cascade(
+            lambda tier_model: analyze_posting_with_llm(
+                posting, article_title, article_content, api_key, tier_model, rules_text, repetition_note, on_update
+            ),
+            estimate_tokens(build_moderation_prompt(posting, article_title, article_content, rules_text, repetition_note))
+        )
+    cache_key, cached = cached_result('moderation', posting, article_content, model, rules_text + (repetition_note or ''))
+    if cached:
+        return cached
+    
+    try:
+        client = get_client_pool().get_client(api_key)
+        
+        with get_metrics().span('prompt_build', task='moderation'):
+            prompt = build_moderation_prompt(posting, article_title, article_content, rules_text, repetition_note)
+
+        if on_update:
+            result = stream_completion(client, model, prompt, 'moderation', on_update).result()
+        else:
+            result = parse_moderation_response(llm_complete(client, 'moderation', model, prompt))
+        store_cached_result(cache_key, 'moderation', result)
+        return result
+            
+    except Exception as e:
+        get_metrics().incr('errors_total', stage='moderation')
+        return moderation_error_result(f'Fehler bei der Analyse: {str(e)}')
+
+async def analyze_posting_with_llm_async(
+    posting: str,
+    article_title: str,
+    article_content: str,
+    client: AsyncGroq,
+    model: str = "llama3-8b-8192",
+    rules_text: str = None,
+    repetition_note: str = None,
+    early_stop: bool = False
+) -> Dict:
+    """Async-Variante der Moderation für den Bulk-Modus (geteilter Client).
+
+    Mit early_stop wird gestreamt und abgebrochen, sobald Entscheidung,
+    Konfidenz und Regeln feststehen; die Begründung entfällt dann.
+    """
+    if rules_text is None:
+        rules_text = format_rules_for_prompt()
+    if model == CASCADE_MODEL:
+        return await run_cascade_async(
+            lambda tier_model: analyze_posting_with_llm_async(
+                posting, article_title, article_content, client, tier_model, rules_text, repetition_note, early_stop
+            ),
+            estimate_tokens(build_moderation_prompt(posting, article_title, article_content, rules_text, repetition_note))
+        )
+    cache_key, cached = cached_result('moderation', posting, article_content, model, rules_text + (repetition_note or ''))
+    if cached:
+        return cached
+    packer = active_packer.get()
+    if packer is not None and not early_stop:
+        return await packer.moderate(posting, article_title, article_content, client, model, rules_text, repetition_note, cache_key)
+    return await _moderate_uncached_async(
+        posting, article_title, article_content, client, model, rules_text, repetition_note, cache_key, early_stop
+    )
+
+async def _moderate_uncached_async(
+    posting: str,
+    article_title: str,
+    article_content: str,
+    client: AsyncGroq,
+    model: str,
+    rules_text: str,
+    repetition_note: str,
+    cache_key: str,
+    early_stop: bool = False
+) -> Dict:
+    """Einzelner Moderations-Aufruf nach einem Cache-Fehlschlag; speichert das Ergebnis unter cache_key"""
+    try:
+        with get_metrics().span('prompt_build', task='moderation'):
+            prompt = build_moderation_prompt(posting, article_title, article_content, rules_text, repetition_note)
+
+        if early_stop:
+            fields = await stream_completion_async(client, model, prompt, 'moderation', MODERATION_REQUIRED_FIELDS)
+            result = fields.result()
+        else:
+            result = parse_moderation_response(await llm_complete_async(client, 'moderation', model, prompt))
+        store_cached_result(cache_key, 'moderation', result)
+        return result
+
+    except Exception as e:
+        get_metrics().incr('errors_total', stage='moderation')
+        return moderation_error_result(f'Fehler bei der Analyse: {str(e)}')
+
+# ====================================
+# GEPACKTE PROMPTS (MEHRERE POSTINGS PRO AUFRUF)
+# ====================================
+# Anweisungen, Regeln und Artikel-Kontext sind für alle Postings eines Artikels
+# gleich. Im Bulk-Lauf und in der Bulk-Spur des Service werden wartende
+# Moderations-Aufrufe daher zu einem Prompt mit nummerierten Postings gebündelt;
+# die Antwort ist ein JSON-Array mit einem Eintrag pro Nummer.
+
+PACK_MAX_WAIT = float(os.getenv("PACK_MAX_WAIT_MS", "50")) / 1000
+PACK_CONTEXT_FILL = 0.8  # Rest des Kontextfensters als Reserve für Schätzfehler
+MODEL_CONTEXT_WINDOWS = {
+    'llama3-8b-8192': 8192,
+    'llama-3.3-70b-versatile': 131072,
+    'openai/gpt-oss-120b': 131072
+}
+
+# Gepackte Aufrufe laufen nur, wo diese Variable gesetzt ist (moderate_postings_bulk, Service)
+active_packer = contextvars.ContextVar('active_packer', default=None)
+
+@prompt_prefix_builder('packed_moderation')
+def packed_moderation_prompt_prefix(rules_text: str) -> str:
+    """Anweisungen und Regeln des gepackten Prompts; Artikel und Postings folgen am Ende"""
+    return f"""Du bist ein erfahrener Foren-Moderator für DER STANDARD. Analysiere jedes der nummerierten Postings am Ende einzeln nach unseren Forenregeln.
+
+MODERATION PRINZIPIEN:
+- Bevorzuge FREISCHALTEN bei Grenzfällen und Unsicherheiten
+- Berücksichtige Kontext, Ironie, Sarkasmus und emotionale Reaktionen
+- Lösche bei Regelverstößen
+- Unterscheide zwischen konstruktiver Kritik und echten Beleidigungen
+- Bewerte jedes Posting für sich, die anderen Postings sind kein Kontext
+
+FORENREGELN:
+{rules_text}
+
+AUFGABE für jedes Posting:
+1. Entscheide: LÖSCHEN oder FREISCHALTEN
+2. Bei LÖSCHEN: Welche Regel(n) wurden eindeutig und schwerwiegend verletzt?
+3. Gib eine Konfidenz-Score (0-100)
+4. Erkläre die Entscheidung und begründe warum du tolerant/strikt warst
+5. Die Begründung sollte höchstens zwei Sätze lang und auf deutsch sein.
+
+Antworte im JSON Format mit genau einem Eintrag pro Posting, in der Reihenfolge der Nummern.
+"index" ist die Nummer des Postings, "posting_start" seine ersten drei Wörter:
+{{
+    "results": [
+        {{
+            "index": 1,
+            "posting_start": "erste drei Wörter",
+            "decision": "LÖSCHEN/FREISCHALTEN",
+            "confidence": 0-100,
+            "violated_rules": ["§X", "§Y"],
+            "explanation": "Begründung"
+        }}
+    ]
+}}
+"""
+
+def build_packed_moderation_prompt(
+    items: List[Tuple[str, str]],
+    article_title: str,
+    article_content: str,
+    rules_text: str = None
+) -> str:
+    """Moderations-Prompt für mehrere Postings (posting, Wiederholungs-Hinweis) desselben Artikels"""
+    if rules_text is None:
+        rules_text = format_rules_for_prompt()
+    postings = ''.join(
+        f"[{index}] {json.dumps(posting, ensure_ascii=False)}\n"
+        + (f"    HINWEIS WIEDERHOLUNG: {note}\n" if note else "")
+        for index, (posting, note) in enumerate(items, start=1)
+    )
+
+    return (
+        get_rule_sets().for_text(rules_text).prompt_prefix('packed_moderation')
+        + article_prompt_block(article_title, article_content)
+        + f"\nPOSTINGS ZU BEWERTEN ({len(items)}, nummeriert):\n{postings}"
+    )
+
+_PACKED_ENTRY_RE = re.compile(r'\{[^{}]*\}')
+
+def _leading_words(text: str, count: int) -> List[str]:
+    return re.findall(r'\w+', normalize_posting(text))[:count]
+
+def parse_packed_moderation_response(response_text: str, postings: List[str]) -> Dict[int, Dict]:
+    """Ergebnisse einer gepackten Antwort nach Nummer (1-basiert).
+
+    Jeder Eintrag wird einzeln gelesen, damit auch abgeschnittene Antworten
+    verwertbar bleiben. Fehlt eine Nummer, kommt sie doppelt vor oder passt
+    posting_start nicht zum Posting (zusammengelegt oder verrutscht), fehlt
+    sie im Ergebnis und wird einzeln nachgeholt. Postings ohne Wortzeichen
+    werden nur über die Nummer zugeordnet.
+    """
+    results, seen = {}, Counter()
+    with get_metrics().span('json_parse', task='packed_moderation'):
+        for match in _PACKED_ENTRY_RE.finditer(response_text or ''):
+            try:
+                data = json.loads(match.group())
+            except json.JSONDecodeError:
+                continue
+            index = data.get('index') if isinstance(data, dict) else None
+            if not isinstance(index, int) or isinstance(index, bool) or not 1 <= index <= len(postings):
+                continue
+            seen[index] += 1
+            # Postings ohne Wortzeichen (nur Emojis/Satzzeichen) lassen sich nicht
+            # über posting_start prüfen und werden nur über die Nummer zugeordnet
+            expected = _leading_words(postings[index - 1], 3)
+            start = _leading_words(str(data.get('posting_start', '')), 3)
+            if expected and (not start or start != expected[:len(start)]):
+                continue
+            try:
+                results[index] = ModerationResult.from_json(data).to_dict()
+            except ResponseParseError:
+                continue
+    return {index: result for index, result in results.items() if seen[index] == 1}
+
+def pack_token_budget(model: str) -> int:
+    """Tokens, die ein gepackter Prompt samt Antworten höchstens belegen darf"""
+    budget = int(MODEL_CONTEXT_WINDOWS.get(model, 8192) * PACK_CONTEXT_FILL)
+    return budget - (REASONING_TOKEN_HEADROOM if model in REASONING_MODELS else 0)
+
+class PromptPacker:
+    """Bündelt wartende Moderations-Aufrufe desselben Artikels zu einem Prompt.
+
+    Aufrufe mit gleichem Modell, Artikel-Kontext, Regeltext und Spur werden
+    höchstens max_wait Sekunden gesammelt. Ein Paket wird früher gesendet,
+    wenn max_postings erreicht sind oder das nächste Posting nicht mehr ins
+    Kontextfenster des Modells passt (pack_token_budget). concurrency
+    begrenzt die gleichzeitigen LLM-Aufrufe. Muss auf dem Loop des
+    Client-Pools benutzt werden.
+    """
+
+    def __init__(self, concurrency: int, max_postings: int = PACK_MAX_POSTINGS, max_wait: float = PACK_MAX_WAIT):
+        self.max_postings = max(1, max_postings)
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._groups = {}
+        self._tasks = set()
+
+    async def moderate(
+        self,
+        posting: str,
+        article_title: str,
+        article_content: str,
+        client: AsyncGroq,
+        model: str,
+        rules_text: str,
+        repetition_note: str,
+        cache_key: str
+    ) -> Dict:
+        loop = asyncio.get_running_loop()
+        key = (id(client), model, llm_priority.get(), article_title, content_hash(article_content), content_hash(rules_text))
+        tokens = estimate_tokens(posting + (repetition_note or '')) + PACK_OUTPUT_TOKENS_PER_POSTING
+        group = self._groups.get(key)
+        if group is not None and group['tokens'] + tokens > pack_token_budget(model):
+            self._flush(key)
+            group = None
+        if group is None:
+            shared_tokens = estimate_tokens(build_packed_moderation_prompt([], article_title, article_content, rules_text))
+            group = {
+                'client': client, 'model': model, 'title': article_title,
+                'content': article_content, 'rules_text': rules_text, 'items': [],
+                'shared_tokens': shared_tokens, 'tokens': shared_tokens,
+                'timer': loop.call_later(self.max_wait, self._flush, key)
+            }
+            self._groups[key] = group
+
+        future = loop.create_future()
+        group['items'].append((posting, repetition_note, cache_key, future))
+        group['tokens'] += tokens
+        if len(group['items']) >= self.max_postings:
+            self._flush(key)
+        result, usage = await future
+        # Der Aufruf lief im Task des Packers: Verbrauch in die Kaskaden-Stufe des Aufrufers übernehmen
+        collected = llm_usage.get()
+        if collected is not None:
+            collected.extend(usage)
+        return result
+
+    def _flush(self, key: tuple):
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        group['timer'].cancel()
+        task = asyncio.get_running_loop().create_task(self._send(group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, group: Dict):
+        """Sendet ein Paket; jedes Future wird erfüllt, auch wenn unterwegs etwas scheitert"""
+        active_packer.set(None)  # Einzelaufrufe unten nicht erneut packen
+        usage = []
+        llm_usage.set(usage)  # nicht in die Sammlung des Aufrufers schreiben, der den Task angestoßen hat
+        items = group['items']
+        metrics = get_metrics()
+        parsed, prompt_tokens = {}, 0
+        try:
+            if len(items) > 1:
+                try:
+                    async with self._semaphore:
+                        with metrics.span('prompt_build', task='packed_moderation'):
+                            prompt = build_packed_moderation_prompt(
+                                [(posting, note) for posting, note, _, _ in items],
+                                group['title'], group['content'], group['rules_text']
+                            )
+                        prompt_tokens = estimate_tokens(prompt)
+                        response = await llm_complete_async(
+                            group['client'], 'packed_moderation', group['model'], prompt,
+                            PACK_OUTPUT_TOKENS_PER_POSTING * len(items)
+                        )
+                    parsed = parse_packed_moderation_response(response, [posting for posting, _, _, _ in items])
+                except Exception:
+                    # Ein gescheiterter Sammelaufruf (Timeout, Fehlerstatus) kostet nicht alle
+                    # Postings: jedes wird einzeln nachgeholt
+                    metrics.incr('errors_total', stage='packed_moderation')
+                    metrics.incr('packed_postings_total', len(items), model=group['model'], outcome='error')
+                    await asyncio.gather(*(self._single(group, *item) for item in items))
+                    return
+                metrics.incr('packed_requests_total', model=group['model'])
+                # Anweisungen, Regeln und Artikel wurden nur einmal statt len(items)-mal gesendet
+                metrics.incr(
+                    'packed_prompt_tokens_saved_total', group['shared_tokens'] * (len(items) - 1), model=group['model']
+                )
+
+            # Gemeldeter Verbrauch des Sammelaufrufs, zu gleichen Teilen auf die Postings verteilt
+            share = [
+                None if call is None else (math.ceil(call[0] / len(items)), math.ceil(call[1] / len(items)))
+                for call in usage
+            ]
+            missing = []
+            for index, (posting, note, cache_key, future) in enumerate(items, start=1):
+                result = parsed.get(index)
+                if result is None:
+                    missing.append((posting, note, cache_key, future))
+                    continue
+                metrics.incr('packed_postings_total', model=group['model'], outcome='packed')
+                if not future.done():
+                    future.set_result(({
+                        **result, 'packed': {'size': len(items), 'prompt_tokens': math.ceil(prompt_tokens / len(items))}
+                    }, share))
+                store_cached_result(cache_key, 'moderation', result)
+
+            if missing and len(items) > 1:
+                metrics.incr('packed_postings_total', len(missing), model=group['model'], outcome='rerun')
+            await asyncio.gather(*(self._single(group, *item) for item in missing))
+        except Exception as e:
+            # z. B. OperationalError beim Cache-Schreiben: die Aufrufer erhalten den Fehler, statt ewig zu warten
+            metrics.incr('errors_total', stage='packed_moderation')
+            for _, _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for _, _, _, future in items:
+                if not future.done():
+                    future.set_exception(RuntimeError("Gepacktes Moderations-Paket wurde abgebrochen"))
+
+    async def _single(self, group: Dict, posting: str, note: str, cache_key: str, future: asyncio.Future):
+        """Einzelaufruf ohne erneute Cache-Abfrage (moderate() hat den Fehlschlag schon gezählt)"""
+        usage = []
+        llm_usage.set(usage)  # eigener Task (gather): zählt nur diesen Einzelaufruf
+        try:
+            async with self._semaphore:
+                result = await _moderate_uncached_async(
+                    posting, group['title'], group['content'], group['client'], group['model'], group['rules_text'],
+                    note, cache_key
+                )
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result((result, usage))
+
+# ====================================
+# DUPLIKAT-INDEX (§5 SPAM / WIEDERHOLUNGEN)
+# ====================================
+
+DUP_INDEX_PATH = os.getenv("DUPLICATE_INDEX_PATH", os.path.join(".cache", "duplicate_index.sqlite3"))
+DUP_INDEX_WINDOW_SECONDS = int(os.getenv("DUPLICATE_INDEX_WINDOW", str(24 * 3600)))
+DUP_INDEX_MAX_ENTRIES = int(os.getenv("DUPLICATE_INDEX_MAX_ENTRIES", "100000"))
+DUP_NEAR_MAX_DISTANCE = 5  # Hamming-Distanz der 64-Bit-SimHashes
+DUP_SHINGLE_SIZE = 4
+DUP_BANDS = DUP_NEAR_MAX_DISTANCE + 1  # Schubfachprinzip: bei Distanz <= 5 stimmt mindestens ein Band exakt überein
+DUP_NOTE_MIN_COUNT = 2
+
+def simhash(text: str) -> int:
+    """64-Bit-SimHash über Zeichen-4-Gramme des normalisierten Postings"""
+    normalized = normalize_posting(text)
+    if len(normalized) <= DUP_SHINGLE_SIZE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + DUP_SHINGLE_SIZE] for i in range(len(normalized) - DUP_SHINGLE_SIZE + 1)}
+
+    digests = b''.join(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest() for s in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    votes = bits.sum(axis=0) * 2 > len(shingles)
+    return int(np.packbits(votes).view('>u8')[0])
+
+_DUP_BAND_OFFSETS = [64 * band // DUP_BANDS for band in range(DUP_BANDS + 1)]
+
+def _simhash_bands(value: int) -> List[Tuple[int, int]]:
+    bands = []
+    for band in range(DUP_BANDS):
+        start, end = _DUP_BAND_OFFSETS[band], _DUP_BAND_OFFSETS[band + 1]
+        bands.append((band, (value >> start) & ((1 << (end - start)) - 1)))
+    return bands
+
+class DuplicateIndex:
+    """Near-Duplicate-Index (SimHash + LSH-Bänder) über kürzlich moderierte Postings.
+
+    Hält ein Zeitfenster im Speicher (begrenzt auf max_entries) und spiegelt
+    es in SQLite, damit Wiederholungen auch über Neustarts erkannt werden.
+    Wie bei der HistoryStore schreibt ein Writer-Thread die Änderungen
+    gebündelt; record() hält die Moderation nicht mit Commits auf.
+    Jeder Eintrag steht für eine Gruppe (nahezu) identischer Postings mit
+    Zählern global und pro Artikel sowie der letzten Entscheidung.
+    """
+
+    def __init__(
+        self,
+        path: str = DUP_INDEX_PATH,
+        window_seconds: int = DUP_INDEX_WINDOW_SECONDS,
+        max_entries: int = DUP_INDEX_MAX_ENTRIES
+    ):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id -> Eintrag, ältester last_seen zuerst
+        self._exact = {}
+        self._bands = {}
+        self._next_id = 1
+        self._queue = queue.Queue()
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.lookup_seconds = 0.0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._conn = self._connect()
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS duplicate_index (
+                id INTEGER PRIMARY KEY,
+                simhash TEXT NOT NULL,
+                exact TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                count INTEGER NOT NULL,
+                articles TEXT NOT NULL,
+                decision TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_duplicate_index_last_seen ON duplicate_index(last_seen)")
+        self._conn.execute("DELETE FROM duplicate_index WHERE last_seen < ?", (time.time() - window_seconds,))
+        self._conn.commit()
+        self._load()
+        self._writer = threading.Thread(target=self._write_loop, name="duplicate-index-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def flush(self):
+        """Wartet, bis alle eingereihten Änderungen geschrieben sind"""
+        self._queue.join()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + HISTORY_FLUSH_INTERVAL
+            while len(batch) < HISTORY_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    for row, evicted in batch:
+                        conn.execute(
+                            "INSERT OR REPLACE INTO duplicate_index "
+                            "(id, simhash, exact, first_seen, last_seen, count, articles, decision) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row
+                        )
+                        if evicted:
+                            conn.executemany("DELETE FROM duplicate_index WHERE id = ?", [(i,) for i in evicted])
+            except sqlite3.Error as e:
+                logging.warning("Duplikat-Index konnte nicht geschrieben werden: %s", e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _load(self):
+        rows = self._conn.execute(
+            "SELECT id, simhash, exact, first_seen, last_seen, count, articles, decision "
+            "FROM duplicate_index ORDER BY last_seen DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for row in reversed(rows):
+            entry = {
+                'id': row[0],
+                'simhash': int(row[1], 16),
+                'exact': row[2],
+                'first_seen': row[3],
+                'last_seen': row[4],
+                'count': row[5],
+                'articles': json.loads(row[6]),
+                'decision': json.loads(row[7]) if row[7] else None
+            }
+            self._add(entry)
+            self._next_id = max(self._next_id, entry['id'] + 1)
+
+    def _add(self, entry: Dict):
+        self._entries[entry['id']] = entry
+        self._exact[entry['exact']] = entry['id']
+        for band in _simhash_bands(entry['simhash']):
+            self._bands.setdefault(band, set()).add(entry['id'])
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        if self._exact.get(entry['exact']) == entry_id:
+            del self._exact[entry['exact']]
+        for band in _simhash_bands(entry['simhash']):
+            bucket = self._bands.get(band)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._bands[band]
+
+    def _evict(self, now: float) -> List[int]:
+        evicted = []
+        while self._entries:
+            oldest_id, oldest = next(iter(self._entries.items()))
+            if oldest['last_seen'] >= now - self.window_seconds and len(self._entries) <= self.max_entries:
+                break
+            self._remove(oldest_id)
+            evicted.append(oldest_id)
+        return evicted
+
+    def _find(self, fingerprint: int, exact: str, now: float) -> Tuple[Dict, int]:
+        """Bester Eintrag im Zeitfenster; abgelaufene, noch nicht verdrängte Einträge zählen nicht"""
+        cutoff = now - self.window_seconds
+        entry_id = self._exact.get(exact)
+        if entry_id is not None and self._entries[entry_id]['last_seen'] >= cutoff:
+            return self._entries[entry_id], 0
+
+        best, best_distance = None, DUP_NEAR_MAX_DISTANCE + 1
+        for band in _simhash_bands(fingerprint):
+            for candidate_id in self._bands.get(band, ()):
+                candidate = self._entries[candidate_id]
+                if candidate['last_seen'] < cutoff:
+                    continue
+                distance = (candidate['simhash'] ^ fingerprint).bit_count()
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+        return best, best_distance
+
+    def lookup(self, posting: str, article_url: str = None) -> Dict:
+        """Sucht exakte und nahe Duplikate; liefert Zähler (global/Artikel) und die letzte Entscheidung"""
+        lookup_start = time.perf_counter()
+        fingerprint = simhash(posting)
+        exact = content_hash(normalize_posting(posting))
+        now = time.time()
+
+        with self._lock:
+            entry, distance = self._find(fingerprint, exact, now)
+            self.lookups += 1
+            if entry is not None:
+                if distance == 0:
+                    self.exact_hits += 1
+                else:
+                    self.near_hits += 1
+            match = {
+                'match': 'exact' if entry is not None and distance == 0 else ('near' if entry is not None else None),
+                'distance': distance if entry is not None else None,
+                'seen_global': entry['count'] if entry else 0,
+                'seen_article': entry['articles'].get(article_url or '', 0) if entry else 0,
+                'prior_decision': dict(entry['decision']) if entry and entry['decision'] else None,
+                'fingerprint': fingerprint,
+                'exact': exact
+            }
+            self.lookup_seconds += time.perf_counter() - lookup_start
+        return match
+
+    def record(self, posting: str, article_url: str, result: Dict, rules_hash: str, match: Dict = None):
+        """Zählt das Posting in seine Duplikat-Gruppe ein und merkt sich die Entscheidung"""
+        if match is None:
+            match = self.lookup(posting, article_url)
+        now = time.time()
+        decision = None
+        if result.get('decision') in ('LÖSCHEN', 'FREISCHALTEN'):
+            decision = {
+                'decision': result['decision'],
+                'confidence': result.get('confidence', 0),
+                'violated_rules': result.get('violated_rules', []),
+                'explanation': result.get('explanation', ''),
+                'article_url': article_url,
+                'rules_hash': rules_hash
+            }
+
+        with self._lock:
+            entry, _ = self._find(match['fingerprint'], match['exact'], now)
+            if entry is None:
+                entry = {
+                    'id': self._next_id,
+                    'simhash': match['fingerprint'],
+                    'exact': match['exact'],
+                    'first_seen': now,
+                    'last_seen': now,
+                    'count': 0,
+                    'articles': {},
+                    'decision': None
+                }
+                self._next_id += 1
+                self._add(entry)
+
+            entry['count'] += 1
+            entry['articles'][article_url or ''] = entry['articles'].get(article_url or '', 0) + 1
+            entry['last_seen'] = now
+            if decision is not None:
+                entry['decision'] = decision
+            self._entries.move_to_end(entry['id'])
+            evicted = self._evict(now)
+            # Momentaufnahme unter der Sperre; geschrieben wird im Writer-Thread
+            row = (
+                entry['id'], f"{entry['simhash']:016x}", entry['exact'], entry['first_seen'], entry['last_seen'],
+                entry['count'], json.dumps(entry['articles'], ensure_ascii=False),
+                json.dumps(entry['decision'], ensure_ascii=False) if entry['decision'] else None
+            )
+        self._queue.put((row, evicted))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'lookups': self.lookups,
+                'exact_hits': self.exact_hits,
+                'near_hits': self.near_hits,
+                'avg_lookup_ms': self.lookup_seconds / self.lookups * 1000 if self.lookups else 0.0
+            }
+
+@process_singleton
+def get_duplicate_index() -> DuplicateIndex:
+    """Prozessweiter Duplikat-Index"""
+    return DuplicateIndex()
+
+def repetition_note(match: Dict) -> str:
+    """Hinweis für den Prompt, wenn das Posting schon (nahezu) identisch gesehen wurde"""
+    if match is None or match['seen_global'] + 1 < DUP_NOTE_MIN_COUNT:
+        return None
+    hours = DUP_INDEX_WINDOW_SECONDS // 3600
+    return (
+        f"Dieses Posting wurde in den letzten {hours} Stunden bereits {match['seen_global']}-mal "
+        f"{'identisch' if match['match'] == 'exact' else 'nahezu identisch'} gepostet "
+        f"(davon {match['seen_article']}-mal zu diesem Artikel). Berücksichtige das bei §5 (repetitive Postings)."
+    )
+
+def reusable_duplicate_decision(match: Dict, article_url: str, rules_hash: str) -> Dict:
+    """Übernimmt die frühere Entscheidung eines (nahen) Duplikats, sofern sie auf diesen Fall übertragbar ist.
+
+    Gleiche Regeln sind Pflicht. Freischaltungen gelten nur im selben Artikel
+    (Relevanz §6 hängt am Artikel), Löschungen außer wegen §6 auch artikelübergreifend.
+    """
+    prior = match['prior_decision'] if match else None
+    if not prior or prior['rules_hash'] != rules_hash:
+        return None
+    same_article = prior.get('article_url') == article_url
+    if not same_article and (prior['decision'] != 'LÖSCHEN' or any(r.startswith('§6') for r in prior['violated_rules'])):
+        return None
+
+    return {
+        'decision': prior['decision'],
+        'confidence': prior['confidence'],
+        'violated_rules': prior['violated_rules'],
+        'explanation': prior['explanation'],
+        'source': 'duplicate',
+        'duplicate': {k: match[k] for k in ('match', 'distance', 'seen_global', 'seen_article')}
+    }
+
+# ====================================
+# LOKALE VORKLASSIFIZIERUNG
+# ====================================
+
+# Eindeutige Fälle werden lokal (Regex + Lexikon) entschieden, nur der Rest geht ans LLM.
+LOCAL_DEFAULT_MIN_CONFIDENCE = 90
+
+_URL_RE = re.compile(r'(?:https?://|www\.)\S+|\b[\w-]+\.(?:com|net|biz|info|xyz|ru|shop|top|online)\b', re.IGNORECASE)
+_SPAM_RE = re.compile(
+    r'\b(?:günstige?n? kredite?|kredit ohne schufa|sofortkredit|schnelle[sn]? geld|geld verdienen|'
+    r'von zu ?hause aus verdienen|nebenverdienst|jetzt (?:kaufen|bestellen|registrieren)|'
+    r'klick(?:t|en sie)? hier|besucht meine (?:website|seite|homepage)|gratis|gewinnspiel|'
+    r'casino|krypto(?:-| )?tipps?|bitcoin|abnehmen ohne|rabattcode|gutscheincode)\b',
+    re.IGNORECASE
+)
+_REPEATED_CHARS_RE = re.compile(r'(\S)\1{7,}')
+_REPEATED_WORDS_RE = re.compile(r'\b(\w+)(?:\W+\1\b){3,}', re.IGNORECASE)
+# Gewalt: nur ausdrückliche Drohungen gegen ein Gegenüber (1./2. Person + Gewaltverb)
+# entscheiden lokal. Aufrufe in der 3. Person und bloße Gewaltverben (auch in
+# Berichten über Taten) sind nur Signale unterhalb der Schwelle und gehen ans LLM.
+_VIOLENT_VERB = r'(?:umbringen|umzubringen|abstechen|abknallen|erschießen|erschlagen|aufhängen|vergasen|köpfen|abschlachten|kaltmachen)'
+_THREAT_OBJECT = r' (?:dich|euch) (?:\w+ ){0,3}?'
+_THREAT_RE = re.compile(
+    # Trennbare Verben nur gegen das Gegenüber und mit der Partikel am Satzende:
+    # "ich bring dich um!", nicht "ich bringe sie um 8 zur Schule"
+    r'\bich (?:bring\w*' + _THREAT_OBJECT + r'um|(?:stech|knall)\w*' + _THREAT_OBJECT + r'ab|mach\w*' + _THREAT_OBJECT
+    + r'kalt)(?=\s*(?:[.!?,;:…]|$))|'
+    r'\b(?:ich|wir) (?:werde|werden|will|wollen|würde|würden) (?:dich|euch|sie|ihn) (?:\w+ ){0,3}?' + _VIOLENT_VERB + r'|'
+    r'\b(?:du|ihr) (?:gehörst|gehört) (?:\w+ ){0,2}?(?:aufgehängt|erschossen|vergast|abgeknallt|erschlagen|an die wand gestellt)|'
+    r'\b(?:dich|euch) (?:sollte|müsste|sollten|müssten) man (?:\w+ ){0,2}?' + _VIOLENT_VERB,
+    re.IGNORECASE
+)
+_VIOLENCE_CALL_RE = re.compile(
+    r'\b(?:an die wand (?:ge)?stell\w*|gehör\w* (?:\w+ ){0,2}?(?:aufgehängt|erschossen|vergast|abgeknallt|erschlagen)|'
+    r'(?:auf|er)hängen sollte man)',
+    re.IGNORECASE
+)
+_VIOLENCE_RE = re.compile(r'\b' + _VIOLENT_VERB + r'\b', re.IGNORECASE)
+# Lexikon eindeutiger Hass-Begriffe (§7/§1) – Wortanfänge, damit Flexionen mit erfasst werden
+_SLUR_RE = re.compile(
+    r'\b(?:kanake|kanacke|neger|judensau|judenschwein|zigeunerpack|schwuchtel|'
+    r'kinderficker|ausländerpack|asylantenpack)\w*',
+    re.IGNORECASE
+)
+# Umstrittene Begriffe, die auch in Kritik und Berichterstattung zitiert werden – nur Signal
+_CONTESTED_RE = re.compile(r'\b(?:untermensch|volksschädling|umvolkung|kopftuchmädchen)\w*', re.IGNORECASE)
+_INSULT_WORDS = (
+    r'(?:(?:voll)?(?:idiot|trottel|depp)|vollpfosten|vollkoffer|arschloch|arschlöcher|wichser|hurensohn|'
+    r'hurensöhne|missgeburt|drecksau|spast|spasti|dummkopf|schwachkopf|oasch|gsindl)(?:en|e|n|s|in|innen)?\b'
+)
+_INSULT_RE = re.compile(r'\b' + _INSULT_WORDS + r'|\bdrecks(?:kerl|pack|gesindel|politiker|bande)\w*', re.IGNORECASE)
+_DIRECT_ADDRESS_RE = re.compile(
+    # Nur 2. Person: "sie sind" meint meist Dritte ("Sie sind doch alle Idioten, die Politiker")
+    r'\b(?:du bist|ihr seid) (?:\w+ ){0,2}?' + _INSULT_WORDS + r'|\bdu (?:\w+ )?' + _INSULT_WORDS,
+    re.IGNORECASE
+)
+_NEGATED_INSULT_RE = re.compile(r'\b(?:kein\w*|nicht|niemals?) (?:\w+ ){0,2}?' + _INSULT_WORDS, re.IGNORECASE)
+_BENIGN_RE = re.compile(
+    r'^\s*(?:genau|stimmt|danke(?: für den (?:artikel|beitrag))?|sehr gut(?:er artikel)?|guter artikel|'
+    r'interessant(?:er artikel)?|spannend|full ack|\+1|👍+|dem ist nichts hinzuzufügen|sehe ich auch so)'
+    r'[\s!.]*$',
+    re.IGNORECASE
+)
+
+def preclassify_posting(posting: str) -> Dict:
+    """Lokale Vorklassifizierung: liefert Entscheidungskandidat, Konfidenz, Regeln und Signale"""
+    signals = []
+    violated_rules = []
+    decision = None
+    confidence = 0
+
+    has_url = bool(_URL_RE.search(posting))
+    has_spam = bool(_SPAM_RE.search(posting))
+    has_repetition = bool(_REPEATED_CHARS_RE.search(posting) or _REPEATED_WORDS_RE.search(posting))
+    has_threat = bool(_THREAT_RE.search(posting))
+    has_violence_call = not has_threat and bool(_VIOLENCE_CALL_RE.search(posting))
+    has_violence = not (has_threat or has_violence_call) and bool(_VIOLENCE_RE.search(posting))
+    has_slur = bool(_SLUR_RE.search(posting))
+    has_contested = bool(_CONTESTED_RE.search(posting))
+    has_insult = bool(_INSULT_RE.search(posting))
+
+    for flag, name in ((has_url, 'URL'), (has_spam, 'Werbung'), (has_repetition, 'Wiederholung'),
+                       (has_threat, 'Drohung'), (has_violence_call, 'Gewaltaufruf'), (has_violence, 'Gewalt-Begriff'),
+                       (has_slur, 'Hass-Begriff'), (has_contested, 'Umstrittener Begriff'), (has_insult, 'Beleidigung')):
+        if flag:
+            signals.append(name)
+
+    if has_threat:
+        decision, confidence = 'LÖSCHEN', 95
+        violated_rules.append('§3')
+    elif has_violence_call or has_violence:
+        decision, confidence = 'LÖSCHEN', 85 if has_violence_call else 60
+        violated_rules.append('§3')
+    if has_contested:
+        decision, confidence = 'LÖSCHEN', max(confidence, 60)
+        violated_rules.append('§7')
+    if has_slur:
+        decision, confidence = 'LÖSCHEN', 95
+        violated_rules.append('§7')
+    if has_spam and (has_url or has_repetition):
+        decision, confidence = 'LÖSCHEN', max(confidence, 95)
+        violated_rules.append('§5')
+    elif has_spam or (has_url and has_repetition):
+        decision, confidence = 'LÖSCHEN', max(confidence, 70)
+        violated_rules.append('§5')
+    if has_insult:
+        negated = bool(_NEGATED_INSULT_RE.search(posting))
+        direct = not negated and bool(_DIRECT_ADDRESS_RE.search(posting))
+        decision, confidence = 'LÖSCHEN', max(confidence, 90 if direct else 60 if negated else 75)
+        violated_rules.append('§2')
+        if direct:
+            signals.append('Direkte Anrede')
+        if negated:
+            signals.append('Verneinung')
+
+    if decision is None and not signals and _BENIGN_RE.match(posting):
+        decision, confidence = 'FREISCHALTEN', 92
+        signals.append('Kurze Zustimmung')
+
+    return {
+        'decision': decision,
+        'confidence': confidence,
+        'violated_rules': sorted(set(violated_rules), key=lambda r: int(r[1:])),
+        'signals': signals
+    }
+
+def local_moderation_result(local: Dict) -> Dict:
+    """Moderations-Ergebnis im üblichen Schema aus einer lokalen Entscheidung"""
+    return {
+        'decision': local['decision'],
+        'confidence': local['confidence'],
+        'violated_rules': local['violated_rules'],
+        'explanation': f"Lokale Vorklassifizierung (ohne LLM): {', '.join(local['signals'])}.",
+        'source': 'local',
+        'local_signals': local['signals']
+    }
+
+class PreclassifierStats:
+    """Trefferquote der lokalen Stufe und Übereinstimmung mit dem LLM, je Konfidenzstufe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.decided_locally = 0
+        self.by_confidence = {}
+
+    def record(self, decided_locally: bool):
+        with self._lock:
+            self.total += 1
+            if decided_locally:
+                self.decided_locally += 1
+
+    def record_comparison(self, local: Dict, llm_result: Dict):
+        """Vergleicht einen lokalen Kandidaten mit der LLM-Entscheidung (auch unterhalb der Schwelle)"""
+        if not local['decision'] or llm_result.get('decision') not in ('LÖSCHEN', 'FREISCHALTEN'):
+            return
+        with self._lock:
+            bucket = self.by_confidence.setdefault(local['confidence'], {'compared': 0, 'agreed': 0})
+            bucket['compared'] += 1
+            if llm_result['decision'] == local['decision']:
+                bucket['agreed'] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            compared = sum(b['compared'] for b in self.by_confidence.values())
+            agreed = sum(b['agreed'] for b in self.by_confidence.values())
+            return {
+                'total': self.total,
+                'decided_locally': self.decided_locally,
+                'hit_rate': self.decided_locally / self.total if self.total else 0.0,
+                'compared': compared,
+                'agreement': agreed / compared if compared else None,
+                'by_confidence': {k: dict(v) for k, v in sorted(self.by_confidence.items())}
+            }
+
+@process_singleton
+def get_preclassifier_stats() -> PreclassifierStats:
+    """Prozessweite Statistik der lokalen Vorklassifizierung"""
+    return PreclassifierStats()
+
+def _local_step(posting: str, stage_times: Dict[str, float], local_min_confidence: int) -> Tuple[Dict, bool]:
+    """Führt die lokale Stufe aus; liefert (Kandidat oder None, ob lokal entschieden wird)"""
+    if local_min_confidence is None:
+        return None, False
+    local = _timed(stage_times, 'local', preclassify_posting, posting)
+    return local, bool(local['decision']) and local['confidence'] >= local_min_confidence
+
+def _merge_local_and_llm(local: Dict, decided_locally: bool, llm_result: Dict) -> Dict:
+    """Verbucht den Vergleich lokal/LLM und wählt das endgültige Moderations-Ergebnis"""
+    if local is None:
+        llm_result['source'] = 'llm'
+        return llm_result
+
+    stats = get_preclassifier_stats()
+    stats.record(decided_locally)
+    stats.record_comparison(local, llm_result)
+    if not decided_locally:
+        llm_result['source'] = 'llm'
+        llm_result['local_signals'] = local['signals']
+        return llm_result
+
+    # Schattenmodus: lokale Entscheidung gilt, LLM-Urteil nur zum Vergleich
+    result = local_moderation_result(local)
+    result['shadow_llm_decision'] = llm_result.get('decision')
+    return result
+
+# ====================================
+# GELERNTER VORFILTER
+# ====================================
+
+# Logistische Regression auf gehashten Zeichen-n-Grammen, trainiert auf den in
+# der Historie gespeicherten LLM-Entscheidungen. Der Risiko-Score (Wahrscheinlichkeit,
+# dass das LLM löscht) entscheidet nur an den Rändern selbst; die Schwellen
+# werden auf zurückgehaltenen Daten gegen die LLM-Urteile kalibriert. Je Regel mit
+# genug Löschungen lernt ein eigenes Modell die verletzte Regel; eine Auto-Löschung
+# trägt immer die vorhergesagte Regel und zählt nur als Übereinstimmung, wenn das
+# LLM dieselbe Regel genannt hat. Dazwischen bestimmt der Score die Reihenfolge in
+# der LLM-Warteschlange (riskante Postings zuerst).
+PRESCORER_PATH = os.getenv("PRESCORER_PATH", os.path.join(".cache", "prescorer.npz"))
+PRESCORER_DIM = 2 ** 18
+PRESCORER_NGRAMS = (2, 3, 4, 5)
+PRESCORER_TARGET_AGREEMENT = float(os.getenv("PRESCORER_TARGET_AGREEMENT", "0.98"))
+PRESCORER_MIN_SUPPORT = 20  # Mindestzahl zurückgehaltener Postings in einem Auto-Bereich
+PRESCORER_MIN_EXAMPLES = 200
+PRESCORER_MIN_RULE_EXAMPLES = 10  # Löschungen je Regel, ab denen die Regel vorhergesagt wird
+PRESCORER_HOLDOUT_PERCENT = 20
+PRESCORER_EPOCHS = 80
+PRESCORER_LEARNING_RATE = 0.05
+PRESCORER_L2 = 1e-5
+PRESCORER_URGENCY_LEVELS = 10
+
+def hashed_ngrams(posting: str, dim: int = PRESCORER_DIM) -> np.ndarray:
+    """Sortierte, eindeutige Hash-Buckets der Zeichen-n-Gramme eines Postings (normalisiert, mit Wortgrenzen)"""
+    codes = np.frombuffer(f" {normalize_posting(posting)} ".encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    hashes = []
+    for n in PRESCORER_NGRAMS:
+        if len(codes) < n:
+            continue
+        # Polynom-Hash über ein gleitendes Fenster, n als Startwert trennt die Längen
+        h = np.full(len(codes) - n + 1, n, dtype=np.uint64)
+        for k in range(n):
+            h = h * np.uint64(1_000_003) + codes[k:len(codes) - n + 1 + k]
+        hashes.append(h)
+    if not hashes:
+        return np.empty(0, dtype=np.int64)
+    h = np.concatenate(hashes)
+    h ^= h >> np.uint64(31)
+    return np.unique((h % np.uint64(dim)).astype(np.int64))
+
+def _ngram_rows(postings: List[str], dim: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Dünn besetzte Merkmalsmatrix als (Spalten, Werte, Zeilen); jede Zeile L2-normiert"""
+    rows = [hashed_ngrams(posting, dim) for posting in postings]
+    lengths = np.array([len(row) for row in rows], dtype=np.int64)
+    columns = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+    values = np.repeat(1 / np.sqrt(np.maximum(lengths, 1)), lengths)
+    return columns, values, np.repeat(np.arange(len(rows)), lengths)
+
+def _logits(weights: np.ndarray, bias: float, columns: np.ndarray, values: np.ndarray, row_ids: np.ndarray, n: int) -> np.ndarray:
+    return np.bincount(row_ids, weights=weights[columns] * values, minlength=n) + bias
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+
+def fit_logistic(postings: List[str], labels: np.ndarray, dim: int = PRESCORER_DIM,
+                 epochs: int = PRESCORER_EPOCHS) -> Tuple[np.ndarray, float]:
+    """Logistische Regression (Adam, volle Batches, L2) auf gehashten n-Grammen; labels 1 = gelöscht"""
+    columns, values, row_ids = _ngram_rows(postings, dim)
+    n = len(postings)
+    weights, bias = np.zeros(dim), 0.0
+    m_w, v_w, m_b, v_b = np.zeros(dim), np.zeros(dim), 0.0, 0.0
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    for step in range(1, epochs + 1):
+        residual = (_sigmoid(_logits(weights, bias, columns, values, row_ids, n)) - labels) / n
+        grad_w = np.bincount(columns, weights=values * residual[row_ids], minlength=dim) + PRESCORER_L2 * weights
+        grad_b = residual.sum()
+        m_w = beta1 * m_w + (1 - beta1) * grad_w
+        v_w = beta2 * v_w + (1 - beta2) * grad_w ** 2
+        m_b = beta1 * m_b + (1 - beta1) * grad_b
+        v_b = beta2 * v_b + (1 - beta2) * grad_b ** 2
+        correction = math.sqrt(1 - beta2 ** step) / (1 - beta1 ** step)
+        weights -= PRESCORER_LEARNING_RATE * correction * m_w / (np.sqrt(v_w) + eps)
+        bias -= PRESCORER_LEARNING_RATE * correction * m_b / (math.sqrt(v_b) + eps)
+    return weights, bias
+
+def calibrate_thresholds(risk: np.ndarray, deleted: np.ndarray, target: float = PRESCORER_TARGET_AGREEMENT,
+                         min_support: int = PRESCORER_MIN_SUPPORT, delete_agrees: np.ndarray = None) -> Dict:
+    """Größte Auto-Bereiche an beiden Rändern, in denen die Übereinstimmung mit dem LLM mindestens target ist.
+
+    delete_agrees markiert, wo eine Auto-Löschung mit dem LLM übereinstimmt
+    (gelöscht und richtige Regel); ohne Angabe zählt jede LLM-Löschung.
+    """
+    if delete_agrees is None:
+        delete_agrees = deleted
+    order = np.argsort(risk, kind='stable')
+    ordered_risk, ordered_deleted = risk[order], deleted[order].astype(float)
+    ordered_delete_agrees = delete_agrees[order].astype(float)
+    n = len(ordered_risk)
+    seen = np.arange(1, n + 1)
+
+    def widest(agree: np.ndarray, limit: int) -> int:
+        ok = np.cumsum(agree[:limit]) / seen[:limit] >= target
+        ok[:min_support - 1] = False
+        return int(np.nonzero(ok)[0].max()) + 1 if ok.any() else 0
+
+    # Nur Postings, bei denen das Modell selbst sicher genug ist; der Holdout kann
+    # die Bereiche dann nur verkleinern, nicht über die Klassengrenze ausdehnen
+    approve_n = widest(1 - ordered_deleted, int(np.searchsorted(ordered_risk, 1 - target, side='right')))
+    delete_limit = n - int(np.searchsorted(ordered_risk, target, side='left'))
+    delete_n = widest(ordered_delete_agrees[::-1], min(delete_limit, n - approve_n))
+    approve_max = float(ordered_risk[approve_n - 1]) if approve_n else None
+    delete_min = float(ordered_risk[n - delete_n]) if delete_n else None
+
+    approve = risk <= approve_max if approve_max is not None else np.zeros(n, dtype=bool)
+    delete = risk >= delete_min if delete_min is not None else np.zeros(n, dtype=bool)
+    return {
+        'approve_max': approve_max,
+        'delete_min': delete_min,
+        'target_agreement': target,
+        'holdout': n,
+        'auto_approve_share': float(approve.mean()) if n else 0.0,
+        'auto_approve_agreement': float(1 - deleted[approve].mean()) if approve.any() else None,
+        'auto_delete_share': float(delete.mean()) if n else 0.0,
+        'auto_delete_agreement': float(delete_agrees[delete].mean()) if delete.any() else None
+    }
+
+def load_training_examples(path: str) -> List[Tuple[str, str, List[str]]]:
+    """LLM-Urteile aus einem Historie-Export (JSON-Liste) oder Bulk-Ergebnissen (JSONL) als (Posting, Entscheidung, Regeln)"""
+    with open(path, encoding='utf-8') as f:
+        raw = f.read()
+    records = json.loads(raw) if raw.lstrip().startswith('[') else [json.loads(line) for line in raw.splitlines() if line.strip()]
+    return [
+        (record['posting'], record['decision'], list(record.get('violated_rules') or []))
+        for record in records
+        if record.get('posting') and record.get('decision') in ('LÖSCHEN', 'FREISCHALTEN')
+        and record.get('source', 'llm') == 'llm'
+    ]
+
+class PreScorer:
+    """Gelernter Vorfilter: Risiko-Score und kalibrierte Schwellen für Auto-Freigabe und Auto-Löschung.
+
+    Gewichte und Schwellen werden gemeinsam ausgetauscht (train/load), laufende
+    Bewertungen sehen also immer einen konsistenten Stand. Zählt außerdem die
+    Aktionen und die Übereinstimmung mit dem LLM, wo beide geurteilt haben.
+    """
+
+    def __init__(self, path: str = PRESCORER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._model = None  # (Gewichte, Bias, Info inkl. Schwellen und Regeln, Regel-Gewichte, Regel-Biases)
+        self.actions = Counter()
+        self.compared = 0
+        self.agreed = 0
+        if os.path.exists(path):
+            self.load()
+
+    @property
+    def trained(self) -> bool:
+        return self._model is not None
+
+    @property
+    def info(self) -> Dict:
+        return dict(self._model[2]) if self._model else {}
+
+    def risk_many(self, postings: List[str]) -> np.ndarray:
+        """Risiko-Scores (0-1) für viele Postings in einem Durchgang"""
+        return _score_model(self._model, postings)[0]
+
+    def assess(self, posting: str) -> Dict:
+        """Risiko, Aktion ('approve', 'delete' oder None = LLM), vorhergesagte Regel und Dringlichkeit"""
+        model = self._model
+        info = model[2]
+        risk, rules = _score_model(model, [posting])
+        risk, rule = float(risk[0]), rules[0]
+        action = None
+        if info['approve_max'] is not None and risk <= info['approve_max']:
+            action = 'approve'
+        elif info['delete_min'] is not None and risk >= info['delete_min'] and rule is not None:
+            action = 'delete'
+        get_metrics().incr('prescorer_total', action=action or 'llm')
+        with self._lock:
+            self.actions[action or 'llm'] += 1
+        return {
+            'risk': risk,
+            'action': action,
+            'rule': rule if action == 'delete' else None,
+            'urgency': int(round((1 - risk) * PRESCORER_URGENCY_LEVELS))
+        }
+
+    def record(self, scored: Dict, llm_result: Dict):
+        """Vergleicht den Score (ab 0.5 = löschen) mit einem LLM-Urteil"""
+        if llm_result is None or llm_result.get('decision') not in ('LÖSCHEN', 'FREISCHALTEN'):
+            return
+        with self._lock:
+            self.compared += 1
+            self.agreed += (scored['risk'] >= 0.5) == (llm_result['decision'] == 'LÖSCHEN')
+
+    def train(self, examples: List[Tuple[str, str, List[str]]], target_agreement: float = PRESCORER_TARGET_AGREEMENT,
+              min_support: int = PRESCORER_MIN_SUPPORT, epochs: int = PRESCORER_EPOCHS) -> Dict:
+        """Trainiert auf (Posting, LLM-Entscheidung, Regeln), kalibriert die Schwellen auf dem Holdout und speichert"""
+        latest = {posting: (decision, {rule_key(r) for r in rules}) for posting, decision, rules in examples}
+        postings = list(latest)
+        labels = np.array([latest[p][0] == 'LÖSCHEN' for p in postings], dtype=float)
+        rule_sets = [latest[p][1] if latest[p][0] == 'LÖSCHEN' else set() for p in postings]
+        if len(postings) < PRESCORER_MIN_EXAMPLES or labels.min() == labels.max():
+            raise ValueError(
+                f"Zu wenige LLM-Entscheidungen zum Trainieren ({len(postings)}, mindestens "
+                f"{PRESCORER_MIN_EXAMPLES} mit beiden Entscheidungen)"
+            )
+        # Feste Aufteilung über den Posting-Hash, damit Nachtrainieren vergleichbar bleibt
+        holdout = np.array([int(content_hash(p), 16) % 100 < PRESCORER_HOLDOUT_PERCENT for p in postings])
+        train_postings = [p for p, h in zip(postings, holdout) if not h]
+        holdout_postings = [p for p, h in zip(postings, holdout) if h]
+
+        started = time.perf_counter()
+        weights, bias = fit_logistic(train_postings, labels[~holdout], PRESCORER_DIM, epochs)
+        # Regel-Modelle (eins gegen alle) nur auf den gelöschten Trainings-Postings
+        train_deleted = [(p, rules) for p, rules, h, y in zip(postings, rule_sets, holdout, labels) if not h and y]
+        rule_counts = Counter(rule for _, rules in train_deleted for rule in rules)
+        rule_names = sorted(
+            (rule for rule, count in rule_counts.items() if count >= PRESCORER_MIN_RULE_EXAMPLES),
+            key=lambda rule: (not rule.startswith('§'), int(rule[1:]) if rule[1:].isdigit() else 0, rule)
+        )
+        rule_weights = np.zeros((len(rule_names), PRESCORER_DIM), dtype=np.float32)
+        rule_biases = np.zeros(len(rule_names))
+        for i, rule in enumerate(rule_names):
+            rule_labels = np.array([rule in rules for _, rules in train_deleted], dtype=float)
+            rule_weights[i], rule_biases[i] = fit_logistic([p for p, _ in train_deleted], rule_labels, PRESCORER_DIM, epochs)
+        train_seconds = time.perf_counter() - started
+
+        info = {'dim': PRESCORER_DIM, 'approve_max': None, 'delete_min': None, 'rules': rule_names}
+        candidate = (weights.astype(np.float32), float(bias), info, rule_weights, rule_biases)
+        started = time.perf_counter()
+        risk, predicted_rules = _score_model(candidate, holdout_postings)
+        scoring_seconds = time.perf_counter() - started
+        deleted = labels[holdout]
+        holdout_rules = [rules for rules, h in zip(rule_sets, holdout) if h]
+        # Eine Auto-Löschung stimmt nur überein, wenn das LLM auch die vorhergesagte Regel nennt
+        delete_agrees = np.array([
+            rule is not None and rule in rules for rule, rules in zip(predicted_rules, holdout_rules)
+        ], dtype=float)
+
+        info.update(calibrate_thresholds(risk, deleted, target_agreement, min_support, delete_agrees))
+        info.update({
+            'trained_at': datetime.now().isoformat(timespec='seconds'),
+            'examples': len(postings),
+            'deleted_share': float(labels.mean()),
+            'holdout_accuracy': float(((risk >= 0.5) == (deleted == 1)).mean()),
+            'holdout_auc': _rank_auc(risk, deleted),
+            'train_seconds': train_seconds,
+            'scoring_per_s': len(holdout_postings) / scoring_seconds if scoring_seconds else None
+        })
+        with self._lock:
+            self._model = candidate
+        self.save()
+        return self.info
+
+    def save(self):
+        weights, bias, info, rule_weights, rule_biases = self._model
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as f:
+            np.savez_compressed(
+                f, weights=weights, bias=np.array(bias), info=np.array(json.dumps(info)),
+                rule_weights=rule_weights, rule_biases=rule_biases
+            )
+
+    def load(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            info = json.loads(str(data['info']))
+            if 'rule_weights' in data.files:
+                rule_weights, rule_biases = data['rule_weights'], data['rule_biases']
+            else:
+                # Älteres Modell ohne Regel-Vorhersage: keine Auto-Löschungen
+                rule_weights, rule_biases = np.zeros((0, info['dim']), dtype=np.float32), np.zeros(0)
+                info.update({'rules': [], 'delete_min': None})
+            model = (data['weights'], float(data['bias']), info, rule_weights, rule_biases)
+        with self._lock:
+            self._model = model
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = sum(self.actions.values())
+            return {
+                'trained': self.trained,
+                'scored': total,
+                'auto_approved': self.actions.get('approve', 0),
+                'auto_deleted': self.actions.get('delete', 0),
+                'decided_share': (self.actions.get('approve', 0) + self.actions.get('delete', 0)) / total if total else 0.0,
+                'compared': self.compared,
+                'agreement': self.agreed / self.compared if self.compared else None,
+                'model': self.info
+            }
+
+def _score_model(model: tuple, postings: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """Risiko-Scores und wahrscheinlichste Regel (None ohne Regel-Modelle) je Posting"""
+    weights, bias, info, rule_weights, rule_biases = model
+    columns, values, row_ids = _ngram_rows(postings, info['dim'])
+    n = len(postings)
+    risk = _sigmoid(_logits(weights, bias, columns, values, row_ids, n))
+    if not info['rules']:
+        return risk, [None] * n
+    rule_logits = np.stack([
+        _logits(rule_weights[i], rule_biases[i], columns, values, row_ids, n) for i in range(len(info['rules']))
+    ])
+    return risk, [info['rules'][i] for i in rule_logits.argmax(axis=0)]
+
+def _rank_auc(scores: np.ndarray, labels: np.ndarray) -> float:
+    """Fläche unter der ROC-Kurve über Ränge (Mann-Whitney)"""
+    positives = labels == 1
+    n_pos, n_neg = int(positives.sum()), int((~positives).sum())
+    if not n_pos or not n_neg:
+        return None
+    ranks = pd.Series(scores).rank().to_numpy()
+    return float((ranks[positives].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
+
+@process_singleton
+def get_prescorer() -> PreScorer:
+    """Prozessweiter gelernter Vorfilter (lädt PRESCORER_PATH, falls vorhanden)"""
+    return PreScorer()
+
+def prescored_moderation_result(scored: Dict) -> Dict:
+    """Moderations-Ergebnis im üblichen Schema aus einer Entscheidung des gelernten Vorfilters"""
+    info = get_prescorer().info
+    delete = scored['action'] == 'delete'
+    return {
+        'decision': 'LÖSCHEN' if delete else 'FREISCHALTEN',
+        'confidence': int(round(100 * (scored['risk'] if delete else 1 - scored['risk']))),
+        'violated_rules': [scored['rule']] if delete else [],
+        'explanation': (
+            f"Gelernter Vorfilter (ohne LLM): Risiko-Score {scored['risk']:.3f} "
+            f"{'über der Lösch' if delete else 'unter der Freigabe'}schwelle "
+            f"{info['delete_min'] if delete else info['approve_max']:.3f}"
+            + (f", vorhergesagte Regel {scored['rule']}." if delete else ".")
+        ),
+        'source': 'prescorer',
+        'prescore': scored
+    }
+
+def _prescore_step(posting: str, stage_times: Dict[str, float], enabled: bool) -> Tuple[Dict, bool]:
+    """Bewertet das Posting mit dem gelernten Vorfilter; liefert (Score oder None, ob er entscheidet)"""
+    prescorer = get_prescorer()
+    if not enabled or not prescorer.trained:
+        return None, False
+    scored = _timed(stage_times, 'prescore', prescorer.assess, posting)
+    return scored, scored['action'] is not None
+
+def _merge_prescore(scored: Dict, decided: bool, llm_result: Dict) -> Dict:
+    """Verbucht den Vergleich Vorfilter/LLM; entscheidet der Vorfilter, gilt sein Ergebnis (LLM nur im Schattenmodus)"""
+    if scored is None:
+        return llm_result
+    get_prescorer().record(scored, llm_result)
+    if not decided:
+        llm_result['prescore'] = scored
+        return llm_result
+    result = prescored_moderation_result(scored)
+    if llm_result is not None:
+        result['shadow_llm_decision'] = llm_result.get('decision')
+    return result
+
+# ====================================
+# LOKALE FRAGEN-ERKENNUNG
+# ====================================
+
+# Eindeutige Fälle der Fragen-/Reaktions-Analyse ohne LLM; unsichere gehen ans LLM.
+QUESTION_LOCAL_DEFAULT_MIN_CONFIDENCE = 0.8
+
+_W_QUESTION_RE = re.compile(
+    r'^\W*(?:wer|wen|wem|wessen|was|wann|wo|wohin|woher|warum|weshalb|wieso|wie|welche[rsmn]?|wozu|womit|worüber)\b',
+    re.IGNORECASE
+)
+_VERB_FIRST_RE = re.compile(
+    r'^\W*(?:ist|sind|war|waren|hat|haben|hatte|gibt|gab|kann|können|könnte|soll|sollte|muss|müssen|'
+    r'darf|will|wird|werden|würde|würden|habt|seid|wisst|glaubt|findet|meint|stimmt)\b',
+    re.IGNORECASE
+)
+_DISCUSSION_PROMPT_RE = re.compile(
+    r'\b(?:was (?:sagt|meint|denkt|haltet) ihr|wie seht ihr|seht ihr das|findet ihr|eure meinung|'
+    r'eure erfahrungen?|was meinen sie|wie sehen sie das|diskutier(?:t|en wir)|bin gespannt auf|'
+    r'lasst uns|schreibt (?:mal|gerne))\b',
+    re.IGNORECASE
+)
+_RHETORICAL_RE = re.compile(
+    r'\b(?:oder etwa nicht|ernsthaft|wer braucht (?:das|so)|wie kann man nur|'
+    r'wer hat sich das ausgedacht|soll das ein witz sein|geht\'?s noch)\b',
+    re.IGNORECASE
+)
+_INDIRECT_QUESTION_RE = re.compile(
+    r'\b(?:ich frage mich|frage mich|wüsste (?:gern|gerne)|würde mich interessieren|'
+    r'bin neugierig|mich würde interessieren)\b',
+    re.IGNORECASE
+)
+_PROVOCATION_RE = re.compile(
+    r'\b(?:das kann doch nicht sein|unglaublich|skandal|schämt euch|typisch|lächerlich|'
+    r'wacht endlich auf|unfassbar)\b',
+    re.IGNORECASE
+)
+_AUDIENCE_PATTERNS = (
+    ('Redaktion', re.compile(r'\b(?:liebe redaktion|@redaktion|redaktion|derstandard|der standard)\b', re.IGNORECASE)),
+    ('Journalist', re.compile(r'\b(?:lieber? autor(?:in)?|liebe journalistin|lieber journalist|herr autor|frau autorin)\b', re.IGNORECASE)),
+    ('Politiker', re.compile(r'\b(?:herr|frau) (?:minister|ministerin|kanzler|kanzlerin|bürgermeister|bürgermeisterin|präsident|präsidentin)\b', re.IGNORECASE)),
+    ('User', re.compile(r'(?:^|\s)@\w+|\b(?:ihr|euch|eure?|liebe poster(?:innen)?|liebe mitposter)\b', re.IGNORECASE)),
+)
+
+def _question_sentences(posting: str) -> List[str]:
+    """Fragesätze; Anreden vor dem Komma ("Liebe Redaktion, warum ...") werden als eigener Teil behandelt"""
+    sentences = [s.strip() for s in re.findall(r'[^.!?]*\?+', posting) if s.strip()]
+    return [part for s in sentences for part in s.split(',')]
+
+def detect_question_locally(posting: str) -> Tuple[Dict, float]:
+    """Regelbasierte Fragen-/Reaktions-Erkennung im Schema der LLM-Analyse; liefert (Ergebnis, Konfidenz 0-1)"""
+    indicators = []
+    questions = _question_sentences(posting)
+    target = next((name for name, pattern in _AUDIENCE_PATTERNS if pattern.search(posting)), None)
+
+    discussion = _DISCUSSION_PROMPT_RE.search(posting)
+    rhetorical = _RHETORICAL_RE.search(posting)
+    indirect = _INDIRECT_QUESTION_RE.search(posting)
+    provocation = _PROVOCATION_RE.search(posting)
+
+    if discussion:
+        indicators.append(f'Diskussionsaufforderung: "{discussion.group(0)}"')
+    if rhetorical:
+        indicators.append(f'Rhetorische Wendung: "{rhetorical.group(0)}"')
+    if provocation:
+        indicators.append(f'Provokante Aussage: "{provocation.group(0)}"')
+
+    if questions:
+        has_questions = True
+        if rhetorical:
+            question_type, confidence = 'Rhetorische Frage', 0.85
+        elif any(_W_QUESTION_RE.search(q) for q in questions):
+            question_type, confidence = 'Direkte Frage', 0.9
+        elif any(_VERB_FIRST_RE.search(q) for q in questions):
+            question_type, confidence = 'Direkte Frage', 0.85
+        else:
+            question_type, confidence = 'Direkte Frage', 0.7
+        indicators.append(f"{posting.count('?')} Fragezeichen")
+        expects_reactions = True
+        if discussion:
+            confidence = 0.95
+            target = target or 'User'
+    elif indirect:
+        has_questions, question_type, confidence = True, 'Indirekte Frage', 0.75
+        expects_reactions = True
+        indicators.append(f'Indirekte Frage: "{indirect.group(0)}"')
+    elif discussion:
+        has_questions, question_type, confidence = False, 'Keine', 0.85
+        expects_reactions = True
+        target = target or 'User'
+    elif _BENIGN_RE.match(posting):
+        has_questions, question_type, confidence = False, 'Keine', 0.9
+        expects_reactions = False
+    elif provocation or '!' in posting:
+        # Ausrufe und Provokationen: Reaktions-Erwartung ist Ermessenssache -> LLM
+        has_questions, question_type, confidence = False, 'Keine', 0.6
+        expects_reactions = True
+    else:
+        has_questions, question_type = False, 'Keine'
+        expects_reactions = False
+        confidence = 0.85 if len(posting) < 200 else 0.65
+
+    result = {
+        'has_questions': has_questions,
+        'expects_reactions': expects_reactions,
+        'target_audience': target or ('Allgemein' if expects_reactions else 'Unbekannt'),
+        'explanation': (
+            f"Lokale Erkennung (ohne LLM): {question_type}"
+            f"{', erwartet Reaktionen' if expects_reactions else ', keine Reaktions-Erwartung erkennbar'}."
+        ),
+        'question_type': question_type,
+        'reaction_indicators': indicators,
+        'error': False,
+        'source': 'local',
+        'local_confidence': confidence
+    }
+    return result, confidence
+
+def _local_question_step(posting: str, stage_times: Dict[str, float], min_confidence: float) -> Dict:
+    """Lokale Fragen-Erkennung; liefert das Ergebnis nur, wenn es sicher genug ist"""
+    if min_confidence is None:
+        return None
+    question_analysis, confidence = _timed(stage_times, 'local_question', detect_question_locally, posting)
+    return question_analysis if confidence >= min_confidence else None
+
+# ====================================
+# ANALYSE-MODI (SEQUENZIELL / PARALLEL / KOMBINIERT)
+# ====================================
+
+ANALYSIS_MODES = {
+    'sequential': 'Sequenziell (2 Aufrufe nacheinander)',
+    'concurrent': 'Parallel (2 Aufrufe gleichzeitig)',
+    'combined': 'Kombiniert (1 Aufruf)'
+}
+
+QUESTION_FIELDS = ('has_questions', 'expects_reactions', 'target_audience', 'question_type', 'reaction_indicators')
+
+@prompt_prefix_builder('combined')
+def combined_prompt_prefix(rules_text: str) -> str:
+    """Anweisungen und Regeln des kombinierten Prompts; Artikel und Posting folgen am Ende"""
+    return f"""Du bist ein erfahrener Foren-Moderator und Experte für Kommunikationsanalyse bei DER STANDARD. Analysiere das Posting am Ende nach unseren Forenregeln und darauf, ob der Autor Fragen stellt oder Reaktionen erwartet.
+
+MODERATION PRINZIPIEN:
+- Bevorzuge FREISCHALTEN bei Grenzfällen und Unsicherheiten
+- Berücksichtige Kontext, Ironie, Sarkasmus und emotionale Reaktionen
+- Lösche bei Regelverstößen
+- Unterscheide zwischen konstruktiver Kritik und echten Beleidigungen
+
+FORENREGELN:
+{rules_text}
+
+AUFGABE MODERATION:
+1. Entscheide: LÖSCHEN oder FREISCHALTEN
+2. Bei LÖSCHEN: Welche Regel(n) wurden eindeutig und schwerwiegend verletzt?
+3. Gib eine Konfidenz-Score (0-100)
+4. Die Begründung sollte höchstens zwei Sätze lang und auf deutsch sein.
+
+AUFGABE FRAGEN & REAKTIONEN:
+- Enthält das Posting direkte, indirekte oder rhetorische Fragen?
+- Macht der Autor Aussagen, die eine Reaktion erwarten (z.B. "Was sagt ihr dazu?", provokante Behauptungen, Aufrufe zur Diskussion)?
+- An wen richtet sich der Autor? (Journalist, Redaktion, andere User, Politiker, etc.)
+
+Antworte im JSON Format:
+{{
+    "decision": "LÖSCHEN/FREISCHALTEN",
+    "confidence": 0-100,
+    "violated_rules": ["§X", "§Y"],
+    "explanation": "Begründung",
+    "has_questions": true/false,
+    "expects_reactions": true/false,
+    "target_audience": "Journalist/Redaktion/User/Politiker/Allgemein/Unbekannt",
+    "question_explanation": "Kurze deutsche Erklärung der Fragen-Analyse",
+    "question_type": "Direkte Frage/Indirekte Frage/Rhetorische Frage/Keine",
+    "reaction_indicators": ["Liste von Indikatoren falls vorhanden"]
+}}
+"""
+
+def build_combined_prompt(
+    posting: str,
+    article_title: str,
+    article_content: str,
+    rules_text: str = None,
+    repetition_note: str = None
+) -> str:
+    """Baut einen Prompt, der Moderation und Fragen-Analyse in einem Aufruf abfragt"""
+    if rules_text is None:
+        rules_text = format_rules_for_prompt()
+    repetition_block = f"\nHINWEIS WIEDERHOLUNG:\n{repetition_note}\n" if repetition_note else ""
+
+    return (
+        get_rule_sets().for_text(rules_text).prompt_prefix('combined')
+        + article_prompt_block(article_title, article_content)
+        + f'\nPOSTING ZU BEWERTEN:\n"{posting}"\n{repetition_block}'
+    )
+
+def parse_combined_response(response_text: str) -> Dict:
+    """Validiert die kombinierte Antwort (Moderation + Fragen-Analyse) in einem Durchgang"""
+    try:
+        with get_metrics().span('json_parse', task='combined'):
+            data = load_json_object(response_text)
+            question = QuestionResult.from_json(data, explanation_field='question_explanation')
+            return {
+                **ModerationResult.from_json(data).to_dict(),
+                **{k: v for k, v in asdict(question).items() if k != 'explanation'},
+                'question_explanation': question.explanation
+            }
+    except ResponseParseError as e:
+        get_metrics().incr('errors_total', stage='json_parse', task='combined')
+        return {**moderation_error_result(f'Ungültige LLM-Antwort: {e}'), 'parse_error': True}
+
+def split_combined_result(combined: Dict) -> Tuple[Dict, Dict]:
+    """Teilt das kombinierte Ergebnis in Moderations- und Fragen-Ergebnis auf"""
+    if combined.get('decision') == 'ERROR':
+        return combined, question_error_result(combined.get('explanation', 'Unbekannter Fehler'))
+
+    result = {k: v for k, v in combined.items() if k not in QUESTION_FIELDS and k != 'question_explanation'}
+    question_analysis = {
+        **{k: combined[k] for k in QUESTION_FIELDS},
+        'explanation': combined['question_explanation'],
+        'error': False
+    }
+    return result, question_analysis
+
+def analyze_posting_combined(
+    posting: str,
+    article_title: str,
+    article_content: str,
+    api_key: str,
+    model: str = "llama3-8b-8192",
+    rules_text: str = None,
+    repetition_note: str = None,
+    on_update: Callable[[Dict], None] = None
+) -> Tuple[Dict, Dict]:
+    """Moderation und Fragen-Analyse mit einem einzigen LLM-Aufruf (mit on_update gestreamt)"""
+    if not api_key:
+        return split_combined_result(moderation_error_result('Bitte API Key eingeben!'))
+
+    if rules_text is None:
+        rules_text = format_rules_for_prompt()
+    if model == CASCADE_MODEL:
+        return run_cascade(
+            lambda tier_model: analyze_posting_combined(
+                posting, article_title, article_content, api_key, tier_model, rules_text, repetition_note, on_update
+            ),
+            estimate_tokens(build_combined_prompt(posting, article_title, article_content, rules_text, repetition_note))
+        )
+    cache_key, cached = cached_result('combined', posting, article_content, model, rules_text + (repetition_note or ''))
+    if cached:
+        return split_combined_result(cached)
+
+    try:
+        client = get_client_pool().get_client(api_key)
+        with get_metrics().span('prompt_build', task='combined'):
+            prompt = build_combined_prompt(posting, article_title, article_content, rules_text, repetition_note)
+
+        if on_update:
+            combined = stream_completion(client, model, prompt, 'combined', on_update).result(parse_combined_response)
+        else:
+            combined = parse_combined_response(llm_complete(client, 'combined', model, prompt))
+        store_cached_result(cache_key, 'combined', combined)
+        return split_combined_result(combined)
+
+    except Exception as e:
+        get_metrics().incr('errors_total', stage='combined')
+        return split_combined_result(moderation_error_result(f'Fehler bei der Analyse: {str(e)}'))
+
+async def analyze_posting_combined_async(
+    posting: str,
+    article_title: str,
+    article_content: str,
+    client: AsyncGroq,
+    model: str = "llama3-8b-8192",
+    rules_text: str = None,
+    repetition_note: str = None
+) -> Tuple[Dict, Dict]:
+    """Async-Variante der kombinierten Analyse für den Bulk-Modus"""
+    if rules_text is None:
+        rules_text = format_rules_for_prompt()
+    if model == CASCADE_MODEL:
+        return await run_cascade_async(
+            lambda tier_model: analyze_posting_combined_async(
+                posting, article_title, article_content, client, tier_model, rules_text, repetition_note
+            ),
+            estimate_tokens(build_combined_prompt(posting, article_title, article_content, rules_text, repetition_note))
+        )
+    cache_key, cached = cached_result('combined', posting, article_content, model, rules_text + (repetition_note or ''))
+    if cached:
+        return split_combined_result(cached)
+
+    try:
+        with get_metrics().span('prompt_build', task='combined'):
+            prompt = build_combined_prompt(posting, article_title, article_content, rules_text, repetition_note)
+
+        combined = parse_combined_response(await llm_complete_async(client, 'combined', model, prompt))
+        store_cached_result(cache_key, 'combined', combined)
+        return split_combined_result(combined)
+
+    except Exception as e:
+        get_metrics().incr('errors_total', stage='combined')
+        return split_combined_result(moderation_error_result(f'Fehler bei der Analyse: {str(e)}'))
+
+def _timed(stage_times: Dict[str, float], stage: str, func: Callable, *args):
+    """Führt func aus und trägt die Dauer unter stage ein"""
+    stage_start = time.time()
+    try:
+        return func(*args)
+    finally:
+        stage_times[stage] = time.time() - stage_start
+
+async def _timed_async(stage_times: Dict[str, float], stage: str, coro):
+    """Wartet auf coro und trägt die Dauer unter stage ein"""
+    stage_start = time.time()
+    try:
+        return await coro
+    finally:
+        stage_times[stage] = time.time() - stage_start
+
+def _finalize_analysis(
+    result: Dict,
+    question_analysis: Dict,
+    mode: str,
+    start_time: float,
+    stage_times: Dict[str, float],
+    rules_text: str
+) -> Dict:
+    """Hängt Fragen-Analyse, Regelwerk-Version und Zeitaufschlüsselung an das Moderations-Ergebnis"""
+    result['question_analysis'] = question_analysis
+    result['rules_version'] = get_rule_sets().for_text(rules_text).version
+    result['analysis_mode'] = mode
+    result['analysis_time'] = time.time() - start_time
+    result['stage_times'] = stage_times
+    return result
+
+def _prompt_tokens_for(
+    need_moderation: bool,
+    need_question: bool,
+    mode: str,
+    posting: str,
+    article_title: str,
+    article_content: str,
+    rules_text: str
+) -> int:
+    """Geschätzte Input-Tokens der tatsächlich gesendeten Prompts"""
+    if need_moderation and need_question:
+        return estimate_prompt_tokens(mode, posting, article_title, article_content, rules_text)
+    if need_moderation:
+        return estimate_tokens(build_moderation_prompt(posting, article_title, article_content, rules_text))
+    if need_question:
+        return estimate_tokens(build_question_prompt(posting, article_title, article_content))
+    return 0
+
+def _duplicate_step(
+    posting: str,
+    article_url: str,
+    rules_text: str,
+    stage_times: Dict[str, float],
+    enabled: bool
+) -> Tuple[Dict, Dict]:
+    """Schlägt das Posting im Duplikat-Index nach; liefert (Treffer, übernommenes Ergebnis oder None)"""
+    if not enabled:
+        return None, None
+    match = _timed(stage_times, 'duplicate', get_duplicate_index().lookup, posting, article_url)
+    return match, reusable_duplicate_decision(match, article_url, content_hash(rules_text))
+
+def _record_duplicate(posting: str, article_url: str, result: Dict, rules_text: str, match: Dict):
+    """Zählt das Posting im Duplikat-Index (nur wenn die Prüfung aktiv war)"""
+    if match is None:
+        return
+    get_duplicate_index().record(posting, article_url, result, content_hash(rules_text), match)
+    if match['match']:
+        result.setdefault('duplicate', {k: match[k] for k in ('match', 'distance', 'seen_global', 'seen_article')})
+
+def run_analysis(
+    posting: str,
+    article_title: str,
+    article_content: str,
+    api_key: str,
+    model: str,
+    mode: str = 'sequential',
+    rules_text: str = None,
+    local_min_confidence: int = None,
+    shadow_local: bool = False,
+    question_local_min_confidence: float = None,
+    article_url: str = None,
+    duplicate_check: bool = False,
+    on_update: Callable[[Dict], None] = None,
+    prescore: bool = False
+) -> Dict:
+    """Führt Moderation und Fragen-Analyse im gewählten Modus aus.
+
+    Mit local_min_confidence entscheidet die lokale Vorklassifizierung
+    eindeutige Fälle ohne Moderations-LLM; shadow_local fragt das LLM
+    trotzdem, um die Übereinstimmung zu messen. Mit
+    question_local_min_confidence ersetzt die lokale Fragen-Erkennung den
+    zweiten LLM-Aufruf, sofern sie sicher genug ist. Mit duplicate_check
+    werden (nahe) Duplikate im Duplikat-Index nachgeschlagen: übertragbare
+    frühere Entscheidungen werden übernommen, sonst erhält das LLM einen
+    Wiederholungs-Hinweis für §5. Mit prescore entscheidet der gelernte
+    Vorfilter Postings mit sehr niedrigem oder sehr hohem Risiko-Score ohne
+    LLM (shadow_local gilt auch hier). Mit on_update wird die Moderation
+    gestreamt; der Callback erhält Entscheidung und Konfidenz, sobald sie
+    feststehen, und läuft immer im aufrufenden Thread.
+    """
+    if rules_text is None:
+        rules_text = format_rules_for_prompt()
+
+    stage_times = {}
+    start_time = time.time()
+    match, duplicate_result = _duplicate_step(posting, article_url, rules_text, stage_times, duplicate_check)
+    note = repetition_note(match)
+    local, decided_locally = _local_step(posting, stage_times, local_min_confidence)
+    question_analysis = _local_question_step(posting, stage_times, question_local_min_confidence)
+    scored, decided_by_prescore = _prescore_step(
+        posting, stage_times, prescore and duplicate_result is None and not decided_locally
+    )
+
+    need_moderation = duplicate_result is None and (
+        not (decided_locally or decided_by_prescore) or shadow_local
+    )
+    need_question = question_analysis is None
+    result = None
+
+    if need_moderation and need_question:
+        if mode == 'combined':
+            result, question_analysis = _timed(
+                stage_times, 'combined', analyze_posting_combined,
+                posting, article_title, article_content, api_key, model, rules_text, note, on_update
+            )
+        elif mode == 'concurrent':
+            # Fragen-Analyse im Hintergrund, Moderation im aufrufenden Thread (für on_update)
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                question_future = executor.submit(
+                    _timed, stage_times, 'question_analysis', detect_question_or_reaction_expectation,
+                    posting, article_title, article_content, api_key, model
+                )
+                result = _timed(
+                    stage_times, 'moderation', analyze_posting_with_llm,
+                    posting, article_title, article_content, api_key, model, rules_text, note, on_update
+                )
+                question_analysis = question_future.result()
+        else:
+            result = _timed(
+                stage_times, 'moderation', analyze_posting_with_llm,
+                posting, article_title, article_content, api_key, model, rules_text, note, on_update
+            )
+            question_analysis = _timed(
+                stage_times, 'question_analysis', detect_question_or_reaction_expectation,
+                posting, article_title, article_content, api_key, model
+            )
+    elif need_moderation:
+        result = _timed(
+            stage_times, 'moderation', analyze_posting_with_llm,
+            posting, article_title, article_content, api_key, model, rules_text, note, on_update
+        )
+    elif need_question:
+        question_analysis = _timed(
+            stage_times, 'question_analysis', detect_question_or_reaction_expectation,
+            posting, article_title, article_content, api_key, model
+        )
+
+    if duplicate_result is not None:
+        result = duplicate_result
+    elif need_moderation:
+        result = _merge_prescore(scored, decided_by_prescore, _merge_local_and_llm(local, decided_locally, result))
+    elif decided_by_prescore:
+        result = _merge_prescore(scored, True, None)
+    else:
+        get_preclassifier_stats().record(True)
+        result = local_moderation_result(local)
+
+    _record_duplicate(posting, article_url, result, rules_text, match)
+    result = _finalize_analysis(result, question_analysis, mode, start_time, stage_times, rules_text)
+    result['prompt_tokens'] = _prompt_tokens_for(
+        need_moderation, need_question, mode, posting, article_title, article_content, rules_text
+    )
+    return result
+
+async def run_analysis_async(
+    posting: str,
+    article_title: str,
+    article_content: str,
+    client: AsyncGroq,
+    model: str,
+    mode: str = 'sequential',
+    rules_text: str = None,
+    local_min_confidence: int = None,
+    shadow_local: bool = False,
+    question_local_min_confidence: float = None,
+    article_url: str = None,
+    duplicate_check: bool = False,
+    early_stop: bool = False,
+    prescore: bool = False
+) -> Dict:
+    """Async-Gegenstück zu run_analysis für den Bulk-Modus.
+
+    early_stop bricht reine Moderations-Aufrufe ab, sobald die Pflichtfelder
+    feststehen (im kombinierten Modus steht die Begründung vor den
+    Fragen-Feldern, dort wird nicht abgebrochen). Unentschiedene Postings
+    reihen sich mit prescore nach ihrem Risiko in die LLM-Warteschlange ein.
+    """
+    if rules_text is None:
+        rules_text = format_rules_for_prompt()
+
+    stage_times = {}
+    start_time = time.time()
+    match, duplicate_result = _duplicate_step(posting, article_url, rules_text, stage_times, duplicate_check)
+    note = repetition_note(match)
+    local, decided_locally = _local_step(posting, stage_times, local_min_confidence)
+    question_analysis = _local_question_step(posting, stage_times, question_local_min_confidence)
+    scored, decided_by_prescore = _prescore_step(
+        posting, stage_times, prescore and duplicate_result is None and not decided_locally
+    )
+
+    need_moderation = duplicate_result is None and (
+        not (decided_locally or decided_by_prescore) or shadow_local
+    )
+    need_question = question_analysis is None
+    result = None
+    if scored is not None and not decided_by_prescore:
+        # Riskante Postings früher an die Reihe (innerhalb der Spur)
+        llm_urgency.set(scored['urgency'])
+
+    if need_moderation and need_question:
+        if mode == 'combined':
+            result, question_analysis = await _timed_async(
+                stage_times, 'combined',
+                analyze_posting_combined_async(posting, article_title, article_content, client, model, rules_text, note)
+            )
+        elif mode == 'concurrent':
+            result, question_analysis = await asyncio.gather(
+                _timed_async(
+                    stage_times, 'moderation',
+                    analyze_posting_with_llm_async(posting, article_title, article_content, client, model, rules_text, note, early_stop)
+                ),
+                _timed_async(
+                    stage_times, 'question_analysis',
+                    detect_question_or_reaction_expectation_async(posting, article_title, article_content, client, model)
+                )
+            )
+        else:
+            result = await _timed_async(
+                stage_times, 'moderation',
+                analyze_posting_with_llm_async(posting, article_title, article_content, client, model, rules_text, note, early_stop)
+            )
+            question_analysis = await _timed_async(
+                stage_times, 'question_analysis',
+                detect_question_or_reaction_expectation_async(posting, article_title, article_content, client, model)
+            )
+    elif need_moderation:
+        result = await _timed_async(
+            stage_times, 'moderation',
+            analyze_posting_with_llm_async(posting, article_title, article_content, client, model, rules_text, note, early_stop)
+        )
+    elif need_question:
+        question_analysis = await _timed_async(
+            stage_times, 'question_analysis',
+            detect_question_or_reaction_expectation_async(posting, article_title, article_content, client, model)
+        )
+
+    if duplicate_result is not None:
+        result = duplicate_result
+    elif need_moderation:
+        result = _merge_prescore(scored, decided_by_prescore, _merge_local_and_llm(local, decided_locally, result))
+    elif decided_by_prescore:
+        result = _merge_prescore(scored, True, None)
+    else:
+        get_preclassifier_stats().record(True)
+        result = local_moderation_result(local)
+
+    _record_duplicate(posting, article_url, result, rules_text, match)
+    result = _finalize_analysis(result, question_analysis, mode, start_time, stage_times, rules_text)
+    result['prompt_tokens'] = _prompt_tokens_for(
+        need_moderation, need_question, mode, posting, article_title, article_content, rules_text
+    )
+    if result.get('packed'):
+        # Nur der Anteil am gepackten Prompt statt eines eigenen Moderations-Prompts
+        result['prompt_tokens'] += result['packed']['prompt_tokens'] - estimate_tokens(
+            build_moderation_prompt(posting, article_title, article_content, rules_text)
+        )
+    return result
+
+def format_stage_times(result: Dict) -> str:
+    """Kurze Textdarstellung der Zeitaufschlüsselung pro Stufe"""
+    labels = {
+        'local': 'Lokal',
+        'local_question': 'Fragen lokal',
+        'duplicate': 'Duplikate',
+        'prescore': 'Vorfilter',
+        'moderation': 'Moderation',
+        'question_analysis': 'Fragen',
+        'combined': 'Kombiniert'
+    }
+    return " · ".join(
+        f"{labels.get(stage, stage)}: {seconds:.2f}s"
+        for stage, seconds in result.get('stage_times', {}).items()
+    )
+
+# ====================================
+# BULK-MODERATION
+# ====================================
+
+BULK_RESULTS_DIR = os.getenv("BULK_RESULTS_DIR", "bulk_results")
+BULK_DEFAULT_CONCURRENCY = 8
+BULK_POSTING_COLUMNS = ('posting', 'text', 'content', 'kommentar')
+
+def load_bulk_postings(raw: str, filename: str) -> List[Dict]:
+    """Liest Postings aus CSV oder JSONL (Spalte/Feld 'posting', 'text', ...)"""
+    items = []
+
+    if filename.lower().endswith(('.jsonl', '.ndjson')):
+        for line_no, line in enumerate(raw.splitlines(), start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {'posting': record}
+            text = next((record[c] for c in BULK_POSTING_COLUMNS if record.get(c)), None)
+            if text:
+                items.append({
+                    'posting_id': str(record.get('id', record.get('posting_id', line_no))),
+                    'posting': str(text)
+                })
+    else:
+        df = pd.read_csv(io.StringIO(raw), dtype=str).fillna('')
+        columns = {c.lower(): c for c in df.columns}
+        text_col = next((columns[c] for c in BULK_POSTING_COLUMNS if c in columns), df.columns[0])
+        id_col = columns.get('id') or columns.get('posting_id')
+        for row_no, row in enumerate(df.to_dict('records'), start=1):
+            if row[text_col].strip():
+                items.append({
+                    'posting_id': str(row[id_col]) if id_col else str(row_no),
+                    'posting': row[text_col]
+                })
+
+    return items
+
+def serialize_result(result: Dict) -> Dict:
+    """JSON-taugliche Kopie eines Analyse-Ergebnisses (Timestamp als ISO-String)"""
+    record = dict(result)
+    if isinstance(record.get('timestamp'), datetime):
+        record['timestamp'] = record['timestamp'].isoformat()
+    return record
+
+async def moderate_bulk_item(
+    item: Dict,
+    article: Dict,
+    context: Dict,
+    client: AsyncGroq,
+    model: str,
+    mode: str,
+    rules_text: str,
+    semaphore: asyncio.Semaphore,
+    analysis_options: Dict
+) -> Dict:
+    """Moderiert ein einzelnes Posting (Bulk-Lauf, HTTP-Service) innerhalb des Concurrency-Limits"""
+    async with semaphore:
+        if context['method'] == 'retrieval':
+            context = build_article_context(
+                article, context['budget'], 'retrieval', posting=item['posting'], top_k=context['top_k']
+            )
+
+        result = await run_analysis_async(
+            item['posting'],
+            article['title'],
+            context['text'],
+            client,
+            model,
+            mode,
+            rules_text,
+            **analysis_options
+        )
+
+        result['posting_id'] = item['posting_id']
+        result['posting'] = item['posting']
+        result['article_url'] = article.get('url')
+        result['context_stats'] = context_stats(context)
+        result['timestamp'] = datetime.now()
+        return result
+
+async def moderate_postings_bulk(
+    items: List[Dict],
+    article: Dict,
+    api_key: str,
+    model: str,
+    concurrency: int,
+    output_path: str,
+    rules_text: str,
+    on_result: Callable[[int, int, Dict], None] = None,
+    mode: str = 'sequential',
+    context: Dict = None,
+    analysis_options: Dict = None,
+    pack: bool = False
+) -> List[Dict]:
+    """Moderiert viele Postings parallel und schreibt jedes Ergebnis sofort als JSONL-Zeile.
+
+    Muss auf dem Loop des Client-Pools laufen (get_client_pool().run/submit).
+    context ist der einmal pro Lauf erzeugte Artikel-Kontext (build_article_context),
+    analysis_options werden an run_analysis_async durchgereicht. Mit pack werden
+    die Moderations-Aufrufe gebündelt (PromptPacker); concurrency begrenzt dann
+    die gleichzeitigen LLM-Aufrufe statt der Postings. Jedes Ergebnis landet
+    zusätzlich in der persistenten Historie.
+    """
+    if context is None:
+        context = build_article_context(article, budget=0)
+    llm_priority.set('bulk')  # gilt für alle Tasks dieses Laufs
+    client = get_client_pool().get_async_client(api_key)
+    if pack:
+        active_packer.set(PromptPacker(concurrency))
+        # Genug Postings gleichzeitig in Arbeit, damit volle Pakete entstehen
+        semaphore = asyncio.Semaphore(max(1, concurrency) * PACK_MAX_POSTINGS)
+    else:
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = []
+
+    with open(output_path, 'a', encoding='utf-8') as out:
+        tasks = [
+            asyncio.create_task(moderate_bulk_item(
+                item, article, context, client, model, mode, rules_text, semaphore, analysis_options or {}
+            ))
+            for item in items
+        ]
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            out.write(json.dumps(serialize_result(result), ensure_ascii=False) + '\n')
+            out.flush()
+            get_history_store().record(result)
+            results.append(result)
+            if on_result:
+                on_result(len(results), len(items), result)
+
+    return results
+
+def new_bulk_output_path() -> str:
+    """Erzeugt einen neuen Dateipfad für Bulk-Ergebnisse"""
+    os.makedirs(BULK_RESULTS_DIR, exist_ok=True)
+    return os.path.join(BULK_RESULTS_DIR, f"bulk_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+
+# ====================================
+# NACH-MODERATION BEI REGELÄNDERUNGEN
+# ====================================
+
+# Nach einer Regeländerung werden nur Entscheidungen erneut geprüft, die
+# plausibel umschlagen können:
+# - violated:   gelöscht wegen einer entfernten oder geänderten Regel
+# - mentioned:  freigeschaltet, die Begründung erwähnt eine neue oder geänderte Regel
+# - borderline: knapp freigeschaltet, während Regeln hinzukommen oder sich ändern
+REMODERATION_REASONS = ('violated', 'mentioned', 'borderline')
+REMODERATION_NEAR_CONFIDENCE = int(os.getenv("REMODERATION_NEAR_CONFIDENCE", "80"))
+REMODERATION_DEFAULT_CONCURRENCY = 4
+
+def _mentions_rule(text: str, key: str) -> bool:
+    if key.startswith('§'):
+        return re.search(rf'§\s*{key[1:]}(?!\d)', text) is not None
+    return key in text.upper()
+
+def remoderation_reason(
+    decision: Dict, diff: Dict[str, List[str]], near_confidence: int = REMODERATION_NEAR_CONFIDENCE
+) -> str:
+    """Grund, aus dem eine Entscheidung nach der Regeländerung neu geprüft wird, oder None"""
+    if decision['decision'] == 'LÖSCHEN':
+        touched = set(diff['changed']) | set(diff['removed'])
+        return 'violated' if {rule_key(rule) for rule in decision['violated_rules']} & touched else None
+    tightened = diff['added'] + diff['changed']
+    if any(_mentions_rule(decision['explanation'], key) for key in tightened):
+        return 'mentioned'
+    if tightened and (decision['confidence'] or 0) < near_confidence:
+        return 'borderline'
+    return None
+
+def plan_remoderation(
+    old_version: str,
+    new_rule_set: RuleSet,
+    near_confidence: int = REMODERATION_NEAR_CONFIDENCE,
+    limit: int = None
+) -> Dict:
+    """Vergleicht zwei Regelwerk-Versionen und wählt die betroffenen Entscheidungen aus (ohne LLM-Aufrufe).
+
+    Betrachtet wird je Posting und Artikel die jüngste Entscheidung unter
+    old_version. Bei limit gehen Löschungen wegen geänderter Regeln vor.
+    """
+    history_store = get_history_store()
+    history_store.flush()
+    old_rule_set = history_store.load_rule_set(old_version)
+    if old_rule_set is None:
+        raise ValueError(f"Regelwerk-Version {old_version} ist nicht bekannt")
+    diff = diff_rule_sets(old_rule_set, new_rule_set)
+    decisions = history_store.latest_decisions(old_version)
+
+    candidates = []
+    for decision in decisions:
+        reason = remoderation_reason(decision, diff, near_confidence)
+        if reason:
+            candidates.append(dict(decision, reason=reason))
+    candidates.sort(key=lambda c: REMODERATION_REASONS.index(c['reason']))
+
+    return {
+        'old_version': old_version,
+        'new_version': new_rule_set.version,
+        'diff': diff,
+        'decisions': len(decisions),
+        'by_reason': dict(Counter(c['reason'] for c in candidates)),
+        'candidates': candidates[:limit] if limit else candidates
+    }
+
+async def remoderate_history(
+    plan: Dict,
+    new_rule_set: RuleSet,
+    api_key: str,
+    model: str,
+    concurrency: int = REMODERATION_DEFAULT_CONCURRENCY,
+    mode: str = 'sequential',
+    on_result: Callable[[int, int, Dict], None] = None
+) -> Dict:
+    """Moderiert die Kandidaten eines Plans mit dem neuen Regelwerk und meldet umgeschlagene Entscheidungen.
+
+    Muss auf dem Loop des Client-Pools laufen (get_client_pool().submit) und
+    nutzt die Bulk-Spur des Schedulers. Lokale Vorklassifizierung und
+    Duplikat-Index bleiben aus, weil beide die Regeln nicht kennen. Die neuen
+    Ergebnisse landen mit der neuen Version und remoderation_of (ID der alten
+    Entscheidung) in der Historie; Postings ohne ladbaren Artikel werden übersprungen.
+    """
+    llm_priority.set('bulk')
+    start_time = time.time()
+    candidates = plan['candidates']
+    urls = [c['article_url'] for c in candidates if c['article_url']]
+    articles = await get_article_fetcher().fetch_many_async(urls) if urls else {}
+    contexts = {url: build_article_context(article) for url, article in articles.items() if article['success']}
+    client = get_client_pool().get_async_client(api_key)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def remoderate(candidate: Dict) -> Tuple[Dict, Dict]:
+        url = candidate['article_url']
+        if url not in contexts:
+            return candidate, None
+        result = await moderate_bulk_item(
+            {'posting_id': str(candidate['history_id']), 'posting': candidate['posting']},
+            articles[url], contexts[url], client, model, mode, new_rule_set.text, semaphore,
+            {'question_local_min_confidence': QUESTION_LOCAL_DEFAULT_MIN_CONFIDENCE, 'article_url': url}
+        )
+        result['remoderation_of'] = candidate['history_id']
+        return candidate, result
+
+    rows = []
+    for finished in asyncio.as_completed([asyncio.create_task(remoderate(c)) for c in candidates]):
+        candidate, result = await finished
+        if result is None:
+            outcome = 'skipped'
+        elif result['decision'] == 'ERROR':
+            outcome = 'error'
+        else:
+            outcome = 'flipped' if result['decision'] != candidate['decision'] else 'unchanged'
+        if result is not None:
+            get_history_store().record(result)
+        get_metrics().incr('remoderation_postings_total', outcome=outcome, reason=candidate['reason'])
+        rows.append({
+            'history_id': candidate['history_id'],
+            'posting': candidate['posting'],
+            'article_url': candidate['article_url'],
+            'reason': candidate['reason'],
+            'outcome': outcome,
+            'old_decision': candidate['decision'],
+            'old_confidence': candidate['confidence'],
+            'old_rules': candidate['violated_rules'],
+            'new_decision': result['decision'] if result else None,
+            'new_confidence': result.get('confidence') if result else None,
+            'new_rules': result.get('violated_rules', []) if result else [],
+            'explanation': result.get('explanation', '') if result else ''
+        })
+        if on_result:
+            on_result(len(rows), len(candidates), rows[-1])
+
+    return {
+        'old_version': plan['old_version'],
+        'new_version': plan['new_version'],
+        'diff': plan['diff'],
+        'decisions': plan['decisions'],
+        'candidates': len(candidates),
+        'outcomes': dict(Counter(row['outcome'] for row in rows)),
+        'flipped': [row for row in rows if row['outcome'] == 'flipped'],
+        'rows': rows,
+        'duration': time.time() - start_time
+    }
+
+def format_rule_diff(diff: Dict[str, List[str]]) -> str:
+    parts = [
+        f"{label}: {', '.join(diff[key])}"
+        for key, label in (('added', 'neu'), ('changed', 'geändert'), ('removed', 'entfernt')) if diff[key]
+    ]
+    return " · ".join(parts) or "keine Änderungen an einzelnen Regeln"
+
+def run_remoderation_cli(argv: List[str] = None) -> int:
+    """Nach-Moderation: python moderation_engine.py remoderate --from <version> [--rules neue_regeln.json]"""
+    parser = argparse.ArgumentParser(
+        prog="moderation_engine.py remoderate",
+        description="Betroffene Entscheidungen der Historie nach einer Regeländerung neu moderieren"
+    )
+    parser.add_argument("--from", dest="old_version", required=True, help="Bisherige Regelwerk-Version (siehe Historie)")
+    parser.add_argument("--rules", help="JSON-Datei mit den neuen Forenregeln (Standard: DEFAULT_FORUM_RULES)")
+    parser.add_argument("--model", default="llama3-8b-8192", help="Modell oder 'cascade' für die Modell-Kaskade")
+    parser.add_argument("--concurrency", type=int, default=REMODERATION_DEFAULT_CONCURRENCY)
+    parser.add_argument("--mode", choices=list(ANALYSIS_MODES), default='sequential', help="Analyse-Modus pro Posting")
+    parser.add_argument("--near-confidence", type=int, default=REMODERATION_NEAR_CONFIDENCE, help="Freischaltungen unter dieser Konfidenz gelten als knapp")
+    parser.add_argument("--limit", type=int, help="Höchstens so viele Postings neu moderieren")
+    parser.add_argument("--dry-run", action="store_true", help="Nur die Auswahl anzeigen, nichts neu moderieren")
+    parser.add_argument("--output", help="Bericht als JSON in diese Datei schreiben")
+    args = parser.parse_args(argv)
+
+    new_rule_set = build_rule_set()
+    if args.rules:
+        with open(args.rules, encoding='utf-8') as f:
+            new_rule_set = build_rule_set(json.load(f), 'import')
+    try:
+        plan = plan_remoderation(args.old_version, new_rule_set, args.near_confidence, args.limit)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    print(f"{plan['old_version']} -> {plan['new_version']}: {format_rule_diff(plan['diff'])}", file=sys.stderr)
+    print(
+        f"{len(plan['candidates'])} von {plan['decisions']} Entscheidungen betroffen "
+        f"({', '.join(f'{count} {reason}' for reason, count in plan['by_reason'].items()) or 'keine'})",
+        file=sys.stderr
+    )
+    if args.dry_run or not plan['candidates']:
+        return 0
+
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        print("GROQ_API_KEY ist nicht gesetzt.", file=sys.stderr)
+        return 2
+
+    def report(done: int, total: int, row: Dict):
+        if row['outcome'] == 'flipped':
+            print(f"[{done}/{total}] {row['old_decision']} -> {row['new_decision']}  {row['posting'][:60]}", file=sys.stderr)
+
+    result = get_client_pool().run(remoderate_history(
+        plan, new_rule_set, api_key, args.model, args.concurrency, args.mode, report
+    ))
+    get_history_store().flush()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    outcomes = result['outcomes']
+    print(
+        f"{result['candidates']} Postings neu moderiert in {result['duration']:.1f}s: "
+        f"{outcomes.get('flipped', 0)} umgeschlagen, {outcomes.get('unchanged', 0)} unverändert, "
+        f"{outcomes.get('error', 0)} Fehler, {outcomes.get('skipped', 0)} ohne Artikel übersprungen"
+    )
+    return 0
+
+def run_bulk_cli(argv: List[str] = None) -> int:
+    """Headless Bulk-Moderation: python moderation_engine.py --input postings.csv --url <artikel>"""
+    parser = argparse.ArgumentParser(description="DER STANDARD Bulk-Moderation ohne UI")
+    parser.add_argument("--input", required=True, help="CSV- oder JSONL-Datei mit Postings")
+    parser.add_argument("--url", required=True, help="DER STANDARD Artikel URL")
+    parser.add_argument("--output", help="JSONL-Ausgabedatei (Standard: bulk_results/bulk_<zeit>.jsonl)")
+    parser.add_argument("--model", default="llama3-8b-8192", help="Modell oder 'cascade' für die Modell-Kaskade")
+    parser.add_argument("--concurrency", type=int, default=BULK_DEFAULT_CONCURRENCY)
+    parser.add_argument("--mode", choices=list(ANALYSIS_MODES), default='sequential', help="Analyse-Modus pro Posting")
+    parser.add_argument("--rules", help="JSON-Datei mit Forenregeln (Standard: DEFAULT_FORUM_RULES)")
+    parser.add_argument("--context-budget", type=int, default=CONTEXT_DEFAULT_TOKEN_BUDGET, help="Token-Budget für den Artikel-Kontext (0 = unbegrenzt)")
+    parser.add_argument("--context-method", choices=list(CONTEXT_METHODS), default='extractive')
+    parser.add_argument("--local-min-confidence", type=int, default=LOCAL_DEFAULT_MIN_CONFIDENCE, help="Mindest-Konfidenz für lokale Entscheidungen")
+    parser.add_argument("--no-local", action="store_true", help="Lokale Vorklassifizierung deaktivieren")
+    parser.add_argument("--question-local-min-confidence", type=float, default=QUESTION_LOCAL_DEFAULT_MIN_CONFIDENCE, help="Mindest-Konfidenz (0-1) der lokalen Fragen-Erkennung")
+    parser.add_argument("--no-local-questions", action="store_true", help="Fragen-Analyse immer per LLM")
+    parser.add_argument("--early-stop", action="store_true", help="Generierung nach Entscheidung/Konfidenz/Regeln abbrechen (ohne Begründung)")
+    parser.add_argument("--pack", action="store_true", help="Mehrere Postings pro Moderations-Prompt bündeln (nicht im Modus combined)")
+    parser.add_argument("--no-duplicates", action="store_true", help="Duplikat-Erkennung (§5) deaktivieren")
+    parser.add_argument("--prescore", action="store_true", help="Gelernten Vorfilter nutzen (siehe train-prescorer)")
+    parser.add_argument("--metrics-out", help="Metriken nach dem Lauf im Prometheus-Textformat in diese Datei schreiben")
+    parser.add_argument("--top-k", type=int, default=RETRIEVAL_DEFAULT_TOP_K, help="Absätze pro Posting bei --context-method retrieval")
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        print("GROQ_API_KEY ist nicht gesetzt.", file=sys.stderr)
+        return 2
+
+    with open(args.input, encoding='utf-8-sig') as f:
+        items = load_bulk_postings(f.read(), args.input)
+
+    article = fetch_article(args.url)
+    if not article['success']:
+        print(article['content'], file=sys.stderr)
+        return 1
+
+    rule_set = build_rule_set()
+    if args.rules:
+        with open(args.rules, encoding='utf-8') as f:
+            rule_set = build_rule_set(json.load(f), 'import')
+    rules_text = rule_set.text
+
+    output_path = args.output or new_bulk_output_path()
+    context = build_article_context(
+        article, args.context_budget, args.context_method, api_key, args.model, top_k=args.top_k
+    )
+
+    def report(done: int, total: int, result: Dict):
+        print(f"[{done}/{total}] {result['decision']:<12} {result['posting'][:60]}", file=sys.stderr)
+
+    results = get_client_pool().run(moderate_postings_bulk(
+        items, article, api_key, args.model, args.concurrency, output_path, rules_text, report, args.mode, context,
+        {
+            'local_min_confidence': None if args.no_local else args.local_min_confidence,
+            'question_local_min_confidence': None if args.no_local_questions else args.question_local_min_confidence,
+            'article_url': article.get('url'),
+            'duplicate_check': not args.no_duplicates,
+            'early_stop': args.early_stop,
+            'prescore': args.prescore
+        },
+        args.pack
+    ))
+
+    get_history_store().flush()
+    get_duplicate_index().flush()
+    if args.metrics_out:
+        with open(args.metrics_out, 'w', encoding='utf-8') as f:
+            f.write(get_metrics().prometheus_text())
+    deleted = sum(1 for r in results if r['decision'] == 'LÖSCHEN')
+    errors = sum(1 for r in results if r['decision'] == 'ERROR')
+    local = sum(1 for r in results if r.get('source') == 'local')
+    duplicates = sum(1 for r in results if r.get('source') == 'duplicate')
+    prescored = sum(1 for r in results if r.get('source') == 'prescorer')
+    print(
+        f"{len(results)} Postings moderiert ({deleted} gelöscht, {errors} Fehler, {local} lokal entschieden, "
+        f"{prescored} vom Vorfilter entschieden, {duplicates} als Duplikat übernommen) -> {output_path}"
+    )
+    if args.model == CASCADE_MODEL:
+        print(format_cascade_stats(get_cascade_stats().stats()))
+    return 0
+
+def format_prescorer_info(info: Dict) -> str:
+    """Kurzbericht über Training und kalibrierte Schwellen des Vorfilters"""
+    def share(value):
+        return f"{value:.1%}" if value is not None else "–"
+
+    def threshold(value):
+        return f"{value:.3f}" if value is not None else "aus"
+
+    return "\n".join([
+        f"{info['examples']} LLM-Entscheidungen ({share(info['deleted_share'])} gelöscht), "
+        f"{info['holdout']} zurückgehalten, trainiert in {info['train_seconds']:.1f}s",
+        f"Holdout: Genauigkeit {share(info['holdout_accuracy'])}, AUC {info['holdout_auc'] if info['holdout_auc'] is not None else float('nan'):.3f}",
+        f"Auto-Freigabe bis Risiko {threshold(info['approve_max'])}: {share(info['auto_approve_share'])} der Postings, "
+        f"Übereinstimmung {share(info['auto_approve_agreement'])}",
+        f"Auto-Löschung ab Risiko {threshold(info['delete_min'])}: {share(info['auto_delete_share'])} der Postings, "
+        f"Übereinstimmung samt Regel {share(info['auto_delete_agreement'])} "
+        f"(vorhergesagte Regeln: {', '.join(info['rules']) or 'keine'})",
+        f"Bewertung: {info['scoring_per_s'] or 0:,.0f} Postings/s (Ziel-Übereinstimmung {share(info['target_agreement'])})"
+    ])
+
+def run_prescorer_training_cli(argv: List[str] = None) -> int:
+    """Trainiert den Vorfilter: python moderation_engine.py train-prescorer [--input export.json]"""
+    parser = argparse.ArgumentParser(description="Gelernten Vorfilter aus LLM-Entscheidungen trainieren")
+    parser.add_argument("--input", help="Historie-Export (JSON) oder Bulk-Ergebnisse (JSONL); Standard: Historie")
+    parser.add_argument("--target-agreement", type=float, default=PRESCORER_TARGET_AGREEMENT, help="Mindest-Übereinstimmung mit dem LLM in den Auto-Bereichen (0-1)")
+    parser.add_argument("--min-support", type=int, default=PRESCORER_MIN_SUPPORT, help="Mindestzahl Holdout-Postings je Auto-Bereich")
+    parser.add_argument("--epochs", type=int, default=PRESCORER_EPOCHS)
+    args = parser.parse_args(argv)
+
+    examples = load_training_examples(args.input) if args.input else get_history_store().training_examples()
+    try:
+        info = get_prescorer().train(examples, args.target_agreement, args.min_support, args.epochs)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    print(format_prescorer_info(info))
+    print(f"Gespeichert: {get_prescorer().path}")
+    return 0
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['remoderate']:
+        sys.exit(run_remoderation_cli(sys.argv[2:]))
+    if sys.argv[1:2] == ['train-prescorer']:
+        sys.exit(run_prescorer_training_cli(sys.argv[2:]))
+    sys.exit(run_bulk_cli())
@@ -0,0 +1,541 @@
+"""
+HTTP-Service für die Moderations-Engine (ASGI, Starlette).
+
+Anfragen landen in einer internen Warteschlange. Diese sammelt sie zu kleinen
+Batches, fasst identische Postings zusammen, lädt die Artikel eines Batches
+gemeinsam und moderiert dann mit begrenzter Parallelität auf dem Event-Loop
+des Client-Pools. Ist die Warteschlange voll, antwortet der Service mit 429;
+ohne API Key oder beim Herunterfahren mit 503.
+
+    uvicorn moderation_service:app --port 8000
+    python moderation_service.py --port 8000
+
+    POST /moderate        {"posting": "...", "article_url": "https://www.derstandard.at/story/..."}
+    POST /moderate/batch  {"article_url": "...", "items": [{"posting_id": "1", "posting": "..."}]}
+    GET  /health          Status der Warteschlange
+    GET  /metrics         Prometheus-Textformat
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from moderation_engine import (
+    ANALYSIS_MODES, CONTEXT_DEFAULT_TOKEN_BUDGET, CONTEXT_METHODS, LOCAL_DEFAULT_MIN_CONFIDENCE,
+    PACK_MAX_POSTINGS, QUESTION_LOCAL_DEFAULT_MIN_CONFIDENCE, RETRIEVAL_DEFAULT_TOP_K, PromptPacker,
+    active_packer, build_article_context, build_rule_set, content_hash, format_rules_for_prompt, get_article_fetcher,
+    get_client_pool, get_duplicate_index, get_history_store, get_metrics, llm_priority, make_cache_key, moderate_bulk_item,
+    moderation_error_result, serialize_result
+)
+
+# ====================================
+# KONFIGURATION
+# ====================================
+
+SERVICE_QUEUE_MAX = int(os.getenv("SERVICE_QUEUE_MAX", "1000"))  # wartende + laufende Postings
+SERVICE_BATCH_SIZE = int(os.getenv("SERVICE_BATCH_SIZE", "32"))
+SERVICE_BATCH_WAIT = float(os.getenv("SERVICE_BATCH_WAIT_MS", "20")) / 1000
+SERVICE_CONCURRENCY = int(os.getenv("SERVICE_CONCURRENCY", "16"))  # gleichzeitige Analysen
+SERVICE_REQUEST_TIMEOUT = float(os.getenv("SERVICE_REQUEST_TIMEOUT", "120"))
+SERVICE_MAX_BATCH_ITEMS = int(os.getenv("SERVICE_MAX_BATCH_ITEMS", "500"))
+SERVICE_DEFAULT_MODEL = os.getenv("MODERATION_MODEL", "llama3-8b-8192")
+SERVICE_PACK_PROMPTS = os.getenv("SERVICE_PACK_PROMPTS", "0") == "1"  # Bulk-Spur: mehrere Postings pro Prompt
+SERVICE_PRESCORE = os.getenv("SERVICE_PRESCORE", "0") == "1"  # gelernter Vorfilter (train-prescorer)
+SERVICE_RETRY_AFTER = 1  # Sekunden, für 429/503
+
+class QueueFull(Exception):
+    """Warteschlange ausgelastet (429)"""
+
+class QueueClosed(Exception):
+    """Service fährt herunter (503)"""
+
+class ArticleUnavailable(Exception):
+    """Artikel konnte nicht geladen werden (502)"""
+
+# ====================================
+# ANFRAGEN
+# ====================================
+
+def _number(data: Dict, name: str, default, minimum: float, maximum: float = None, integer: bool = True,
+            nullable: bool = False):
+    """Liest ein Zahlenfeld; falscher Typ oder Bereich ergibt ValueError (400)"""
+    value = data.get(name, default)
+    if value is None and nullable:
+        return None
+    kinds = (int,) if integer else (int, float)
+    if isinstance(value, bool) or not isinstance(value, kinds):
+        raise ValueError(f"'{name}' muss eine {'ganze ' if integer else ''}Zahl sein{' oder null' if nullable else ''}")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ValueError(f"'{name}' muss zwischen {minimum} und {maximum if maximum is not None else '∞'} liegen")
+    return value
+
+def _flag(data: Dict, name: str, default: bool) -> bool:
+    value = data.get(name, default)
+    if not isinstance(value, bool):
+        raise ValueError(f"'{name}' muss true oder false sein")
+    return value
+
+def parse_job(data: Dict) -> Dict:
+    """Prüft ein Posting aus dem Request-Body und ergänzt die Standardwerte"""
+    if not isinstance(data, dict):
+        raise ValueError("Erwartet ein JSON-Objekt")
+    posting = data.get('posting')
+    if not isinstance(posting, str) or not posting.strip():
+        raise ValueError("'posting' fehlt oder ist leer")
+
+    article = data.get('article')
+    article_url = data.get('article_url')
+    if article is not None:
+        if not isinstance(article, dict) or not isinstance(article.get('content'), str):
+            raise ValueError("'article' braucht mindestens 'content' (und optional 'title')")
+        article = {'title': str(article.get('title', '')), 'content': article['content']}
+    elif not isinstance(article_url, str) or not article_url.strip():
+        raise ValueError("'article_url' oder 'article' ist erforderlich")
+
+    mode = data.get('mode', 'sequential')
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unbekannter Modus '{mode}' (erlaubt: {', '.join(ANALYSIS_MODES)})")
+    context_method = data.get('context_method', 'extractive')
+    if context_method not in CONTEXT_METHODS:
+        raise ValueError(f"Unbekannte Kontext-Methode '{context_method}' (erlaubt: {', '.join(CONTEXT_METHODS)})")
+
+    rules = data.get('rules')
+    if rules is not None and not (
+        isinstance(rules, dict) and all(isinstance(k, str) and isinstance(v, str) for k, v in rules.items())
+    ):
+        raise ValueError("'rules' muss ein Objekt {Regel: Beschreibung} sein")
+    model = data.get('model')
+    if model is not None and not isinstance(model, str):
+        raise ValueError("'model' muss ein String sein")
+
+    options = {
+        'local_min_confidence': _number(data, 'local_min_confidence', LOCAL_DEFAULT_MIN_CONFIDENCE, 0, 100, nullable=True),
+        'question_local_min_confidence': _number(
+            data, 'question_local_min_confidence', QUESTION_LOCAL_DEFAULT_MIN_CONFIDENCE, 0, 1, integer=False, nullable=True
+        ),
+        'duplicate_check': _flag(data, 'duplicate_check', True),
+        'early_stop': _flag(data, 'early_stop', False),
+        'prescore': _flag(data, 'prescore', SERVICE_PRESCORE),
+        'article_url': article_url
+    }
+    job = {
+        'posting_id': str(data.get('posting_id', data.get('id', ''))),
+        'posting': posting,
+        'article': article,
+        'article_url': article_url,
+        'mode': mode,
+        'model': model or SERVICE_DEFAULT_MODEL,
+        'rules_text': build_rule_set(rules, 'service').text if rules is not None else format_rules_for_prompt(),
+        'context_budget': _number(data, 'context_budget', CONTEXT_DEFAULT_TOKEN_BUDGET, 0),
+        'context_method': context_method,
+        'top_k': _number(data, 'top_k', RETRIEVAL_DEFAULT_TOP_K, 1, 50),
+        'options': options,
+        'priority': 'interactive'
+    }
+
+    # Identische Postings (normalisiert) mit gleichem Artikel und gleicher Konfiguration
+    # werden nur einmal moderiert
+    article_ref = article_url if article is None else content_hash(article['title'] + '\n' + article['content'])
+    settings = json.dumps(
+        {k: job[k] for k in ('context_budget', 'context_method', 'top_k')} | options, sort_keys=True
+    )
+    job['key'] = make_cache_key(f"service:{mode}", posting, article_ref, job['model'], job['rules_text'] + settings)
+    return job
+
+# ====================================
+# WARTESCHLANGE MIT MICRO-BATCHING
+# ====================================
+
+class ModerationQueue:
+    """Begrenzte Warteschlange vor der Engine.
+
+    submit_many() ist thread-sicher und liefert pro Posting ein
+    concurrent.futures.Future. Identische Postings, die gerade warten oder
+    laufen, teilen sich ein Future. Der Batch-Loop auf dem Loop des
+    Client-Pools sammelt bis zu batch_size Postings (höchstens batch_wait
+    Sekunden), lädt ihre Artikel gemeinsam und startet die Analysen; die
+    Parallelität begrenzt ein Semaphor pro Spur (/moderate interaktiv,
+    /moderate/batch als Bulk, siehe LLMScheduler). Mit pack bündelt die
+    Bulk-Spur Postings desselben Artikels zu einem Prompt (PromptPacker).
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        max_pending: int = SERVICE_QUEUE_MAX,
+        batch_size: int = SERVICE_BATCH_SIZE,
+        batch_wait: float = SERVICE_BATCH_WAIT,
+        concurrency: int = SERVICE_CONCURRENCY,
+        pack: bool = SERVICE_PACK_PROMPTS
+    ):
+        self.api_key = api_key
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.pool = get_client_pool()
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._pending = 0
+        self._closed = False
+        self._tasks = set()
+        self._queue = asyncio.Queue()
+        # Eigene Parallelität pro Spur, damit Einzelanfragen nicht hinter Batches warten
+        self._semaphores = {lane: asyncio.Semaphore(max(1, concurrency)) for lane in ('interactive', 'bulk')}
+        self._packer = None
+        if pack:
+            # concurrency begrenzt dann die gepackten LLM-Aufrufe, nicht die Postings
+            self._packer = PromptPacker(concurrency)
+            self._semaphores['bulk'] = asyncio.Semaphore(max(1, concurrency) * PACK_MAX_POSTINGS)
+        self._batch_loop_future = self.pool.submit(self._batch_loop())
+
+    def submit_many(self, jobs: List[Dict]) -> List[Future]:
+        """Reiht alle Postings ein oder keines (QueueFull/QueueClosed)"""
+        with self._lock:
+            if self._closed:
+                raise QueueClosed("Service fährt herunter")
+
+            futures, new_jobs, batch_keys = [], [], {}
+            for job in jobs:
+                future = self._inflight.get(job['key']) or batch_keys.get(job['key'])
+                if future is None:
+                    future = Future()
+                    batch_keys[job['key']] = future
+                    new_jobs.append((job, future))
+                futures.append(future)
+
+            if self._pending + len(new_jobs) > self.max_pending:
+                self.counts['rejected'] += len(jobs)
+                get_metrics().incr('service_jobs_total', len(jobs), result='rejected')
+                raise QueueFull(f"Warteschlange voll ({self._pending}/{self.max_pending} Postings)")
+
+            self._pending += len(new_jobs)
+            for job, future in new_jobs:
+                self._inflight[job['key']] = future
+            deduplicated = len(jobs) - len(new_jobs)
+            self.counts['queued'] += len(new_jobs)
+            self.counts['deduplicated'] += deduplicated
+
+        metrics = get_metrics()
+        metrics.incr('service_jobs_total', len(new_jobs), result='queued')
+        if deduplicated:
+            metrics.incr('service_jobs_total', deduplicated, result='deduplicated')
+
+        enqueued = time.perf_counter()
+        for job, future in new_jobs:
+            self.pool.call_soon(self._queue.put_nowait, (job, future, enqueued))
+        return futures
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            self.counts['batches'] += 1
+            self.counts['batched_jobs'] += len(batch)
+            get_metrics().incr('service_batches_total')
+            try:
+                prepared = await self._prepare(batch)
+            except Exception as e:
+                prepared = [(None, None, e)] * len(batch)
+
+            for (job, future, enqueued), (article, context, error) in zip(batch, prepared):
+                task = asyncio.create_task(self._run(job, future, enqueued, article, context, error))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _prepare(self, batch: List[tuple]) -> List[tuple]:
+        """Lädt alle Artikel des Batches gemeinsam und erzeugt jeden Kontext nur einmal"""
+        urls = [job['article_url'] for job, _, _ in batch if job['article'] is None]
+        articles = await get_article_fetcher().fetch_many_async(urls) if urls else {}
+
+        contexts, prepared = {}, []
+        for job, _, _ in batch:
+            if job['article'] is not None:
+                content = job['article']['content']
+                article = {
+                    **job['article'],
+                    'paragraphs': [p for p in content.split('\n') if p.strip()],
+                    'url': job['article_url'],
+                    'success': True
+                }
+            else:
+                article = articles[job['article_url']]
+            if not article['success']:
+                prepared.append((article, None, ArticleUnavailable(article['content'])))
+                continue
+
+            key = (
+                article.get('url'), content_hash(article['content']), job['context_budget'],
+                job['context_method'], job['top_k'], job['model']
+            )
+            if key not in contexts:
+                # Für method='llm' ruft das einmal pro Artikel das LLM auf, daher im Worker-Thread
+                contexts[key] = await asyncio.to_thread(
+                    build_article_context, article, job['context_budget'], job['context_method'],
+                    self.api_key, job['model'], None, job['top_k']
+                )
+            prepared.append((article, contexts[key], None))
+        return prepared
+
+    async def _run(self, job: Dict, future: Future, enqueued: float, article: Dict, context: Dict, error: Exception):
+        try:
+            if error is not None:
+                raise error
+            get_metrics().observe('service_queue_wait_seconds', time.perf_counter() - enqueued)
+            llm_priority.set(job['priority'])  # Kontext dieses Tasks
+            active_packer.set(self._packer if job['priority'] == 'bulk' else None)
+            # Nach SERVICE_REQUEST_TIMEOUT hat die Anfrage schon 504 erhalten: dann nicht weiter auf
+            # LLM-Budget warten (LLM_QUEUE_TIMEOUT ist länger) und den Platz in der Warteschlange freigeben
+            remaining = SERVICE_REQUEST_TIMEOUT - (time.perf_counter() - enqueued)
+            try:
+                result = await asyncio.wait_for(moderate_bulk_item(
+                    {'posting_id': job['posting_id'], 'posting': job['posting']},
+                    article,
+                    context,
+                    self.pool.get_async_client(self.api_key),
+                    job['model'],
+                    job['mode'],
+                    job['rules_text'],
+                    self._semaphores[job['priority']],
+                    job['options']
+                ), max(0.0, remaining))
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Keine Antwort nach {SERVICE_REQUEST_TIMEOUT:.0f}s")
+            get_history_store().record(result)
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._inflight.pop(job['key'], None)
+
+    def close(self):
+        """Nimmt keine neuen Postings mehr an; laufende werden fertig moderiert"""
+        with self._lock:
+            self._closed = True
+
+    async def drain(self, timeout: float):
+        """Wartet (höchstens timeout Sekunden), bis alle angenommenen Postings fertig sind, und beendet den Batch-Loop"""
+        deadline = time.monotonic() + timeout
+        while self.stats()['pending'] and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self._batch_loop_future.cancel()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            batches = self.counts['batches']
+            return {
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'queued': self.counts['queued'],
+                'deduplicated': self.counts['deduplicated'],
+                'rejected': self.counts['rejected'],
+                'batches': batches,
+                'avg_batch_size': self.counts['batched_jobs'] / batches if batches else 0.0,
+                'packing': self._packer is not None,
+                'closed': self._closed
+            }
+
+# ====================================
+# HTTP-ENDPUNKTE
+# ====================================
+
+def error_response(status: int, message: str, endpoint: str) -> JSONResponse:
+    get_metrics().incr('service_requests_total', endpoint=endpoint, status=status)
+    headers = {'Retry-After': str(SERVICE_RETRY_AFTER)} if status in (429, 503) else None
+    return JSONResponse({'error': message}, status_code=status, headers=headers)
+
+def error_item(job: Dict, error: Exception) -> Dict:
+    """Fehler eines einzelnen Postings im Batch (die übrigen Ergebnisse bleiben gültig)"""
+    return {
+        **moderation_error_result(f"Fehler: {str(error)}"),
+        'posting_id': job['posting_id'],
+        'posting': job['posting'],
+        'error': True
+    }
+
+async def _read_json(request: Request) -> Dict:
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ValueError("Ungültiges JSON")
+
+async def _submit(request: Request, jobs: List[Dict]) -> List[Future]:
+    queue = request.app.state.queue
+    if queue is None:
+        raise QueueClosed("GROQ_API_KEY ist nicht gesetzt")
+    return queue.submit_many(jobs)
+
+async def _wait(futures: List[Future]) -> None:
+    """Wartet auf die Futures, ohne sie zu verpacken.
+
+    Bei Zeitüberschreitung wird nichts abgebrochen: geteilte Futures bleiben für
+    andere Anfragen gültig. Ergebnisse und Fehler liest der Aufrufer direkt aus
+    den Futures; asyncio-Hüllen, deren Fehler niemand abholt, entstehen nicht.
+    """
+    loop = asyncio.get_running_loop()
+    all_done = loop.create_future()
+    pending = set(futures)
+
+    def finished(future: Future):
+        pending.discard(future)
+        if not pending and not all_done.done():
+            all_done.set_result(None)
+
+    def on_done(future: Future):
+        try:
+            loop.call_soon_threadsafe(finished, future)
+        except RuntimeError:  # Loop bereits geschlossen
+            pass
+
+    for future in futures:
+        future.add_done_callback(on_done)
+    try:
+        await asyncio.wait_for(all_done, SERVICE_REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"Keine Antwort nach {SERVICE_REQUEST_TIMEOUT:.0f}s")
+
+async def moderate(request: Request) -> JSONResponse:
+    endpoint = '/moderate'
+    try:
+        job = parse_job(await _read_json(request))
+        futures = await _submit(request, [job])
+        await _wait(futures)
+        result = futures[0].result()
+    except ValueError as e:
+        return error_response(400, str(e), endpoint)
+    except QueueFull as e:
+        return error_response(429, str(e), endpoint)
+    except QueueClosed as e:
+        return error_response(503, str(e), endpoint)
+    except ArticleUnavailable as e:
+        return error_response(502, str(e), endpoint)
+    except TimeoutError as e:
+        return error_response(504, str(e), endpoint)
+    except Exception as e:
+        return error_response(500, f"Fehler bei der Moderation: {str(e)}", endpoint)
+
+    get_metrics().incr('service_requests_total', endpoint=endpoint, status=200)
+    return JSONResponse({**serialize_result(result), 'posting_id': job['posting_id']})
+
+async def moderate_batch(request: Request) -> JSONResponse:
+    """Gemeinsame Felder (article_url, mode, rules, ...) gelten für alle items, sofern ein item sie nicht überschreibt"""
+    endpoint = '/moderate/batch'
+    try:
+        data = await _read_json(request)
+        if not isinstance(data, dict) or not isinstance(data.get('items'), list) or not data['items']:
+            raise ValueError("'items' muss eine nicht-leere Liste sein")
+        if len(data['items']) > SERVICE_MAX_BATCH_ITEMS:
+            raise ValueError(f"Höchstens {SERVICE_MAX_BATCH_ITEMS} Postings pro Batch")
+        shared = {k: v for k, v in data.items() if k != 'items'}
+        jobs = []
+        for position, item in enumerate(data['items'], start=1):
+            if isinstance(item, str):
+                item = {'posting': item}
+            try:
+                job = parse_job({**shared, **item} if isinstance(item, dict) else item)
+            except ValueError as e:
+                raise ValueError(f"Posting {position}: {e}")
+            job['posting_id'] = job['posting_id'] or str(position)
+            job['priority'] = 'bulk'
+            jobs.append(job)
+        futures = await _submit(request, jobs)
+        await _wait(futures)
+    except ValueError as e:
+        return error_response(400, str(e), endpoint)
+    except QueueFull as e:
+        return error_response(429, str(e), endpoint)
+    except QueueClosed as e:
+        return error_response(503, str(e), endpoint)
+    except TimeoutError as e:
+        return error_response(504, str(e), endpoint)
+    except Exception as e:
+        return error_response(500, f"Fehler bei der Moderation: {str(e)}", endpoint)
+
+    results = []
+    for job, future in zip(jobs, futures):
+        error = future.exception()
+        if error is None:
+            results.append({**serialize_result(future.result()), 'posting_id': job['posting_id'], 'posting': job['posting']})
+        else:
+            results.append(error_item(job, error))
+
+    get_metrics().incr('service_requests_total', endpoint=endpoint, status=200)
+    return JSONResponse({
+        'results': results,
+        'deleted': sum(1 for r in results if r['decision'] == 'LÖSCHEN'),
+        'errors': sum(1 for r in results if r['decision'] == 'ERROR')
+    })
+
+async def health(request: Request) -> JSONResponse:
+    queue = request.app.state.queue
+    if queue is None:
+        return JSONResponse({'status': 'unconfigured', 'error': 'GROQ_API_KEY ist nicht gesetzt'}, status_code=503)
+    stats = queue.stats()
+    status = 'closing' if stats['closed'] else 'ok'
+    return JSONResponse({'status': status, 'queue': stats}, status_code=503 if stats['closed'] else 200)
+
+async def metrics(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(get_metrics().prometheus_text(), media_type='text/plain; version=0.0.4')
+
+def create_app(api_key: str = None) -> Starlette:
+    """ASGI-App; ohne api_key wird GROQ_API_KEY aus der Umgebung gelesen"""
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        key = api_key or os.getenv("GROQ_API_KEY")
+        app.state.queue = ModerationQueue(key) if key else None
+        yield
+        if app.state.queue is not None:
+            app.state.queue.close()
+            await app.state.queue.drain(SERVICE_REQUEST_TIMEOUT)
+        await asyncio.to_thread(get_history_store().flush)
+        await asyncio.to_thread(get_duplicate_index().flush)
+
+    return Starlette(
+        routes=[
+            Route('/moderate', moderate, methods=['POST']),
+            Route('/moderate/batch', moderate_batch, methods=['POST']),
+            Route('/health', health, methods=['GET']),
+            Route('/metrics', metrics, methods=['GET'])
+        ],
+        lifespan=lifespan
+    )
+
+app = create_app()
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="DER STANDARD Moderations-Service (HTTP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    uvicorn.run(app, host=args.host, port=args.port)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,19 @@
+"""Gemeinsame Einstellungen: Caches, Historie und Indizes in einem temporären Verzeichnis, ohne Rate-Limits"""
+
+import os
+import sys
+import tempfile
+
+_STATE_DIR = tempfile.mkdtemp(prefix="moderation-tests-")
+
+# Muss vor dem ersten Import der Engine gesetzt sein (Pfade werden beim Import gelesen)
+os.environ.update({
+    'GROQ_RATE_LIMITS': 'off',
+    'MODERATION_CACHE_PATH': os.path.join(_STATE_DIR, 'cache.sqlite3'),
+    'MODERATION_HISTORY_PATH': os.path.join(_STATE_DIR, 'history.sqlite3'),
+    'DUPLICATE_INDEX_PATH': os.path.join(_STATE_DIR, 'duplicate_index.sqlite3'),
+    'PRESCORER_PATH': os.path.join(_STATE_DIR, 'prescorer.npz'),
+    'BULK_RESULTS_DIR': os.path.join(_STATE_DIR, 'bulk_results')
+})
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import requests
+
+from moderation_engine import ArticleFetcher, parse_article_html
+
+URL = 'https://www.derstandard.at/story/1'
+HTML = """<html><body>
+<nav><p>Navigation</p></nav>
+<h1 class="article-title">Budget beschlossen</h1>
+<div class="article-body"><p>Erster Absatz.</p><p></p><p>Zweiter Absatz.</p></div>
+<div class="comments"><p>Kommentar</p></div>
+</body></html>"""
+
+
+class FakeSite:
+    """Liefert den Artikel mit ETag; beantwortet passende If-None-Match-Anfragen mit 304"""
+
+    def __init__(self):
+        self.requests = []
+        self.down = False
+
+    def respond(self, headers: dict):
+        self.requests.append(dict(headers))
+        if self.down:
+            return 503, '', {}
+        if headers.get('If-None-Match') == '"v1"':
+            return 304, '', {'ETag': '"v1"'}
+        return 200, HTML, {'ETag': '"v1"', 'Last-Modified': 'Thu, 01 Oct 2026 10:00:00 GMT'}
+
+
+class FakeSession:
+    def __init__(self, site: FakeSite):
+        self.site = site
+
+    def get(self, url, headers=None, timeout=None):
+        status, text, response_headers = self.site.respond(headers or {})
+        response = requests.Response()
+        response.status_code = status
+        response._content = text.encode('utf-8')
+        response.encoding = 'utf-8'
+        response.headers.update(response_headers)
+        response.url = url
+        return response
+
+
+@pytest.fixture
+def site():
+    return FakeSite()
+
+
+def make_fetcher(site: FakeSite, **kwargs) -> ArticleFetcher:
+    fetcher = ArticleFetcher(**kwargs)
+    fetcher.session = FakeSession(site)
+    return fetcher
+
+
+def test_parser_keeps_only_title_and_article_body():
+    article = parse_article_html(HTML, URL)
+    assert article['title'] == 'Budget beschlossen'
+    assert article['paragraphs'] == ['Erster Absatz.', 'Zweiter Absatz.']
+    assert article['content'] == 'Erster Absatz.\nZweiter Absatz.'
+
+
+def test_fresh_entries_are_served_from_the_cache(site):
+    fetcher = make_fetcher(site)
+    first, second = fetcher.fetch(URL), fetcher.fetch(URL)
+    assert first == second and first['success']
+    assert len(site.requests) == 1
+
+
+def test_expired_entries_are_revalidated_with_a_conditional_get(site):
+    fetcher = make_fetcher(site, ttl=0.01)
+    article = fetcher.fetch(URL)
+    time.sleep(0.02)
+    assert fetcher.fetch(URL) == article
+    assert site.requests[1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Thu, 01 Oct 2026 10:00:00 GMT'}
+
+    fetcher.fetch(URL)  # nach dem 304 wieder frisch
+    assert len(site.requests) == 2
+
+
+def test_errors_expire_separately_from_articles(site):
+    site.down = True
+    fetcher = make_fetcher(site, error_ttl=0.01)
+    assert not fetcher.fetch(URL)['success']
+    assert not fetcher.fetch(URL)['success']
+    assert len(site.requests) == 1
+
+    site.down = False
+    time.sleep(0.02)
+    assert fetcher.fetch(URL)['success']
+    assert 'If-None-Match' not in site.requests[-1]
+
+
+def test_stale_article_is_kept_when_revalidation_fails(site):
+    fetcher = make_fetcher(site, ttl=0.01)
+    article = fetcher.fetch(URL)
+    site.down = True
+    time.sleep(0.02)
+    assert fetcher.fetch(URL) == article
+
+
+def test_cache_is_bounded(site):
+    fetcher = make_fetcher(site, max_entries=2)
+    for i in range(3):
+        fetcher.fetch(f'{URL}?page={i}')
+    assert fetcher.stats()['entries'] == 2
+    fetcher.fetch(f'{URL}?page=0')
+    assert len(site.requests) == 4
+
+
+def test_async_fetch_revalidates_like_the_sync_fetch(site):
+    def handler(request: httpx.Request) -> httpx.Response:
+        status, text, headers = site.respond(
+            {name: request.headers[name] for name in ('If-None-Match', 'If-Modified-Since') if name in request.headers}
+        )
+        return httpx.Response(status, text=text, headers=headers)
+
+    fetcher = ArticleFetcher(ttl=0.01)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            first = await fetcher.fetch_async(URL, client)
+            await asyncio.sleep(0.02)
+            return first, await fetcher.fetch_async(URL, client)
+
+    first, second = asyncio.run(run())
+    assert first == second and first['title'] == 'Budget beschlossen'
+    assert site.requests[1]['If-None-Match'] == '"v1"'
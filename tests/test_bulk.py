@@ -0,0 +1,67 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import moderation_engine
+from moderation_engine import load_bulk_postings, moderate_postings_bulk
+
+ARTICLE = {'url': 'https://www.derstandard.at/story/1', 'title': 'Titel', 'content': 'Inhalt des Artikels.', 'success': True}
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """Ersetzt Analyse, Client-Pool und Historie; zählt die gleichzeitig laufenden Analysen"""
+    calls = SimpleNamespace(active=0, peak=0, recorded=[])
+
+    async def fake_run_analysis_async(posting, title, content, client, model, mode, rules_text, **options):
+        calls.active += 1
+        calls.peak = max(calls.peak, calls.active)
+        await asyncio.sleep(0.01)
+        calls.active -= 1
+        return {'decision': 'LÖSCHEN' if 'Idiot' in posting else 'FREISCHALTEN', 'confidence': 90}
+
+    monkeypatch.setattr(moderation_engine, 'run_analysis_async', fake_run_analysis_async)
+    monkeypatch.setattr(moderation_engine, 'get_client_pool', lambda: SimpleNamespace(get_async_client=lambda key: None))
+    monkeypatch.setattr(moderation_engine, 'get_history_store', lambda: SimpleNamespace(record=calls.recorded.append))
+    return calls
+
+
+def test_load_bulk_postings_from_jsonl_and_csv():
+    raw_jsonl = '{"id": "a", "posting": "Erstes"}\n\n"Zweites"\n{"text": "Drittes"}\n{"id": "leer", "posting": ""}\n'
+    assert load_bulk_postings(raw_jsonl, 'postings.jsonl') == [
+        {'posting_id': 'a', 'posting': 'Erstes'},
+        {'posting_id': '3', 'posting': 'Zweites'},
+        {'posting_id': '4', 'posting': 'Drittes'}
+    ]
+
+    raw_csv = 'id,Text\n7,Erstes\n8,\n9,Drittes\n'
+    assert load_bulk_postings(raw_csv, 'postings.csv') == [
+        {'posting_id': '7', 'posting': 'Erstes'},
+        {'posting_id': '9', 'posting': 'Drittes'}
+    ]
+
+
+def test_bulk_run_writes_every_result_as_jsonl(engine, tmp_path):
+    items = [{'posting_id': str(i), 'posting': f"Posting {i}" + (", du Idiot" if i % 3 == 0 else '')} for i in range(7)]
+    output_path = tmp_path / 'bulk.jsonl'
+    progress = []
+
+    results = asyncio.run(moderate_postings_bulk(
+        items, ARTICLE, 'test', 'llama3-8b-8192', 3, str(output_path), 'REGELN',
+        on_result=lambda done, total, result: progress.append((done, total))
+    ))
+
+    lines = [json.loads(line) for line in output_path.read_text(encoding='utf-8').splitlines()]
+    assert len(results) == len(lines) == len(engine.recorded) == len(items)
+    assert sorted(line['posting_id'] for line in lines) == [item['posting_id'] for item in items]
+    assert all(isinstance(line['timestamp'], str) and line['article_url'] == ARTICLE['url'] for line in lines)
+    assert {line['posting_id'] for line in lines if line['decision'] == 'LÖSCHEN'} == {'0', '3', '6'}
+    assert progress == [(done, len(items)) for done in range(1, len(items) + 1)]
+
+
+def test_bulk_run_respects_the_concurrency_limit(engine, tmp_path):
+    items = [{'posting_id': str(i), 'posting': f"Posting {i}"} for i in range(12)]
+    asyncio.run(moderate_postings_bulk(items, ARTICLE, 'test', 'llama3-8b-8192', 3, str(tmp_path / 'bulk.jsonl'), 'REGELN'))
+    assert engine.peak == 3
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+from moderation_engine import model_cost, note_llm_usage, run_cascade
+
+MODEL = 'llama3-8b-8192'
+
+
+def test_cascade_cost_uses_reported_usage_and_estimates_streams():
+    def analyze(usage):
+        def call(model):
+            note_llm_usage(usage)
+            return {'decision': 'FREISCHALTEN', 'confidence': 99, 'violated_rules': [], 'explanation': 'ok'}
+        return call
+
+    measured = run_cascade(analyze(SimpleNamespace(prompt_tokens=1234, completion_tokens=56)), 10, [MODEL])
+    step = measured['cascade']['steps'][0]
+    assert (step['usage'], step['prompt_tokens'], step['completion_tokens']) == ('api', 1234, 56)
+    assert measured['cascade']['cost'] == model_cost(MODEL, 1234, 56)
+
+    streamed = run_cascade(analyze(None), 10, [MODEL])
+    assert streamed['cascade']['steps'][0]['usage'] == 'estimate'
+    assert streamed['cascade']['steps'][0]['prompt_tokens'] == 10
+
+
+def test_cascade_escalates_until_a_tier_is_sure():
+    answers = {
+        'klein': {'decision': 'LÖSCHEN', 'confidence': 60, 'violated_rules': ['§2'], 'explanation': 'unsicher'},
+        'mittel': {'decision': 'LÖSCHEN', 'confidence': 95, 'violated_rules': ['§3 GEWALT'], 'explanation': 'Gewalt'},
+        'groß': {'decision': 'LÖSCHEN', 'confidence': 90, 'violated_rules': ['§3 GEWALT'], 'explanation': 'Gewalt'}
+    }
+    result = run_cascade(lambda model: dict(answers[model]), 10, list(answers))
+    steps = result['cascade']['steps']
+    assert [step['escalation'] for step in steps] == ['low_confidence', 'sensitive_rule', None]
+    assert (result['cascade']['tier'], result['cascade']['model']) == (2, 'groß')
+
+
+def test_cascade_stops_at_first_confident_tier():
+    result = run_cascade(
+        lambda model: {'decision': 'FREISCHALTEN', 'confidence': 90, 'violated_rules': [], 'explanation': 'ok'},
+        10, ['klein', 'groß']
+    )
+    assert result['cascade']['tier'] == 0 and len(result['cascade']['steps']) == 1
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from moderation_engine import DashboardAggregates, QuantileSketch
+
+
+def test_quantile_sketch_stays_within_relative_accuracy():
+    values = np.random.default_rng(7).lognormal(0, 1, 20000)
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    for q in (0.5, 0.9, 0.99):
+        exact = np.quantile(values, q, method='lower')
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.011)
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_aggregates_match_a_full_recomputation():
+    results = [
+        {'decision': 'LÖSCHEN', 'confidence': 95, 'analysis_time': 1.0, 'prompt_tokens': 400,
+         'violated_rules': ['§2'], 'analysis_mode': 'sequential'},
+        {'decision': 'FREISCHALTEN', 'confidence': 80, 'analysis_time': 0.5, 'prompt_tokens': None,
+         'violated_rules': [], 'analysis_mode': 'combined'},
+        {'decision': 'LÖSCHEN', 'confidence': 85, 'analysis_time': 1.5, 'prompt_tokens': 600,
+         'violated_rules': ['§2', '§5'], 'analysis_mode': 'sequential'}
+    ]
+    aggregates = DashboardAggregates()
+    for result in results:
+        aggregates.add_result(result)
+    snapshot = aggregates.snapshot()
+    assert (snapshot['total'], snapshot['deleted'], snapshot['approved']) == (3, 2, 1)
+    assert snapshot['avg_confidence'] == pytest.approx(260 / 3)
+    assert snapshot['avg_prompt_tokens'] == 500
+    assert snapshot['rule_counts'] == {'§2': 2, '§5': 1}
+    assert snapshot['mode_times'] == {'sequential': (1.25, 2), 'combined': (0.5, 1)}
+    assert snapshot['confidence_buckets'][80] == 2 and snapshot['confidence_buckets'][90] == 1
+    assert snapshot['confidence_quantiles'] == {0.5: 85, 0.9: 85}  # unteres Quantil wie np.quantile(method='lower')
+
+
+def test_empty_aggregates_have_no_quantiles():
+    snapshot = DashboardAggregates().snapshot()
+    assert snapshot['total'] == 0 and snapshot['latency_quantiles'] == {}
@@ -0,0 +1,56 @@
+from moderation_engine import DUP_NEAR_MAX_DISTANCE, DuplicateIndex, simhash
+
+SPAM = "Verdiene jetzt 500 Euro am Tag von zu Hause aus, schreib mir einfach eine Nachricht auf Telegram!"
+DELETED = {'decision': 'LÖSCHEN', 'confidence': 95, 'violated_rules': ['§5'], 'explanation': 'Werbung'}
+
+
+def test_simhash_is_stable_under_normalization_and_close_for_edits():
+    assert simhash(SPAM) == simhash("  " + SPAM.upper() + "  ")
+    assert (simhash(SPAM) ^ simhash(SPAM.replace('500', '600'))).bit_count() <= DUP_NEAR_MAX_DISTANCE
+    assert (simhash(SPAM) ^ simhash("Ein völlig anderes Posting über die Budgetrede im Parlament")).bit_count() \
+        > DUP_NEAR_MAX_DISTANCE
+
+
+def test_exact_and_near_duplicates_are_found(tmp_path):
+    index = DuplicateIndex(str(tmp_path / 'dup.sqlite3'), window_seconds=3600)
+    assert index.lookup(SPAM, 'a')['match'] is None
+    index.record(SPAM, 'a', DELETED, 'regeln')
+    index.record(SPAM, 'b', DELETED, 'regeln')
+
+    exact = index.lookup(SPAM.lower(), 'a')
+    assert (exact['match'], exact['seen_global'], exact['seen_article']) == ('exact', 2, 1)
+    assert exact['prior_decision']['decision'] == 'LÖSCHEN'
+
+    near = index.lookup(SPAM.replace('500', '600'), 'c')
+    assert near['match'] == 'near' and near['seen_article'] == 0
+
+
+def test_expired_entries_are_neither_found_nor_extended(tmp_path):
+    index = DuplicateIndex(str(tmp_path / 'dup.sqlite3'), window_seconds=3600)
+    index.record(SPAM, 'a', DELETED, 'regeln')
+    for entry in index._entries.values():
+        entry['last_seen'] -= 7200
+    assert index.lookup(SPAM, 'a')['match'] is None
+
+    index.record(SPAM, 'a', DELETED, 'regeln')
+    assert index.lookup(SPAM, 'a')['seen_global'] == 1
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'dup.sqlite3')
+    index = DuplicateIndex(path, window_seconds=3600)
+    index.record(SPAM, 'a', DELETED, 'regeln')
+    index.flush()
+
+    reloaded = DuplicateIndex(path, window_seconds=3600).lookup(SPAM, 'a')
+    assert reloaded['match'] == 'exact' and reloaded['seen_global'] == 1
+
+
+def test_index_is_bounded_by_max_entries(tmp_path):
+    index = DuplicateIndex(str(tmp_path / 'dup.sqlite3'), window_seconds=3600, max_entries=3)
+    postings = [f"Posting Nummer {i} mit ganz eigenem Inhalt über Thema {i * 7919}" for i in range(5)]
+    for posting in postings:
+        index.record(posting, 'a', DELETED, 'regeln')
+    assert len(index._entries) == 3
+    assert index.lookup(postings[0], 'a')['match'] is None
+    assert index.lookup(postings[-1], 'a')['match'] == 'exact'
@@ -0,0 +1,7 @@
+from evaluate import DEFAULT_CORPUS, load_corpus
+
+
+def test_default_corpus_loads_from_any_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    corpus = load_corpus(DEFAULT_CORPUS)
+    assert corpus and {item['decision'] for item in corpus} == {'LÖSCHEN', 'FREISCHALTEN'}
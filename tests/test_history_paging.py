@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import moderation_engine
+from moderation_engine import HistoryStore
+
+START = datetime(2026, 10, 1, 12, 0)
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    monkeypatch.setattr(moderation_engine, 'HISTORY_FLUSH_INTERVAL', 0.01)
+    history_store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+    for i in range(30):
+        history_store.record({
+            'posting': f"Posting {i} " + 'x' * 300,
+            'decision': 'LÖSCHEN' if i % 2 else 'FREISCHALTEN',
+            'confidence': 60 + i,
+            'violated_rules': ['§1', '§4'] if i % 2 else [],
+            'explanation': f"Begründung {i}",
+            'question_analysis': {'has_questions': False},
+            'timestamp': START + timedelta(minutes=i)
+        })
+    history_store.flush()
+    return history_store
+
+
+def test_summaries_page_like_page_but_only_list_columns(store):
+    for offset in (0, 25):
+        summaries = store.summaries(25, offset, decision='LÖSCHEN')
+        assert [s['history_id'] for s in summaries] == [
+            item['history_id'] for item in store.page(25, offset, decision='LÖSCHEN')
+        ]
+    first = store.summaries(10)[0]
+    assert set(first) == {'history_id', 'timestamp', 'decision', 'confidence', 'posting', 'article_url', 'violated_rules'}
+    assert first['posting'].startswith("Posting 29 ") and len(first['posting']) == 200
+    assert first['violated_rules'] == '§1, §4'
+    assert store.summaries(10, 20)[-1]['violated_rules'] == ''
+
+
+def test_details_are_loaded_per_entry(store):
+    summary = store.summaries(1)[0]
+    item = store.get(summary['history_id'])
+    assert item['explanation'] == "Begründung 29"
+    assert item['question_analysis'] == {'has_questions': False}
+    assert item['timestamp'] == summary['timestamp'] == START + timedelta(minutes=29)
+    assert store.get(-1) is None
+
+
+def test_revision_changes_only_with_new_entries(store):
+    revision = store.revision
+    store.summaries(10)
+    store.count()
+    assert store.revision == revision
+    store.record({'posting': 'Neu', 'decision': 'FREISCHALTEN', 'confidence': 90})
+    assert store.revision == revision + 1
+    store.flush()
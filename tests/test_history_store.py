@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import moderation_engine
+from moderation_engine import HistoryStore
+
+START = datetime(2026, 10, 1, 12, 0)
+ARTICLES = ('https://www.derstandard.at/story/1', 'https://www.derstandard.at/story/2')
+
+
+def make_result(i: int) -> dict:
+    deleted = i % 3 == 0
+    return {
+        'posting': f"Posting {i}",
+        'decision': 'LÖSCHEN' if deleted else 'FREISCHALTEN',
+        'confidence': 50 + i,
+        'violated_rules': (['§1', '§3'] if i % 2 else ['§1']) if deleted else [],
+        'explanation': f"Begründung {i}",
+        'article_url': ARTICLES[i % 2],
+        'analysis_time': 0.1 * i,
+        'timestamp': START + timedelta(minutes=i)
+    }
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    monkeypatch.setattr(moderation_engine, 'HISTORY_FLUSH_INTERVAL', 0.01)
+    history_store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+    for i in range(12):
+        history_store.record(make_result(i))
+    history_store.flush()
+    return history_store
+
+
+def test_pages_are_newest_first_without_gaps(store):
+    pages = [store.page(5, offset) for offset in (0, 5, 10)]
+    assert [len(page) for page in pages] == [5, 5, 2]
+    postings = [item['posting'] for page in pages for item in page]
+    assert postings == [f"Posting {i}" for i in reversed(range(12))]
+    assert pages[0][0]['timestamp'] == START + timedelta(minutes=11)
+    assert pages[0][0]['explanation'] == "Begründung 11"
+
+
+@pytest.mark.parametrize('filters, expected', [
+    ({'decision': 'LÖSCHEN'}, [9, 6, 3, 0]),
+    ({'rule': '§3'}, [9, 3]),
+    ({'article_url': ARTICLES[0]}, [10, 8, 6, 4, 2, 0]),
+    ({'decision': 'LÖSCHEN', 'article_url': ARTICLES[1]}, [9, 3]),
+    ({'decision': 'FREISCHALTEN', 'rule': '§1'}, [])
+])
+def test_filters_apply_to_count_and_page(store, filters, expected):
+    assert store.count(**filters) == len(expected)
+    assert [item['posting'] for item in store.page(100, **filters)] == [f"Posting {i}" for i in expected]
+
+
+def test_distinct_values_for_filter_choices(store):
+    assert store.distinct('decision') == ['FREISCHALTEN', 'LÖSCHEN']
+    assert store.distinct('rule') == ['§1', '§3']
+    assert store.distinct('article_url') == list(ARTICLES)
+    with pytest.raises(ValueError):
+        store.distinct('posting')
+
+
+def test_history_and_aggregates_survive_a_restart(store):
+    reopened = HistoryStore(store.path)
+    assert reopened.count() == 12
+    snapshot = reopened.aggregates.snapshot()
+    assert (snapshot['total'], snapshot['deleted'], snapshot['approved']) == (12, 4, 8)
+    assert snapshot['rule_counts'] == {'§1': 4, '§3': 2}
+
+
+def test_record_updates_aggregates_before_the_write(store):
+    store.record(make_result(12))
+    assert store.aggregates.snapshot()['total'] == 13
+    store.flush()
+    assert store.count() == 13
@@ -0,0 +1,67 @@
+import pytest
+
+from moderation_engine import LOCAL_DEFAULT_MIN_CONFIDENCE, preclassify_posting
+
+
+@pytest.mark.parametrize('posting, rule, confidence, signal', [
+    ("Ich bring dich um, wenn ich dich erwische", '§3', 95, 'Drohung'),
+    ("Wir werden euch alle abknallen", '§3', 95, 'Drohung'),
+    ("Ich bring dich heute noch um!", '§3', 95, 'Drohung'),
+    ("Du bist ein Vollidiot", '§2', 90, 'Direkte Anrede'),
+    ("Ihr seid solche Trottel", '§2', 90, 'Direkte Anrede'),
+    ("Günstige Kredite ohne Schufa: www.kredit-sofort.xyz", '§5', 95, 'Werbung'),
+])
+def test_clear_cases_are_decided_locally(posting, rule, confidence, signal):
+    local = preclassify_posting(posting)
+    assert local['decision'] == 'LÖSCHEN'
+    assert local['confidence'] == confidence >= LOCAL_DEFAULT_MIN_CONFIDENCE
+    assert rule in local['violated_rules']
+    assert signal in local['signals']
+
+
+@pytest.mark.parametrize('posting, signal', [
+    # Bericht über eine Tat, kein Aufruf
+    ("Laut Polizei wollte der Täter seinen Nachbarn erschießen.", 'Gewalt-Begriff'),
+    # Aufruf in der 3. Person: das LLM entscheidet
+    ("Solche Leute gehören an die Wand gestellt.", 'Gewaltaufruf'),
+    # Zitat eines umstrittenen Begriffs in Kritik
+    ("Der Begriff Umvolkung ist ein rechtsextremer Kampfbegriff.", 'Umstrittener Begriff'),
+    ("Das ist kein Idiot, sondern ein kluger Kopf.", 'Verneinung'),
+    ("Die Politiker sind Trottel.", 'Beleidigung'),
+    # "sie sind" meint hier Dritte, keine Anrede
+    ("Sie sind doch alle Idioten, die Politiker", 'Beleidigung'),
+])
+def test_ambiguous_signals_stay_below_threshold(posting, signal):
+    local = preclassify_posting(posting)
+    assert signal in local['signals']
+    assert local['confidence'] < LOCAL_DEFAULT_MIN_CONFIDENCE
+
+
+def test_slur_is_decided_locally():
+    local = preclassify_posting("Dieses Ausländerpack soll verschwinden")
+    assert local['decision'] == 'LÖSCHEN'
+    assert local['confidence'] >= LOCAL_DEFAULT_MIN_CONFIDENCE
+    assert local['violated_rules'] == ['§7']
+
+
+def test_short_agreement_is_approved():
+    local = preclassify_posting("Danke für den Artikel!")
+    assert local['decision'] == 'FREISCHALTEN'
+    assert local['confidence'] >= LOCAL_DEFAULT_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize('posting', [
+    "Ich bringe sie um 8 zur Schule",
+    "Ich mache sie um 9 Uhr auf",
+    "Ich bringe ihn ab und zu mit",
+    "Ich mach ihn kalt, den Kaffee, meine ich",
+])
+def test_everyday_separable_verbs_are_not_threats(posting):
+    local = preclassify_posting(posting)
+    assert 'Drohung' not in local['signals']
+    assert local['decision'] is None
+
+
+def test_neutral_posting_has_no_decision():
+    local = preclassify_posting("Die Regierung hat heute das neue Budget vorgestellt, mal sehen was kommt.")
+    assert local == {'decision': None, 'confidence': 0, 'violated_rules': [], 'signals': []}
@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+import pytest
+
+import moderation_engine
+from moderation_engine import PreScorer, calibrate_thresholds, prescored_moderation_result
+
+BENIGN = ["Interessanter Artikel, danke", "Wo finde ich die Studie?", "Sehe ich ähnlich, gute Analyse",
+          "Das Budget ist zu knapp bemessen", "Spannende Frage, wie geht es weiter"]
+INSULTS = ["Du Volltrottel hast keine Ahnung", "Was für ein Vollkoffer bist du", "Halt die Klappe, Depp"]
+SPAM = ["Günstige Kredite auf kredit-xyz.com", "Klick hier für Gratis-Bitcoin", "Gewinnspiel: jetzt registrieren"]
+
+
+def training_examples(n: int):
+    examples = []
+    for i in range(n):
+        kind = i % 4
+        if kind == 2:
+            examples.append((f"{INSULTS[i % len(INSULTS)]} #{i}", 'LÖSCHEN', ['§2 BELEIDIGUNG']))
+        elif kind == 3:
+            examples.append((f"{SPAM[i % len(SPAM)]} #{i}", 'LÖSCHEN', ['§5 SPAM']))
+        else:
+            examples.append((f"{BENIGN[i % len(BENIGN)]} #{i}", 'FREISCHALTEN', []))
+    return examples
+
+
+def test_calibration_keeps_target_agreement_on_both_sides():
+    rng = np.random.default_rng(1)
+    risk = rng.random(2000)
+    # Das LLM löscht umso eher, je höher der Score; in der Mitte ist es uneins
+    deleted = (rng.random(2000) < risk ** 3 / (risk ** 3 + (1 - risk) ** 3)).astype(float)
+    thresholds = calibrate_thresholds(risk, deleted, target=0.95, min_support=20)
+    assert thresholds['approve_max'] <= 0.05 and thresholds['delete_min'] >= 0.95
+    assert thresholds['auto_approve_agreement'] >= 0.95
+    assert thresholds['auto_delete_agreement'] >= 0.95
+    assert 0 < thresholds['auto_approve_share'] < 0.5 and 0 < thresholds['auto_delete_share'] < 0.5
+
+
+def test_calibration_disables_deletion_when_rules_disagree():
+    risk = np.linspace(0, 1, 2000)
+    deleted = (risk > 0.5).astype(float)
+    thresholds = calibrate_thresholds(risk, deleted, target=0.98, min_support=20, delete_agrees=np.zeros(2000))
+    assert thresholds['delete_min'] is None and thresholds['auto_delete_share'] == 0.0
+    assert thresholds['approve_max'] is not None
+
+
+def test_calibration_needs_min_support():
+    risk = np.linspace(0, 1, 30)
+    thresholds = calibrate_thresholds(risk, (risk > 0.5).astype(float), target=0.98, min_support=50)
+    assert thresholds['approve_max'] is None and thresholds['delete_min'] is None
+
+
+@pytest.fixture(scope='module')
+def prescorer(tmp_path_factory):
+    scorer = PreScorer(str(tmp_path_factory.mktemp('prescorer') / 'prescorer.npz'))
+    scorer.train(training_examples(800), target_agreement=0.95, epochs=40)
+    return scorer
+
+
+def test_training_predicts_rules_for_deletions(prescorer, monkeypatch):
+    monkeypatch.setattr(moderation_engine, 'get_prescorer', lambda: prescorer)
+    assert prescorer.info['rules'] == ['§2', '§5']
+    assert prescorer.info['holdout_accuracy'] > 0.9
+    scored = prescorer.assess("Du Volltrottel hast keine Ahnung #9999")
+    assert (scored['action'], scored['rule']) == ('delete', '§2')
+    result = prescored_moderation_result(scored)
+    assert result['violated_rules'] == ['§2'] and '§2' in result['explanation']
+    assert prescorer.assess("Interessanter Artikel, danke #9999")['rule'] is None
+
+
+def test_model_without_rules_never_auto_deletes(prescorer, tmp_path):
+    path = str(tmp_path / 'old.npz')
+    weights, bias, info = prescorer._model[:3]
+    # Format vor der Regel-Vorhersage: nur Gewichte, Bias und Info
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, weights=weights, bias=np.array(bias), info=np.array(json.dumps(info)))
+    old = PreScorer(path)
+    assert old.info['delete_min'] is None and old.info['rules'] == []
+    assert old.assess("Du Volltrottel hast keine Ahnung #9999")['action'] != 'delete'
+
+
+def test_too_few_examples_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        PreScorer(str(tmp_path / 'p.npz')).train(training_examples(50))
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import moderation_engine
+from mock_groq_server import answer_for
+from moderation_engine import (
+    PromptPacker, active_packer, analyze_posting_with_llm_async, note_llm_usage, parse_packed_moderation_response,
+    run_cascade_async
+)
+
+MODEL = 'llama3-8b-8192'
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Ersetzt den LLM-Aufruf; gepackte Aufrufe scheitern, solange fail_packed gesetzt ist"""
+    calls = SimpleNamespace(tasks=[], fail_packed=False)
+
+    async def fake_llm_complete_async(client, task, model, prompt, max_tokens=None):
+        calls.tasks.append(task)
+        if task == 'packed_moderation' and calls.fail_packed:
+            raise TimeoutError('Zeitüberschreitung')
+        note_llm_usage(SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=50))
+        return answer_for(prompt, [])
+
+    monkeypatch.setattr(moderation_engine, 'llm_complete_async', fake_llm_complete_async)
+    return calls
+
+
+def moderate_packed(postings, max_postings=10):
+    async def run():
+        active_packer.set(PromptPacker(2, max_postings=max_postings, max_wait=0.01))
+        return await asyncio.gather(*(
+            analyze_posting_with_llm_async(posting, 'Titel', 'Inhalt', None, MODEL, 'REGELN') for posting in postings
+        ))
+    return asyncio.run(run())
+
+
+def test_postings_are_packed_into_one_call(llm_calls):
+    postings = [f"Packtest {i}: ein ganz normales Posting" for i in range(3)]
+    results = moderate_packed(postings)
+    assert llm_calls.tasks == ['packed_moderation']
+    assert all(result['decision'] == 'FREISCHALTEN' and result['packed']['size'] == 3 for result in results)
+
+
+def test_failed_packed_call_falls_back_to_single_calls(llm_calls):
+    llm_calls.fail_packed = True
+    postings = ["Fehlertest eins, du Idiot", "Fehlertest zwei ist harmlos", "🙂🙂"]
+    results = moderate_packed(postings)
+    assert llm_calls.tasks.count('packed_moderation') == 1
+    assert llm_calls.tasks.count('moderation') == len(postings)
+    assert [result['decision'] for result in results] == ['LÖSCHEN', 'FREISCHALTEN', 'FREISCHALTEN']
+    assert not any('packed' in result for result in results)
+
+
+def test_single_fallback_reports_usage_to_the_cascade(llm_calls):
+    llm_calls.fail_packed = True
+
+    async def run():
+        active_packer.set(PromptPacker(2, max_postings=2, max_wait=0.01))
+        return await run_cascade_async(
+            lambda model: analyze_posting_with_llm_async("Kaskadentest mit Nutzung", 'Titel', 'Inhalt', None, model, 'REGELN'),
+            1000, [MODEL]
+        )
+    step = asyncio.run(run())['cascade']['steps'][0]
+    assert step['usage'] == 'api'
+    assert step['completion_tokens'] == 50
+
+
+def test_packed_response_matches_wordless_postings_by_index():
+    response = json.dumps({'results': [
+        {'index': 1, 'posting_start': '', 'decision': 'FREISCHALTEN', 'confidence': 90,
+         'violated_rules': [], 'explanation': 'Nur Emojis'},
+        {'index': 2, 'posting_start': 'ganz andere worte', 'decision': 'LÖSCHEN', 'confidence': 90,
+         'violated_rules': ['§2'], 'explanation': 'x'}
+    ]})
+    parsed = parse_packed_moderation_response(response, ['🙂🙂', 'Du bist ein Trottel'])
+    assert list(parsed) == [1]
+    assert parsed[1]['decision'] == 'FREISCHALTEN'
+
+
+def gather_packed(postings, timeout=5):
+    """Wie moderate_packed, aber Fehler als Ergebnis und mit Zeitlimit statt ewigem Warten"""
+    async def run():
+        active_packer.set(PromptPacker(2, max_postings=10, max_wait=0.01))
+        return await asyncio.wait_for(asyncio.gather(*(
+            analyze_posting_with_llm_async(posting, 'Titel', 'Inhalt', None, MODEL, 'REGELN') for posting in postings
+        ), return_exceptions=True), timeout)
+    return asyncio.run(run())
+
+
+def test_cache_write_error_completes_every_future(llm_calls, monkeypatch):
+    def failing_store(key, kind, result):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(moderation_engine, 'store_cached_result', failing_store)
+    results = gather_packed([f"Cachefehler {i}: ein normales Posting" for i in range(3)])
+    assert results[0]['decision'] == 'FREISCHALTEN'
+    assert all(isinstance(result, sqlite3.OperationalError) for result in results[1:])
+
+
+def test_failing_single_call_completes_its_future(llm_calls, monkeypatch):
+    async def failing_single(*args, **kwargs):
+        raise RuntimeError('Client geschlossen')
+
+    llm_calls.fail_packed = True
+    monkeypatch.setattr(moderation_engine, '_moderate_uncached_async', failing_single)
+    results = gather_packed([f"Einzelfehler {i}: ein normales Posting" for i in range(2)])
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import moderation_engine
+from moderation_engine import FREE_TIER_RATE_LIMITS, LLMQueueTimeout, LLMScheduler, RateBudget, load_rate_limits
+
+INTERACTIVE, BULK = 0, 1
+
+
+def test_unlimited_budget_never_queues():
+    budget = RateBudget(0, 0)
+    now = time.monotonic()
+    assert all(budget.try_acquire((BULK, 0, seq), 10_000, now) == 0.0 for seq in range(100))
+    assert budget.waiting == [] and budget.wakers == {}
+
+
+def test_blocked_unlimited_budget_waits_for_retry_after():
+    budget = RateBudget(0, 0)
+    now = time.monotonic()
+    budget.blocked_until = now + 2
+    assert budget.try_acquire((INTERACTIVE, 0, 1), 10, now) == pytest.approx(2)
+    assert budget.try_acquire((INTERACTIVE, 0, 1), 10, now + 2) == 0.0
+    assert budget.waiting == []
+
+
+def test_request_budget_refills_per_minute():
+    budget = RateBudget(60, 0)
+    now = budget.updated
+    for seq in range(60):
+        assert budget.try_acquire((INTERACTIVE, 0, seq), 1, now) == 0.0
+    assert budget.try_acquire((INTERACTIVE, 0, 60), 1, now) == pytest.approx(1.0)
+    assert budget.try_acquire((INTERACTIVE, 0, 60), 1, now + 1.0) == 0.0
+
+
+def test_prompt_above_token_budget_waits_for_full_budget():
+    budget = RateBudget(0, 600)
+    now = budget.updated
+    assert budget.try_acquire((INTERACTIVE, 0, 1), 600, now) == 0.0
+    assert budget.try_acquire((INTERACTIVE, 0, 2), 60, now) == pytest.approx(6.0)
+    # Größer als das Minutenbudget: wartet auf das volle Budget statt ewig
+    assert budget.try_acquire((INTERACTIVE, 0, 2), 10_000, now) == pytest.approx(60.0)
+
+
+def test_only_head_acquires_and_release_wakes_next():
+    budget = RateBudget(1, 0)
+    now = budget.updated
+    woken = []
+    assert budget.try_acquire((INTERACTIVE, 0, 1), 1, now) == 0.0
+    bulk, interactive, urgent = (BULK, 0, 2), (INTERACTIVE, 5, 3), (INTERACTIVE, 1, 4)
+    for ticket in (bulk, interactive, urgent):
+        budget.try_acquire(ticket, 1, now, lambda ticket=ticket: woken.append(ticket))
+    # Interaktiv vor Bulk, innerhalb der Spur dringendere zuerst
+    assert budget.waiting[0] == urgent
+    assert budget.try_acquire(bulk, 1, now) is None
+    assert budget.try_acquire(interactive, 1, now) is None
+
+    assert budget.try_acquire(urgent, 1, now + 60) == 0.0
+    assert woken == [interactive]
+    budget.discard(interactive)
+    assert woken == [interactive, bulk]
+    assert budget.waiting == [bulk]
+
+
+def test_unlimited_scheduler_runs_async_calls_without_polling():
+    scheduler = LLMScheduler(limits={})
+    client = SimpleNamespace(api_key='test')
+
+    async def request():
+        return SimpleNamespace(usage=None)
+
+    async def run():
+        return await asyncio.gather(*(scheduler.call_async(client, 'm', 100, request) for _ in range(200)))
+
+    started = time.monotonic()
+    assert len(asyncio.run(run())) == 200
+    assert time.monotonic() - started < moderation_engine.LLM_SCHEDULER_POLL * 5
+    assert scheduler.budget(client, 'm').waiting == []
+
+
+def test_queued_caller_times_out_and_leaves_queue(monkeypatch):
+    monkeypatch.setattr(moderation_engine, 'LLM_QUEUE_TIMEOUT', 0.2)
+    scheduler = LLMScheduler(limits={'m': (1, 0)})
+    client = SimpleNamespace(api_key='test')
+    scheduler.call(client, 'm', 1, lambda: SimpleNamespace(usage=None))
+    with pytest.raises(LLMQueueTimeout):
+        scheduler.call(client, 'm', 1, lambda: SimpleNamespace(usage=None))
+    assert scheduler.budget(client, 'm').waiting == []
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('', {}),
+    ('off', {}),
+    ('free', FREE_TIER_RATE_LIMITS),
+    ('{"llama-3.3-70b-versatile": [1000, 300000], "*": [100, 0]}',
+     {'llama-3.3-70b-versatile': (1000, 300000), '*': (100, 0)}),
+])
+def test_rate_limits_are_opt_in(raw, expected):
+    assert load_rate_limits(raw) == expected
+
+
+def test_scheduler_without_configured_limits_never_waits(monkeypatch):
+    monkeypatch.delenv('GROQ_RATE_LIMITS', raising=False)
+    scheduler = LLMScheduler()
+    client = SimpleNamespace(api_key='test')
+    budget = scheduler.budget(client, 'llama-3.3-70b-versatile')
+    assert (budget.rpm, budget.tpm) == (0, 0)
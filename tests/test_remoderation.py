@@ -0,0 +1,79 @@
+import pytest
+
+import moderation_engine
+from moderation_engine import HistoryStore, build_rule_set, plan_remoderation, remoderation_reason
+
+OLD_RULES = {
+    '§1 DISKRIMINIERUNG': 'Keine diskriminierenden Äußerungen.',
+    '§2 BELEIDIGUNG': 'Keine persönlichen Beleidigungen.',
+    '§3 SPAM': 'Kein Spam.'
+}
+NEW_RULES = {
+    '§1 DISKRIMINIERUNG': 'Keine diskriminierenden Äußerungen.',
+    '§2 BELEIDIGUNG': 'Keine persönlichen Beleidigungen, auch nicht gegen Politiker.',
+    '§4 RELEVANZ': 'Postings müssen zum Artikel passen.'
+}
+
+
+def decision(posting, decision, confidence=95, rules=(), explanation='Kein Verstoß.', version=None):
+    return {
+        'posting': posting,
+        'decision': decision,
+        'confidence': confidence,
+        'violated_rules': list(rules),
+        'explanation': explanation,
+        'article_url': 'https://www.derstandard.at/story/1',
+        'rules_version': version or build_rule_set(OLD_RULES).version
+    }
+
+
+@pytest.fixture
+def history(monkeypatch, tmp_path):
+    monkeypatch.setattr(moderation_engine, 'HISTORY_FLUSH_INTERVAL', 0.01)
+    store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+    monkeypatch.setattr(moderation_engine, 'get_history_store', lambda: store)
+    for result in [
+        decision('Beleidigt', 'LÖSCHEN', rules=['§2 BELEIDIGUNG']),
+        decision('Spam', 'LÖSCHEN', rules=['§3']),
+        decision('Diskriminiert', 'LÖSCHEN', rules=['§1 DISKRIMINIERUNG']),
+        decision('Knapp am Thema', 'FREISCHALTEN', explanation='Passt noch zum Thema (§ 4).'),
+        decision('Knapp', 'FREISCHALTEN', confidence=60),
+        decision('Harmlos', 'FREISCHALTEN', explanation='Kein Verstoß gegen §21 oder §12.'),
+        decision('Später freigeschaltet', 'LÖSCHEN', rules=['§2']),
+        decision('Später freigeschaltet', 'FREISCHALTEN'),
+        decision('Fehler', 'ERROR', confidence=0),
+        decision('Andere Version', 'LÖSCHEN', rules=['§2'], version=build_rule_set(NEW_RULES).version)
+    ]:
+        store.record(result)
+    return store
+
+
+def test_plan_selects_only_plausibly_affected_decisions(history):
+    plan = plan_remoderation(build_rule_set(OLD_RULES).version, build_rule_set(NEW_RULES))
+    assert plan['diff'] == {'added': ['§4'], 'removed': ['§3'], 'changed': ['§2']}
+    assert plan['decisions'] == 7
+    assert plan['by_reason'] == {'violated': 2, 'mentioned': 1, 'borderline': 1}
+    assert [(c['posting'], c['reason']) for c in plan['candidates']] == [
+        ('Beleidigt', 'violated'),
+        ('Spam', 'violated'),
+        ('Knapp am Thema', 'mentioned'),
+        ('Knapp', 'borderline')
+    ]
+
+
+def test_plan_limit_keeps_violations_first(history):
+    plan = plan_remoderation(build_rule_set(OLD_RULES).version, build_rule_set(NEW_RULES), limit=2)
+    assert [c['reason'] for c in plan['candidates']] == ['violated', 'violated']
+    assert plan['by_reason']['borderline'] == 1
+
+
+def test_plan_needs_a_known_old_version(history):
+    with pytest.raises(ValueError):
+        plan_remoderation('unbekannt', build_rule_set(NEW_RULES))
+
+
+def test_removed_rules_alone_do_not_reopen_approvals():
+    diff = {'added': [], 'removed': ['§3'], 'changed': []}
+    approved = {'decision': 'FREISCHALTEN', 'confidence': 10, 'explanation': 'Kein Spam (§3).', 'violated_rules': []}
+    assert remoderation_reason(approved, diff) is None
+    assert remoderation_reason(dict(approved, confidence=70), {**diff, 'changed': ['§1']}, near_confidence=60) is None
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+import moderation_engine
+from moderation_engine import ModerationCache, cached_result, make_cache_key, store_cached_result
+
+KEY_ARGS = ('moderation', 'Genau!', 'Artikelinhalt', 'llama3-8b-8192', 'REGELN')
+
+
+def test_key_ignores_trivial_posting_differences():
+    assert make_cache_key(*KEY_ARGS) == make_cache_key('moderation', '  „GENAU!!!“ ', *KEY_ARGS[2:])
+
+
+@pytest.mark.parametrize('position, value', [
+    (0, 'question'),
+    (1, 'Genau so!'),
+    (2, 'Anderer Artikelinhalt'),
+    (3, 'llama-3.3-70b-versatile'),
+    (4, 'REGELN NEU')
+])
+def test_key_changes_with_kind_posting_article_model_and_rules(position, value):
+    args = list(KEY_ARGS)
+    args[position] = value
+    assert make_cache_key(*args) != make_cache_key(*KEY_ARGS)
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    ModerationCache(path).put('key', 'moderation', {'decision': 'FREISCHALTEN'})
+    cache = ModerationCache(path)
+    assert cache.get('key', 'moderation') == {'decision': 'FREISCHALTEN'}
+    assert cache.stats()['by_kind'] == {'moderation': {'hits': 1, 'misses': 0}}
+
+
+def test_expired_entries_count_as_miss_and_are_removed(tmp_path):
+    cache = ModerationCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=0.05)
+    cache.put('key', 'moderation', {'decision': 'LÖSCHEN'})
+    time.sleep(0.1)
+    assert cache.get('key', 'moderation') is None
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['misses'] == 1
+
+
+def test_overflow_evicts_least_recently_used_entries(tmp_path):
+    cache = ModerationCache(str(tmp_path / 'cache.sqlite3'), max_entries=10)
+    for i in range(10):
+        cache.put(f'key{i}', 'moderation', {'n': i})
+        time.sleep(0.001)
+    assert cache.get('key0', 'moderation') == {'n': 0}  # jetzt zuletzt benutzt
+    cache.put('key10', 'moderation', {'n': 10})
+
+    assert cache.stats()['entries'] == 9
+    assert cache.get('key0', 'moderation') == {'n': 0}
+    assert cache.get('key1', 'moderation') is None
+    assert cache.get('key10', 'moderation') == {'n': 10}
+
+
+def test_only_usable_results_are_stored(monkeypatch, tmp_path):
+    cache = ModerationCache(str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.setattr(moderation_engine, 'get_result_cache', lambda: cache)
+    for i, result in enumerate([
+        {'decision': 'ERROR'},
+        {'decision': 'LÖSCHEN', 'error': True},
+        {'decision': 'LÖSCHEN', 'parse_error': True},
+        {'decision': 'FREISCHALTEN', 'early_stop': True}
+    ]):
+        key, _ = cached_result('moderation', f'Posting {i}', 'Inhalt', 'llama3-8b-8192')
+        store_cached_result(key, 'moderation', result)
+        assert cached_result('moderation', f'Posting {i}', 'Inhalt', 'llama3-8b-8192')[1] is None
+
+    key, miss = cached_result('moderation', 'Gutes Posting', 'Inhalt', 'llama3-8b-8192')
+    store_cached_result(key, 'moderation', {'decision': 'FREISCHALTEN', 'confidence': 95})
+    assert miss is None
+    assert cached_result('moderation', 'gutes posting', 'Inhalt', 'llama3-8b-8192')[1] == {
+        'decision': 'FREISCHALTEN', 'confidence': 95, 'cached': True
+    }
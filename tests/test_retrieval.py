@@ -0,0 +1,27 @@
+from moderation_engine import ParagraphIndex, retrieve_relevant_paragraphs, tokenize_german
+
+PARAGRAPHS = [
+    "Die Regierung hat am Dienstag das Budget für das kommende Jahr vorgestellt.",
+    "Für Pensionen sind deutlich höhere Ausgaben vorgesehen als bisher.",
+    "Die Opposition kritisiert die geplanten Kürzungen bei den Universitäten.",
+    "Das Wetter bleibt in ganz Österreich sonnig und warm."
+]
+
+
+def test_tokenizer_drops_stopwords_and_stems():
+    assert tokenize_german("Die Kürzungen bei den Universitäten") == ['kürz', 'universität']
+
+
+def test_bm25_ranks_matching_paragraphs_first():
+    index = ParagraphIndex(PARAGRAPHS)
+    assert index.top_k("Warum kürzt man bei den Universitäten? Kürzungen sind falsch", 2)[0] == 2
+    assert index.top_k("Pensionen und Ausgaben", 1) == [1]
+    assert index.top_k("Fußball", 3) == []
+
+
+def test_retrieval_keeps_article_order_and_falls_back_to_lead():
+    article = {'url': 'https://example.org/budget', 'content': '\n'.join(PARAGRAPHS), 'paragraphs': PARAGRAPHS}
+    selected, _ = retrieve_relevant_paragraphs(article, "Pensionen statt Universitäten kürzen!", 3, 0)
+    assert selected == [1, 2]
+    selected, cached = retrieve_relevant_paragraphs(article, "Fußball", 3, 0)
+    assert selected == [0] and cached
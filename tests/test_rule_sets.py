@@ -0,0 +1,30 @@
+import pytest
+
+from moderation_engine import DEFAULT_FORUM_RULES, build_rule_set, diff_rule_sets, get_rule_sets, rule_key
+
+
+def test_rule_set_versions_are_content_addressed():
+    assert build_rule_set(dict(DEFAULT_FORUM_RULES)) is get_rule_sets().build(dict(DEFAULT_FORUM_RULES))
+    changed = build_rule_set({**DEFAULT_FORUM_RULES, '§99 Test': 'Neue Regel'})
+    assert changed.version != build_rule_set().version
+    assert get_rule_sets().get(changed.version) is changed
+
+
+def test_rule_diff_compares_by_rule_key():
+    rules = list(DEFAULT_FORUM_RULES.items())
+    old = build_rule_set(dict(rules))
+    first_name, first_description = rules[0]
+    new_rules = dict(rules[2:])
+    new_rules[first_name.upper()] = first_description + ' (verschärft)'
+    new_rules['§ 42 Neu'] = 'Neue Regel'
+    diff = diff_rule_sets(old, build_rule_set(new_rules))
+    assert diff == {
+        'added': ['§42'],
+        'removed': [rule_key(rules[1][0])],
+        'changed': [rule_key(first_name)]
+    }
+
+
+def test_rule_diff_needs_individual_rules():
+    with pytest.raises(ValueError):
+        diff_rule_sets(get_rule_sets().for_text("Nur ein Freitext"), build_rule_set())
@@ -0,0 +1,190 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from starlette.testclient import TestClient
+
+import moderation_service
+from moderation_engine import LOCAL_DEFAULT_MIN_CONFIDENCE, RETRIEVAL_DEFAULT_TOP_K
+from moderation_service import ModerationQueue, create_app, parse_job
+
+ARTICLE = {'title': 'Titel', 'content': 'Inhalt des Artikels'}
+
+
+def test_parse_job_applies_defaults():
+    job = parse_job({'posting': 'Hallo', 'article': ARTICLE})
+    assert job['mode'] == 'sequential'
+    assert job['top_k'] == RETRIEVAL_DEFAULT_TOP_K
+    assert job['options']['local_min_confidence'] == LOCAL_DEFAULT_MIN_CONFIDENCE
+    assert job['options']['duplicate_check'] is True
+
+
+def test_parse_job_key_ignores_posting_whitespace():
+    assert parse_job({'posting': 'Hallo  Welt', 'article': ARTICLE})['key'] == \
+        parse_job({'posting': 'hallo welt', 'article': ARTICLE})['key']
+
+
+@pytest.mark.parametrize('data', [
+    'kein Objekt',
+    ['posting'],
+    {'article': ARTICLE},
+    {'posting': '   ', 'article': ARTICLE},
+    {'posting': 'Hallo'},
+    {'posting': 'Hallo', 'article': {'title': 'nur Titel'}},
+    {'posting': 'Hallo', 'article': ARTICLE, 'mode': 'unbekannt'},
+    {'posting': 'Hallo', 'article': ARTICLE, 'rules': ['§1']},
+    {'posting': 'Hallo', 'article': ARTICLE, 'model': 42},
+    {'posting': 'Hallo', 'article': ARTICLE, 'top_k': 'fünf'},
+    {'posting': 'Hallo', 'article': ARTICLE, 'top_k': 0},
+    {'posting': 'Hallo', 'article': ARTICLE, 'top_k': True},
+    {'posting': 'Hallo', 'article': ARTICLE, 'context_budget': -1},
+    {'posting': 'Hallo', 'article': ARTICLE, 'local_min_confidence': 101},
+    {'posting': 'Hallo', 'article': ARTICLE, 'question_local_min_confidence': '0.5'},
+    {'posting': 'Hallo', 'article': ARTICLE, 'duplicate_check': 'nein'},
+])
+def test_parse_job_rejects_invalid_input_with_value_error(data):
+    with pytest.raises(ValueError):
+        parse_job(data)
+
+
+def test_parse_job_accepts_null_thresholds():
+    job = parse_job({'posting': 'Hallo', 'article': ARTICLE, 'local_min_confidence': None})
+    assert job['options']['local_min_confidence'] is None
+
+
+@pytest.fixture
+def client():
+    with TestClient(create_app(api_key='test')) as client:
+        yield client
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/moderate', {'posting': 'Hallo', 'article': ARTICLE, 'top_k': 'x'}),
+    ('/moderate/batch', {'article': ARTICLE, 'items': [5]}),
+    ('/moderate/batch', {'article': ARTICLE, 'items': [{'posting': 'Hallo', 'early_stop': 'ja'}]}),
+    ('/moderate/batch', {'article': ARTICLE, 'items': []}),
+])
+def test_invalid_requests_get_400(client, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 400
+    assert response.json()['error']
+
+
+def test_invalid_json_gets_400(client):
+    response = client.post('/moderate', content=b'{kein json', headers={'content-type': 'application/json'})
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """Ersetzt moderate_bulk_item; behavior(posting) liefert eine Entscheidung, schläft oder wirft"""
+    calls = SimpleNamespace(postings=[], delay=0.0, fail=set(), recorded=[])
+
+    async def fake_moderate_bulk_item(item, article, context, client, model, mode, rules_text, semaphore, options):
+        calls.postings.append(item['posting'])
+        await asyncio.sleep(calls.delay)
+        if item['posting'] in calls.fail:
+            raise RuntimeError('LLM nicht erreichbar')
+        return {'posting': item['posting'], 'decision': 'FREISCHALTEN', 'confidence': 90,
+                'violated_rules': [], 'explanation': 'ok'}
+
+    monkeypatch.setattr(moderation_service, 'moderate_bulk_item', fake_moderate_bulk_item)
+    monkeypatch.setattr(moderation_service, 'get_history_store',
+                        lambda: SimpleNamespace(record=calls.recorded.append, flush=lambda: None))
+    return calls
+
+
+def test_failed_batch_item_is_reported_per_posting(client, engine):
+    engine.fail.add('kaputt')
+    response = client.post('/moderate/batch', json={'article': ARTICLE, 'items': ['heil', 'kaputt']})
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert [r['decision'] for r in results] == ['FREISCHALTEN', 'ERROR']
+    assert results[1]['error'] is True and response.json()['errors'] == 1
+
+
+def test_timed_out_job_releases_its_queue_slot(client, engine, monkeypatch):
+    monkeypatch.setattr(moderation_service, 'SERVICE_REQUEST_TIMEOUT', 0.3)
+    engine.delay = 5.0
+    started = time.monotonic()
+    response = client.post('/moderate', json={'posting': 'Langsam', 'article': ARTICLE})
+    assert response.status_code == 504
+    # Der Job wird mit der Anfrage beendet, statt weiter auf LLM-Budget zu warten
+    deadline = time.monotonic() + 2
+    while client.app.state.queue.stats()['pending'] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert client.app.state.queue.stats()['pending'] == 0
+    assert time.monotonic() - started < 2
+
+
+@pytest.fixture
+def use_queue(client):
+    """Ersetzt die Warteschlange der App durch eine mit eigenen Grenzen"""
+    def install(**kwargs):
+        client.app.state.queue._batch_loop_future.cancel()
+        client.app.state.queue = ModerationQueue('test', **kwargs)
+        return client.app.state.queue
+    return install
+
+
+def job(posting: str) -> dict:
+    return parse_job({'posting': posting, 'article': ARTICLE})
+
+
+def test_jobs_arriving_together_share_a_micro_batch(client, engine, use_queue):
+    queue = use_queue(batch_size=8, batch_wait=0.2)
+    futures = queue.submit_many([job('eins')]) + queue.submit_many([job('zwei')]) + queue.submit_many([job('drei')])
+    assert [f.result(timeout=5)['decision'] for f in futures] == ['FREISCHALTEN'] * 3
+    stats = queue.stats()
+    assert (stats['batches'], stats['avg_batch_size']) == (1, 3.0)
+
+
+def test_batch_is_sent_when_full_without_waiting(client, engine, use_queue):
+    queue = use_queue(batch_size=2, batch_wait=5.0)
+    started = time.monotonic()
+    futures = queue.submit_many([job('eins'), job('zwei')])
+    for future in futures:
+        future.result(timeout=5)
+    assert time.monotonic() - started < 2
+
+
+def test_identical_postings_share_one_future(client, engine, use_queue):
+    queue = use_queue()
+    engine.delay = 0.2
+    first = queue.submit_many([job('Gleiches Posting'), job('gleiches  posting')])
+    second = queue.submit_many([job('Gleiches Posting')])
+    assert first[0] is first[1] is second[0]
+    first[0].result(timeout=5)
+    assert engine.postings == ['Gleiches Posting']
+    assert queue.stats()['deduplicated'] == 2
+
+    response = client.post('/moderate/batch', json={'article': ARTICLE, 'items': ['doppelt', 'doppelt']})
+    assert [r['posting_id'] for r in response.json()['results']] == ['1', '2']
+    assert engine.postings.count('doppelt') == 1
+
+
+def test_full_queue_answers_429_with_retry_after(client, engine, use_queue):
+    queue = use_queue(max_pending=2)
+    engine.delay = 0.5
+    queue.submit_many([job('belegt eins'), job('belegt zwei')])
+    response = client.post('/moderate', json={'posting': 'eins zu viel', 'article': ARTICLE})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(moderation_service.SERVICE_RETRY_AFTER)
+    # Ein Batch wird ganz oder gar nicht angenommen
+    assert queue.stats()['rejected'] == 1 and queue.stats()['pending'] == 2
+
+
+def test_closed_queue_answers_503(client, engine):
+    client.app.state.queue.close()
+    response = client.post('/moderate', json={'posting': 'Hallo', 'article': ARTICLE})
+    assert response.status_code == 503 and 'Retry-After' in response.headers
+    assert client.post('/moderate/batch', json={'article': ARTICLE, 'items': ['Hallo']}).status_code == 503
+    assert client.get('/health').json()['status'] == 'closing'
+
+
+def test_service_without_api_key_answers_503(monkeypatch):
+    monkeypatch.delenv('GROQ_API_KEY', raising=False)
+    with TestClient(create_app()) as unconfigured:
+        assert unconfigured.post('/moderate', json={'posting': 'Hallo', 'article': ARTICLE}).status_code == 503
+        assert unconfigured.get('/health').status_code == 503
@@ -0,0 +1,55 @@
+import json
+
+from moderation_engine import MODERATION_REQUIRED_FIELDS, StreamingJSONFields
+
+ANSWER = json.dumps({
+    'decision': 'LÖSCHEN',
+    'confidence': 92,
+    'violated_rules': ['§2 Beleidigung'],
+    'explanation': 'Persönlicher Angriff mit "Idiot".'
+}, ensure_ascii=False)
+
+
+def feed_in_chunks(fields: StreamingJSONFields, text: str, size: int):
+    for i in range(0, len(text), size):
+        fields.feed(text[i:i + size])
+
+
+def test_fields_are_extracted_from_any_chunking():
+    for size in (1, 3, 8, len(ANSWER)):
+        fields = StreamingJSONFields()
+        feed_in_chunks(fields, ANSWER, size)
+        assert fields.fields == json.loads(ANSWER)
+        assert fields.time_to_decision is not None
+
+
+def test_confidence_waits_for_its_delimiter():
+    fields = StreamingJSONFields()
+    fields.feed('{"decision": "FREISCHALTEN", "confidence": 9')
+    assert 'confidence' not in fields.fields and fields.time_to_decision is None
+    fields.feed('5, ')
+    assert fields.fields['confidence'] == 95
+
+
+def test_snapshot_shows_partial_explanation():
+    fields = StreamingJSONFields()
+    fields.feed(ANSWER[:ANSWER.index('Idiot')])
+    snapshot = fields.snapshot()
+    assert snapshot['decision'] == 'LÖSCHEN'
+    assert snapshot['explanation_partial'] == 'Persönlicher Angriff mit "'
+
+
+def test_early_stop_result_has_required_fields_only():
+    fields = StreamingJSONFields()
+    feed_in_chunks(fields, ANSWER[:ANSWER.index('"explanation"')], 5)
+    assert fields.has(MODERATION_REQUIRED_FIELDS)
+    fields.stopped_early = True
+    result = fields.result()
+    assert result['decision'] == 'LÖSCHEN' and result['early_stop'] is True
+    assert result['violated_rules'] == ['§2 Beleidigung']
+
+
+def test_truncated_answer_without_early_stop_is_a_parse_error():
+    fields = StreamingJSONFields()
+    fields.feed(ANSWER[:20])
+    assert fields.result()['decision'] == 'ERROR'